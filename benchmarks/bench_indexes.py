@@ -0,0 +1,130 @@
+"""Запросы горячего пути до и после миграции с индексами (100k строк).
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_indexes.py --rows 100000
+
+База создаётся во временном каталоге, индексы из миграции 1 удаляются,
+чтобы получить схему «как раньше», затем запросы замеряются до и после
+``run_migrations``.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MIGRATION_INDEXES = {
+    "active_sessions": ["uq_active_sessions_student_session", "ix_active_sessions_status_last_activity"],
+    "submissions": ["ix_submissions_session_start", "ix_submissions_start_id"],
+}
+
+
+def _fill(engine, rows: int) -> None:
+    from dictant_backend.utils.jsoncodec import encode_json
+
+    now = datetime.utcnow()
+    rnd = random.Random(0)
+    active, subs = [], []
+    for i in range(rows):
+        session = f"session {i % 200}"
+        t = now - timedelta(seconds=rnd.randint(0, 86400 * 30))
+        active.append({
+            "student_name": f"student {i}", "group": "g", "session_name": session,
+            "start_time": t, "last_activity": t,
+            "status": "active" if rnd.random() < 0.5 else "stale",
+        })
+        subs.append({
+            "student_name": f"student {i}", "group": "g", "session_name": session,
+            "start_time": t, "end_time": t, "warnings": encode_json([]), "answers": encode_json({}),
+            "auto_submitted": False, "score": rnd.random() * 10, "score_details": encode_json({}),
+        })
+    meta = sa.MetaData()
+    meta.reflect(engine)
+    with engine.begin() as conn:
+        conn.execute(meta.tables["active_sessions"].insert(), active)
+        conn.execute(meta.tables["submissions"].insert(), subs)
+
+
+def _queries(rows: int):
+    rnd = random.Random(1)
+    cutoff = datetime.utcnow() - timedelta(days=15)
+    return {
+        "active lookup (start/update/close)": (
+            "SELECT id FROM active_sessions WHERE student_name = :s AND session_name = :n",
+            lambda: {"s": f"student {(i := rnd.randrange(rows))}", "n": f"session {i % 200}"},
+            500,
+        ),
+        "stale sweep candidates": (
+            "SELECT count(*) FROM active_sessions WHERE status = 'active' AND last_activity < :c",
+            lambda: {"c": cutoff},
+            20,
+        ),
+        "history page by session": (
+            "SELECT id FROM submissions WHERE session_name = :n"
+            " ORDER BY start_time DESC, id DESC LIMIT 50",
+            lambda: {"n": f"session {rnd.randrange(200)}"},
+            200,
+        ),
+        "history first page": (
+            "SELECT id FROM submissions ORDER BY start_time DESC, id DESC LIMIT 50",
+            lambda: {},
+            200,
+        ),
+    }
+
+
+def _measure(engine, rows: int) -> dict[str, float]:
+    out = {}
+    with engine.connect() as conn:
+        for name, (sql, params, repeat) in _queries(rows).items():
+            stmt = sa.text(sql)
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(stmt, params()).all()
+            out[name] = (time.perf_counter() - t0) / repeat
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["AUTO_MIGRATE"] = "0"
+        from dictant_backend.app import create_app
+        from dictant_backend.extensions import db
+        from dictant_backend.migrations import run_migrations
+
+        app = create_app()
+        with app.app_context():
+            engine = db.engine
+            with engine.begin() as conn:
+                for names in MIGRATION_INDEXES.values():
+                    for name in names:
+                        conn.execute(sa.text(f"DROP INDEX IF EXISTS {name}"))
+            _fill(engine, args.rows)
+
+            before = _measure(engine, args.rows)
+            t0 = time.perf_counter()
+            run_migrations(engine)
+            migrate_s = time.perf_counter() - t0
+            after = _measure(engine, args.rows)
+
+    print(f"rows={args.rows}, migration took {migrate_s:.2f}s")
+    for name in before:
+        b, a = before[name] * 1000, after[name] * 1000
+        print(f"{name:<38} before {b:9.3f}ms  after {a:9.3f}ms  x{b / a:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Статистика по препаратам/категориям: разбор JSON отправок против GROUP BY.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_items.py --rows 20000
+
+Сравнивает средний балл и долю промахов по (препарат, категория) для одной
+сессии: проходом по Submission.score_details в Python (как раньше
+пришлось бы делать) и запросом к submission_items (как /admin/items/stats).
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DRUGS = [f"drug_{i}" for i in range(40)]
+CATEGORIES = ["mnn", "tradeNames", "forms", "indications", "halfLife", "elimination"]
+SESSIONS = 10
+
+
+def _fill(rows: int) -> None:
+    from dictant_backend.extensions import db
+    from dictant_backend.models import Submission
+    from dictant_backend.services.submission_items import add_items
+
+    rnd = random.Random(0)
+    for start in range(0, rows, 1000):
+        subs = []
+        for i in range(start, min(start + 1000, rows)):
+            drugs = rnd.sample(DRUGS, 15)
+            answers = {d: {c: [rnd.choice(["а", "б", "в"])] for c in CATEGORIES} for d in drugs}
+            for d in drugs:
+                answers[d]["mnn"] = rnd.choice(["а", "б"])
+            details = {d: {"score": 0.5, "details": {c: rnd.choice([0.0, 0.5, 1.0]) for c in CATEGORIES}} for d in drugs}
+            subs.append(Submission(
+                student_name=f"student {i}", session_name=f"session {i % SESSIONS}",
+                answers=answers, score_details=details, score=5.0, warnings=[],
+            ))
+        db.session.add_all(subs)
+        db.session.flush()
+        add_items(subs)
+        db.session.commit()
+        db.session.expunge_all()
+
+
+def _python_scan(session_name: str) -> dict:
+    from dictant_backend.extensions import db
+    from dictant_backend.models import Submission
+
+    acc: dict[tuple[str, str], list] = {}
+    q = db.session.query(Submission.score_details).filter(Submission.session_name == session_name)
+    for (details,) in q.yield_per(1000):
+        for drug_id, drug in (details or {}).items():
+            for cat, pts in drug["details"].items():
+                pts = pts["total"] if isinstance(pts, dict) else pts
+                a = acc.setdefault((drug_id, cat), [0, 0.0, 0])
+                a[0] += 1
+                a[1] += pts
+                a[2] += pts == 0
+    return {k: (n, s / n, m / n) for k, (n, s, m) in acc.items()}
+
+
+def _group_by(session_name: str) -> dict:
+    from dictant_backend.extensions import db
+    from dictant_backend.models import SubmissionItem as Item
+
+    rows = (
+        db.session.query(
+            Item.drug_id, Item.category, sa.func.count(), sa.func.avg(Item.points),
+            sa.func.sum(sa.case((Item.points == 0, 1), else_=0)),
+        )
+        .filter(Item.session_name == session_name)
+        .group_by(Item.drug_id, Item.category)
+        .all()
+    )
+    return {(d, c): (n, avg, m / n) for d, c, n, avg, m in rows}
+
+
+def _time(fn, repeat: int) -> tuple[float, dict]:
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        out = fn(f"session {i % SESSIONS}")
+    return (time.perf_counter() - t0) / repeat, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["SUBMISSION_ITEMS_BACKFILL_ON_START"] = "0"
+        from dictant_backend.app import create_app
+
+        app = create_app()
+        with app.app_context():
+            _fill(args.rows)
+            scan_s, scan = _time(_python_scan, args.repeat)
+            sql_s, sql = _time(_group_by, args.repeat)
+
+    same = scan.keys() == sql.keys() and all(
+        scan[k][0] == sql[k][0] and abs(scan[k][1] - sql[k][1]) < 1e-9 and abs(scan[k][2] - sql[k][2]) < 1e-9
+        for k in scan
+    )
+    print(f"rows={args.rows}, {args.rows // SESSIONS} submissions per session, results match: {same}")
+    print(f"python scan of score_details  {scan_s * 1000:9.1f}ms")
+    print(f"GROUP BY submission_items     {sql_s * 1000:9.1f}ms  x{scan_s / sql_s:.1f}")
+
+
+if __name__ == "__main__":
+    main()
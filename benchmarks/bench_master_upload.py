@@ -0,0 +1,96 @@
+"""Разбор мастер-таблицы: pandas.read_excel против потокового парсера.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_master_upload.py --drugs 5000
+
+Генерирует xlsx с заданным числом препаратов и замеряет время и пик памяти
+(tracemalloc) для прежней схемы (read_excel → to_dict → конвертация строк)
+и для ``parse_master_table`` (openpyxl read_only, строка за строкой).
+Для pandas нужен установленный pandas.
+"""
+
+import argparse
+import io
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dictant_backend.utils.master_table import FORM_COLUMNS, convert_master_row, parse_master_table  # noqa: E402
+
+TEXT_COLUMNS = ["inn_main", "inn_aliases", "trade_names", "inn_ru", "trade_names_ru",
+                "indications", "half_life", "elimination_routes", "dose_notes"]
+DOSE_COLUMNS = [f"dose_{g}_{k}" for g in ("main", "outpatient", "inpatient", "children", "elderly")
+                for k in ("min", "avg", "max")]
+# колонки, которые мастер-таблица носит «для людей» (ключ их не читает)
+EXTRA_COLUMNS = [f"comment_{i}" for i in range(10)]
+COLUMNS = ["drug_id", *TEXT_COLUMNS, *FORM_COLUMNS, *DOSE_COLUMNS, *EXTRA_COLUMNS]
+
+
+def _workbook(drugs: int) -> bytes:
+    import xlsxwriter
+
+    rnd = random.Random(0)
+    buf = io.BytesIO()
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True})
+    ws = wb.add_worksheet()
+    ws.write_row(0, 0, COLUMNS)
+    for i in range(1, drugs + 1):
+        row = [f"drug_{i}"]
+        row += [f"значение {i} {c}; вариант {rnd.randint(1, 9)}" for c in TEXT_COLUMNS]
+        row += [rnd.choice(["10; 25;", "25 mg – 2 ml;", ""]) for _ in FORM_COLUMNS]
+        row += [rnd.choice([rnd.randint(1, 400), ""]) for _ in DOSE_COLUMNS]
+        row += ["примечание " * 5 for _ in EXTRA_COLUMNS]
+        ws.write_row(i, 0, row)
+    wb.close()
+    return buf.getvalue()
+
+
+def _pandas(data: bytes) -> int:
+    import pandas as pd
+
+    df = pd.read_excel(io.BytesIO(data))
+    df.columns = [str(c).strip() for c in df.columns]
+    key = {}
+    for row in df.to_dict(orient="records"):
+        row = {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in row.items()}
+        item = convert_master_row(row)
+        if item:
+            key[item["drug_id"]] = item
+    return len(key)
+
+
+def _streaming(data: bytes) -> int:
+    key, _ = parse_master_table(io.BytesIO(data), "master.xlsx")
+    return len(key)
+
+
+def _measure(fn, data: bytes) -> tuple[float, float, int]:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n = fn(data)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=5000)
+    args = parser.parse_args()
+
+    data = _workbook(args.drugs)
+    print(f"drugs={args.drugs}, columns={len(COLUMNS)}, xlsx {len(data) / 2**20:.1f} MB")
+    for name, fn in (("pandas read_excel", _pandas), ("streaming parser", _streaming)):
+        elapsed, peak, n = _measure(fn, data)
+        print(f"{name:<18} {elapsed:7.2f}s  peak {peak:7.1f} MB  drugs {n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Мастер-таблица: один JSON в Settings.answer_key против master_drugs.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_master_versions.py --drugs 5000 --changed 50
+
+Замеряет на SQLite три операции для прежней схемы (весь ключ одним JSON)
+и для версионной (строка на препарат):
+
+* повторная загрузка таблицы, в которой изменились ``--changed`` препаратов;
+* сборка ключа билета (``--ticket`` препаратов) после сброса кэша;
+* русские названия для сопоставления билета в save_settings.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _key(drugs: int, rnd: random.Random) -> dict:
+    key = {}
+    for i in range(drugs):
+        drug_id = f"drug_{i}"
+        key[drug_id] = {
+            "drug_id": drug_id,
+            "mnn": f"mnn {i}",
+            "mnn_aliases": [f"alias {i}"],
+            "trade_names": [f"trade {i} {k}" for k in range(3)],
+            "inn_ru": f"мнн {i}",
+            "trade_names_ru": [f"торговое {i} {k}" for k in range(3)],
+            "forms": ["tablets", "ampoules"],
+            "form_dosages": {"tablets": ["10", "25"], "ampoules": ["25 mg – 2 ml"]},
+            "indications": [f"показание {rnd.randint(1, 300)}" for _ in range(4)],
+            "half_life": "12-24",
+            "elimination": ["почки"],
+            "doses": {g: {"min": "10", "avg": "20", "max": "40"}
+                      for g in ("main", "outpatient", "inpatient", "children", "elderly")},
+        }
+    return key
+
+
+def _time(fn, repeat: int = 1) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=5000)
+    parser.add_argument("--changed", type=int, default=50)
+    parser.add_argument("--ticket", type=int, default=10)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    key = _key(args.drugs, rnd)
+    updated = json.loads(json.dumps(key))
+    for drug_id in rnd.sample(sorted(updated), args.changed):
+        updated[drug_id]["mnn"] += " (rev)"
+    ticket = rnd.sample(sorted(key), args.ticket)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from dictant_backend.app import create_app
+        from dictant_backend.extensions import db
+        from dictant_backend.models import Settings
+        from dictant_backend.services.master_key import load_drugs, ru_names, save_master_key
+        from dictant_backend.utils.scoring import compile_answer_key
+
+        app = create_app()
+        with app.app_context():
+            settings = Settings(answer_key=json.dumps(key, ensure_ascii=False))
+            db.session.add(settings)
+            save_master_key(key, source="bench")
+            db.session.commit()
+
+            def blob_upload():
+                settings.answer_key = json.dumps(updated, ensure_ascii=False)
+                db.session.commit()
+
+            def versioned_upload():
+                save_master_key(updated, source="bench")
+                db.session.commit()
+
+            def blob_ticket():
+                raw = db.session.query(Settings.answer_key).scalar()
+                full = json.loads(raw)
+                compile_answer_key({d: full[d] for d in ticket})
+
+            def versioned_ticket():
+                compile_answer_key(load_drugs(ticket))
+
+            def blob_names():
+                raw = db.session.query(Settings.answer_key).scalar()
+                {d: (v["inn_ru"], v["trade_names_ru"]) for d, v in json.loads(raw).items()}
+
+            def versioned_names():
+                ru_names()
+
+            blob_size = len(settings.answer_key.encode("utf-8"))
+            print(f"drugs={args.drugs}, changed={args.changed}, ticket={args.ticket}, "
+                  f"answer_key JSON {blob_size / 2**20:.1f} MB")
+            # загрузку меряем один раз: повтор той же таблицы — уже без разницы
+            for name, old, new, repeat in (
+                ("upload with changes", blob_upload, versioned_upload, 1),
+                ("ticket key (cache miss)", blob_ticket, versioned_ticket, 5),
+                ("RU names for settings", blob_names, versioned_names, 5),
+            ):
+                old_s, new_s = _time(old, repeat), _time(new, repeat)
+                print(f"{name:<24} blob {old_s * 1000:8.1f}ms  versioned {new_s * 1000:8.1f}ms  "
+                      f"x{old_s / new_s:.1f}")
+
+
+if __name__ == "__main__":
+    main()
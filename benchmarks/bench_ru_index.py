@@ -0,0 +1,93 @@
+"""Подсказки по русским названиям: полный перебор Левенштейном против триграмм.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_ru_index.py --names 50000
+
+Генерирует названия, строит ``RuNameIndex`` и для запросов с опечатками
+(замена, пропуск, лишняя буква) сравнивает время подсказки ``suggest``
+с перебором всех названий по расстоянию Левенштейна, а также долю
+запросов, где исходное название попало в подсказки.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dictant_backend.services.ru_index import RuNameIndex, _levenshtein  # noqa: E402
+
+ALPHABET = "абвгдеийклмнопрстуфхцшыэюя"
+# слоги «согласная + гласная (+ согласная)», как в названиях препаратов
+SYLLABLES = [c + v + e for c in "бвгдзклмнпрстфх" for v in "аеиоу" for e in ("", "л", "н", "р", "с", "т", "кс")]
+# типичные окончания МНН — дают очень частые триграммы
+ENDINGS = ["ин", "ил", "ам", "он", "ол", "ат", "азол", "амин", "оксин", "тилин", "прил", "сартан"]
+
+
+def _names(n: int, rnd: random.Random) -> list[str]:
+    names = set()
+    while len(names) < n:
+        word = "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 3))) + rnd.choice(ENDINGS)
+        if rnd.random() < 0.2:
+            word += "-" + rnd.choice(["ратиофарм", "тева", "акри", "канон", "ретард", "лонг"])
+        names.add(word)
+    return sorted(names)
+
+
+def _typo(name: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(name))
+    kind = rnd.choice(("sub", "del", "ins"))
+    if kind == "sub":
+        return name[:i] + rnd.choice(ALPHABET) + name[i + 1:]
+    if kind == "del":
+        return name[:i] + name[i + 1:]
+    return name[:i] + rnd.choice(ALPHABET) + name[i:]
+
+
+def _brute(names: list[str], query: str, limit: int) -> list[str]:
+    return sorted(names, key=lambda n: (_levenshtein(query, n), n))[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--brute-queries", type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    names = _names(args.names, rnd)
+    rows = [[name, f"drug_{i // 3}", "trade" if i % 3 else "mnn"] for i, name in enumerate(names)]
+
+    t0 = time.perf_counter()
+    index = RuNameIndex(rows)
+    build_s = time.perf_counter() - t0
+
+    targets = [rnd.choice(names) for _ in range(args.queries)]
+    queries = [_typo(t, rnd) for t in targets]
+
+    times, found = [], 0
+    for target, query in zip(targets, queries):
+        t0 = time.perf_counter()
+        hits = index.suggest(query)
+        times.append(time.perf_counter() - t0)
+        found += any(h["name"] == target for h in hits)
+
+    t0 = time.perf_counter()
+    for query in queries[:args.brute_queries]:
+        _brute(names, query, 3)
+    brute_s = (time.perf_counter() - t0) / args.brute_queries
+
+    times.sort()
+    print(f"names={len(index)}, index built in {build_s * 1000:.0f}ms")
+    print(f"trigram suggest   mean {statistics.mean(times) * 1000:7.3f}ms  "
+          f"p99 {times[int(len(times) * 0.99) - 1] * 1000:7.3f}ms  target in top-3: {found / len(queries):.0%}")
+    print(f"levenshtein scan  mean {brute_s * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""Скомпилированный подсчёт баллов против исходного: совпадение и скорость.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_scoring.py --cases 20000 --students 300
+
+``legacy_compute_score`` ниже — исходная функция, в которой числа уже
+сравниваются по правилам ``utils.dosage``, но разбираются заново на каждый
+вызов: это база для замера, а не эталон правил. Дифференциальная проверка
+здесь показывает только, что компиляция ключа не меняет результат.
+Совпадение с исходным подсчётом до изменения правил (и список намеренных
+изменений) проверяет tests/test_scoring.py по замороженной копии.
+
+Затем замер: сессия из ``--students`` отправок по билету из 10
+препаратов — исходная функция, ``compute_score`` по скомпилированному
+ключу и ``score_many`` одним вызовом.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, Tuple, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dictant_backend.utils.dosage import dosages_match, numbers_close, parse_dose, parse_dosage, parse_range
+from dictant_backend.utils.scoring import compile_answer_key, compute_score, score_many
+
+
+# ---------------------------
+# Исходная реализация (до компиляции ключа)
+# ---------------------------
+
+def _legacy_norm(s: str) -> str:
+    s = str(s).strip().lower()
+    s = s.replace("–", "-")
+    # схлопываем пробелы
+    s = " ".join(s.split())
+    # убираем хвостовые ;
+    while s.endswith(";"):
+        s = s[:-1].strip()
+    return s
+
+
+def _legacy_as_norm_set(values) -> set[str]:
+    if not values:
+        return set()
+    out = set()
+    if isinstance(values, list):
+        for v in values:
+            if v is None:
+                continue
+            nv = _legacy_norm(v)
+            if nv:
+                out.add(nv)
+    elif isinstance(values, str):
+        nv = _legacy_norm(values)
+        if nv:
+            out.add(nv)
+    return out
+
+
+def legacy_compute_score(answers: Dict[str, Any], answer_key: Dict[str, Any]) -> Tuple[float | None, Dict]:
+    """
+    Подсчёт итогового балла за тест.
+
+    :param answers: ответы студента (dict)
+    :param answer_key: правильные ответы (dict)
+    :return: (итоговый балл 0–10, breakdown)
+    """
+    score_total = 0.0
+    breakdown: Dict[str, Dict] = {}
+
+    if not answers:
+        return None, {}
+
+    for drug_index, student_ans in answers.items():
+        key = str(drug_index)
+        correct = answer_key.get(key, {})
+
+        details: Dict[str, Any] = {}
+        category_points = 0.0
+        category_count = 0
+
+        # --- MNN (с учётом алиасов) ---
+        mnn_correct = correct.get("mnn")
+        mnn_aliases = correct.get("mnn_aliases") or []
+        if mnn_correct is not None or mnn_aliases:
+            category_count += 1
+            student_mnn = student_ans.get("mnn", "")
+            if isinstance(student_mnn, str):
+                s = student_mnn.strip().lower()
+                valid = {mnn_correct.strip().lower()} if isinstance(mnn_correct, str) else set()
+                valid.update(
+                    a.strip().lower()
+                    for a in mnn_aliases
+                    if isinstance(a, str) and a.strip()
+                )
+                if s and s in valid:
+                    category_points += 1.0
+                    details["mnn"] = 1.0
+                else:
+                    details["mnn"] = 0.0
+            else:
+                details["mnn"] = 0.0
+
+        # --- tradeNames ---
+        correct_trade = {t.strip().lower() for t in (correct.get("tradeNames") or []) if isinstance(t, str)}
+        if correct_trade:
+            category_count += 1
+            student_trade = {
+                t.strip().lower()
+                for t in (student_ans.get("tradeNames") or [])
+                if isinstance(t, str)
+            }
+            inter = correct_trade.intersection(student_trade)
+            pts = len(inter) / len(correct_trade) if correct_trade else 0.0
+            category_points += pts
+            details["tradeNames"] = pts
+
+        # --- forms ---
+        correct_forms = {f.strip().lower() for f in (correct.get("forms") or []) if isinstance(f, str)}
+        if correct_forms:
+            category_count += 1
+            student_forms = {
+                f.strip().lower()
+                for f in (student_ans.get("forms") or [])
+                if isinstance(f, str)
+            }
+            inter = correct_forms.intersection(student_forms)
+            pts = len(inter) / len(correct_forms)
+            category_points += pts
+            details["forms"] = pts
+
+        # --- form dosages (НОВОЕ) ---
+        # correct["form_dosages"] = {"tablets":[...], "ampoules":[...], ...}
+        correct_fd = correct.get("form_dosages") or {}
+        if isinstance(correct_fd, dict) and any(isinstance(v, list) and len(v) > 0 for v in correct_fd.values()):
+            category_count += 1
+
+            student_fd = student_ans.get("formDosages") or {}
+            if not isinstance(student_fd, dict):
+                student_fd = {}
+
+            per_form: Dict[str, float] = {}
+            forms_scored = 0
+            sum_pts = 0.0
+
+            for form_key, correct_list in correct_fd.items():
+                if not isinstance(form_key, str):
+                    continue
+                if not isinstance(correct_list, list) or not correct_list:
+                    continue
+
+                correct_set = _legacy_as_norm_set(correct_list)
+                if not correct_set:
+                    continue
+
+                student_list = student_fd.get(form_key, [])
+                student_set = _legacy_as_norm_set(student_list)
+                if isinstance(student_list, str):
+                    student_list = [student_list]
+                elif not isinstance(student_list, list):
+                    student_list = []
+                student_parsed = [parse_dosage(v) for v in student_list if v is not None]
+
+                inter = {
+                    c for c in correct_set
+                    if c in student_set or (parse_dosage(c) is not None and any(
+                        p is not None and dosages_match(p, parse_dosage(c)) for p in student_parsed))
+                }
+                pts = (len(inter) / len(correct_set)) if correct_set else 0.0
+                per_form[form_key] = pts
+                sum_pts += pts
+                forms_scored += 1
+
+            final_pts = (sum_pts / forms_scored) if forms_scored > 0 else 0.0
+            category_points += final_pts
+            details["formDosages"] = {"total": final_pts, "perForm": per_form}
+
+        # --- indications ---
+        correct_inds = {i.strip().lower() for i in (correct.get("indications") or []) if isinstance(i, str)}
+        if correct_inds:
+            category_count += 1
+            student_inds = {
+                i.strip().lower()
+                for i in (student_ans.get("indications") or [])
+                if isinstance(i, str)
+            }
+            inter = correct_inds.intersection(student_inds)
+            pts = len(inter) / len(correct_inds)
+            category_points += pts
+            details["indications"] = pts
+
+        # --- doses (суточные) ---
+        correct_doses = correct.get("doses") or {}
+        if isinstance(correct_doses, dict) and correct_doses:
+            # считаем min/avg/max как отдельные подпункты внутри одной категории
+            category_count += 1
+
+            student_doses = student_ans.get("doses") or {}
+            if not isinstance(student_doses, dict):
+                student_doses = {}
+
+            dose_pts_sum = 0.0
+            dose_cnt = 0
+            per = {}
+
+            for dtype in ("min", "avg", "max"):
+                c = correct_doses.get(dtype)
+                if not isinstance(c, dict):
+                    continue
+                c_main = c.get("main")
+                if c_main is None:
+                    continue
+
+                dose_cnt += 1
+                s = student_doses.get(dtype) if isinstance(student_doses.get(dtype), dict) else {}
+                s_main = s.get("main") if isinstance(s, dict) else None
+
+                s_dose, c_dose = parse_dose(s_main), parse_dose(c_main)
+                pts = 1.0 if (s_dose is not None and c_dose is not None and numbers_close(s_dose, c_dose)) else 0.0
+                per[dtype] = pts
+                dose_pts_sum += pts
+
+            final_pts = (dose_pts_sum / dose_cnt) if dose_cnt else 0.0
+            category_points += final_pts
+            details["doses"] = {"total": final_pts, "per": per}
+
+        # --- half-life ---
+        correct_half = correct.get("halfLife") or {}
+        if isinstance(correct_half, dict) and ("from" in correct_half or "to" in correct_half):
+            category_count += 1
+            s_half = student_ans.get("halfLife") or {}
+            if not isinstance(s_half, dict):
+                s_half = {}
+
+            c_range = parse_range(correct_half)
+            s_range = parse_range(s_half)
+
+            pts = 0.0
+            if c_range is not None and s_range is not None:
+                pts = 1.0 if (numbers_close(s_range[0], c_range[0]) and numbers_close(s_range[1], c_range[1])) else 0.0
+            details["halfLife"] = pts
+            category_points += pts
+
+        # --- elimination ---
+        correct_elim = {e.strip().lower() for e in (correct.get("elimination") or []) if isinstance(e, str)}
+        if correct_elim:
+            category_count += 1
+            student_elim = {
+                e.strip().lower()
+                for e in (student_ans.get("elimination") or [])
+                if isinstance(e, str)
+            }
+            inter = correct_elim.intersection(student_elim)
+            pts = len(inter) / len(correct_elim)
+            category_points += pts
+            details["elimination"] = pts
+
+        drug_score = (category_points / category_count) if category_count else 0.0
+        breakdown[key] = {"score": drug_score, "details": details}
+        score_total += drug_score
+
+    avg = score_total / len(answers) if answers else 0.0
+    final_score_10 = round(avg * 10.0, 2)
+    return final_score_10, breakdown
+
+
+# ---------------------------
+# Генерация данных
+# ---------------------------
+
+WORDS = [
+    "Haloperidol", " haloperidol ", "aminazin", "Тизерцин", "Сероквель", "", "  ",
+    "10", "25 mg – 2 ml;", "25 mg - 2 ml", "25  MG - 2 ml ;;", "x",
+    "10 мг", "0,01 г", "10000 мкг", "10.0", "25 мг – 2 мл",
+]
+
+
+def _rand_list(rnd: random.Random):
+    if rnd.random() < 0.9:
+        return [rnd.choice(WORDS + [None, 5, 5.0, True]) for _ in range(rnd.randint(0, 4))]
+    return rnd.choice(WORDS)  # строка вместо списка тоже встречается
+
+
+def _key_item(rnd: random.Random) -> dict:
+    d = {}
+    if rnd.random() < 0.8:
+        d["mnn"] = rnd.choice(WORDS + [None])
+    if rnd.random() < 0.5:
+        d["mnn_aliases"] = _rand_list(rnd)
+    for k in ("tradeNames", "forms", "indications", "elimination"):
+        if rnd.random() < 0.7:
+            d[k] = _rand_list(rnd)
+    if rnd.random() < 0.7:
+        d["form_dosages"] = {rnd.choice(["tablets", "ampoules"]): _rand_list(rnd) for _ in range(2)}
+    if rnd.random() < 0.7:
+        d["doses"] = {t: {"main": rnd.choice([None, "10", 10, 2.5])} for t in rnd.sample(["min", "avg", "max", "x"], 2)}
+    if rnd.random() < 0.7:
+        d["halfLife"] = {k: rnd.choice([None, "3", 3, 4]) for k in rnd.sample(["from", "to"], rnd.randint(1, 2))}
+    return d
+
+
+def _answer_item(rnd: random.Random) -> dict:
+    d = {}
+    if rnd.random() < 0.8:
+        d["mnn"] = rnd.choice(WORDS + [None, 3])
+    for k in ("tradeNames", "forms", "indications", "elimination"):
+        if rnd.random() < 0.7:
+            d[k] = _rand_list(rnd)
+    if rnd.random() < 0.7:
+        d["formDosages"] = {rnd.choice(["tablets", "ampoules"]): _rand_list(rnd)}
+    if rnd.random() < 0.7:
+        d["doses"] = {t: {"main": rnd.choice([None, "10", 10, 2.5, "abc"])} for t in ("min", "avg", "max")}
+    if rnd.random() < 0.7:
+        d["halfLife"] = {k: rnd.choice([None, "3", 3, 4]) for k in ("from", "to")}
+    return d
+
+
+def _outcome(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return ("exception", type(e).__name__)
+
+
+def differential(cases: int) -> int:
+    rnd = random.Random(1)
+    mismatches = 0
+    for _ in range(cases):
+        key = {str(i): _key_item(rnd) for i in range(5)}
+        batch = [
+            {str(i): _answer_item(rnd) for i in rnd.sample(range(7), rnd.randint(0, 6))}
+            for _ in range(3)
+        ]
+        compiled = compile_answer_key(key)
+        expected = [_outcome(legacy_compute_score, a, key) for a in batch]
+        got = [_outcome(compute_score, a, compiled) for a in batch]
+        got_raw = [_outcome(compute_score, a, key) for a in batch]
+        many = _outcome(score_many, batch, compiled)
+        # score_many падает целиком, если падает хоть один элемент
+        failed = [e for e in expected if e[0] == "exception"]
+        many_ok = many == failed[0] if failed else many == expected
+        if got != expected or got_raw != expected or not many_ok:
+            mismatches += 1
+            if mismatches <= 3:
+                print("MISMATCH", key, batch, expected, got, sep="\n  ")
+    return mismatches
+
+
+def _session(rnd: random.Random, students: int):
+    names = [f"drug {i}" for i in range(40)]
+    key = {}
+    for i in range(10):
+        key[str(i)] = {
+            "mnn": names[i],
+            "mnn_aliases": [names[i].upper()],
+            "tradeNames": rnd.sample(names, 3),
+            "forms": ["таблетки", "раствор для инъекций"],
+            "form_dosages": {"tablets": ["1 мг", "5 мг", "10 мг"], "ampoules": ["5 мг/мл - 1 мл"]},
+            "indications": rnd.sample(names, 4),
+            "doses": {"min": {"main": 1}, "avg": {"main": 10}, "max": {"main": 20}},
+            "halfLife": {"from": 12, "to": 36},
+            "elimination": ["почки", "кишечник"],
+        }
+    answers = []
+    for _ in range(students):
+        a = {}
+        for i in range(10):
+            c = key[str(i)]
+            a[str(i)] = {
+                "mnn": rnd.choice([c["mnn"], names[rnd.randrange(40)]]),
+                "tradeNames": [t if rnd.random() < 0.7 else rnd.choice(names) for t in c["tradeNames"]],
+                "forms": c["forms"][: rnd.randint(0, 2)],
+                # часть дозировок в других единицах: «1 мг» -> «1000 мкг»
+                "formDosages": {"tablets": [rnd.choice([d.upper() + " ", d.replace(" мг", "000 мкг")])
+                                            for d in c["form_dosages"]["tablets"][: rnd.randint(0, 3)]]},
+                "indications": [t for t in c["indications"] if rnd.random() < 0.6],
+                "doses": {"min": {"main": rnd.choice([1, 2])}, "avg": {"main": 10}, "max": {"main": rnd.choice([20, 30])}},
+                "halfLife": {"from": 12, "to": rnd.choice([24, 36])},
+                "elimination": ["Почки"],
+            }
+        answers.append(a)
+    return key, answers
+
+
+def _timeit(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=20_000)
+    parser.add_argument("--students", type=int, default=300)
+    args = parser.parse_args()
+
+    mismatches = differential(args.cases)
+    print(f"differential: {args.cases} cases, {mismatches} mismatches")
+
+    key, answers = _session(random.Random(2), args.students)
+    compiled = compile_answer_key(key)
+    assert score_many(answers, compiled) == [legacy_compute_score(a, key) for a in answers]
+
+    legacy_s = _timeit(lambda: [legacy_compute_score(a, key) for a in answers])
+    single_s = _timeit(lambda: [compute_score(a, compiled) for a in answers])
+    many_s = _timeit(lambda: score_many(answers, compiled))
+    compile_s = _timeit(lambda: compile_answer_key(key))
+
+    print(f"session of {args.students} submissions x 10 drugs (best of 5):")
+    print(f"  legacy compute_score     {legacy_s * 1000:8.2f}ms")
+    print(f"  compute_score (compiled) {single_s * 1000:8.2f}ms  x{legacy_s / single_s:.1f}")
+    print(f"  score_many               {many_s * 1000:8.2f}ms  x{legacy_s / many_s:.1f}")
+    print(f"  compile_answer_key       {compile_s * 1000:8.2f}ms (once per key version)")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
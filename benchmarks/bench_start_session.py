@@ -0,0 +1,104 @@
+"""Латентность /sessions/start при одновременном входе студентов.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_start_session.py --logins 300
+
+Сравниваются два режима:
+
+* ``cold`` — снимок настроек сбрасывается перед каждым входом, то есть
+  каждый запрос заново читает Settings и разбирает JSON (как было раньше);
+* ``warm`` — снимок строится один раз, запросы только перемешивают ticket.
+
+Используется отдельная временная SQLite-база.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _prepare_app(db_path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from dictant_backend.app import create_app
+    from dictant_backend.models import db, Settings
+
+    app = create_app()
+    indication_sets = {
+        f"set_{k}": [f"Показание {k}-{i}" for i in range(200)]
+        for k in range(20)
+    }
+    ticket = [
+        {"drug_id": f"d{i}", "dictated_ru": f"препарат {i}", "dictated_kind": "mnn"}
+        for i in range(10)
+    ]
+    with app.app_context():
+        db.session.add(Settings(
+            drugs=json.dumps(ticket, ensure_ascii=False),
+            duration=30,
+            code="bench",
+            session_name="bench",
+            indication_key="set_0",
+            indication_sets=json.dumps(indication_sets, ensure_ascii=False),
+        ))
+        db.session.commit()
+    return app
+
+
+def _run(app, logins: int, cold: bool) -> list[float]:
+    from dictant_backend.services.settings_snapshot import invalidate_settings_snapshot
+
+    client = app.test_client()
+    barrier = threading.Barrier(logins)
+    mode = "cold" if cold else "warm"
+
+    def login(i: int) -> float:
+        barrier.wait()
+        if cold:
+            invalidate_settings_snapshot()
+        t0 = time.perf_counter()
+        resp = client.post("/sessions/start", json={
+            "code": "bench",
+            "studentName": f"Студент {mode} {i}",
+            "group": "1",
+        })
+        elapsed = time.perf_counter() - t0
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        return elapsed
+
+    invalidate_settings_snapshot()
+    with ThreadPoolExecutor(max_workers=logins) as pool:
+        return list(pool.map(login, range(logins)))
+
+
+def _report(name: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    q = statistics.quantiles(samples, n=100)
+    print(
+        f"{name:>5}: n={len(samples)} "
+        f"p50={q[49] * 1000:.1f}ms p95={q[94] * 1000:.1f}ms "
+        f"p99={q[98] * 1000:.1f}ms max={samples[-1] * 1000:.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _prepare_app(os.path.join(tmp, "bench.db"))
+        _report("cold", _run(app, args.logins, cold=True))
+        _report("warm", _run(app, args.logins, cold=False))
+
+
+if __name__ == "__main__":
+    main()
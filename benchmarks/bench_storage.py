@@ -0,0 +1,147 @@
+"""Размер БД и время выгрузки до и после сжатия JSON-колонок Submission.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_storage.py --rows 20000
+
+Отправки вставляются в старом формате (JSON-текст с ensure_ascii=False),
+замеряются размер файла SQLite (после VACUUM), чтение answers/score_details
+через модель и полная CSV-выгрузка. Затем старые строки перекодируются
+``compact_all`` и замеры повторяются.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DRUGS = [f"drug_{i}" for i in range(40)]
+WORDS = ["таблетки", "капсулы", "раствор", "депрессия", "тревога", "бессонница",
+         "печень", "почки", "флуоксетин", "сертралин", "Прозак", "Золофт"]
+CATEGORIES = ["mnn", "tradeNames", "forms", "indications", "halfLife", "elimination"]
+
+
+def _answers(rnd: random.Random) -> dict:
+    out = {}
+    for drug in rnd.sample(DRUGS, 15):
+        out[drug] = {
+            "mnn": rnd.choice(WORDS),
+            "tradeNames": rnd.sample(WORDS, 3),
+            "forms": rnd.sample(WORDS, 2),
+            "formDosages": {"tablets": [str(rnd.choice([5, 10, 20, 40]))]},
+            "indications": rnd.sample(WORDS, 3),
+            "doses": {"min": {"main": str(rnd.randint(1, 50))}, "max": {"main": str(rnd.randint(50, 200))}},
+            "halfLife": {"from": rnd.randint(1, 24), "to": rnd.randint(24, 96)},
+            "elimination": rnd.sample(WORDS, 1),
+        }
+    return out
+
+
+def _score_details(answers: dict, rnd: random.Random) -> dict:
+    out = {}
+    for drug in answers:
+        details = {c: round(rnd.random(), 3) for c in CATEGORIES}
+        details["formDosages"] = {"total": 0.5, "perForm": {"tablets": 0.5}}
+        details["doses"] = {"total": 0.5, "per": {"min": 1.0, "max": 0.0}}
+        out[drug] = {"score": round(sum(v for v in details.values() if isinstance(v, float)), 3), "details": details}
+    return out
+
+
+def _untyped(name: str, row: dict):
+    # без типов модели: значения уходят в БД как есть (str, а не CompressedJSON)
+    return sa.table(name, *(sa.column(k) for k in row))
+
+
+def _fill(engine, rows: int) -> None:
+    rnd = random.Random(0)
+    now = datetime.utcnow()
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            answers = _answers(rnd)
+            batch.append({
+                "student_name": f"student {i}", "group": f"group {i % 20}",
+                "session_name": f"session {i % 50}",
+                "start_time": now - timedelta(minutes=i), "end_time": now,
+                "auto_submitted": False, "score": rnd.random() * 15,
+                # как писал старый код
+                "warnings": json.dumps([{"type": "blur"}] * (i % 3), ensure_ascii=False),
+                "answers": json.dumps(answers, ensure_ascii=False),
+                "score_details": json.dumps(_score_details(answers, rnd), ensure_ascii=False),
+            })
+            if len(batch) == 1000:
+                conn.execute(_untyped("submissions", batch[0]).insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(_untyped("submissions", batch[0]).insert(), batch)
+
+
+def _db_size(engine, path: str) -> int:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(sa.text("VACUUM"))
+    return os.path.getsize(path)
+
+
+def _measure(engine, db_path: str, tmp: str) -> dict[str, float]:
+    from dictant_backend.admin.routes_exports import _csv_chunks, _export_columns
+    from dictant_backend.extensions import db
+    from dictant_backend.models import Submission
+
+    out = {"db size, MB": _db_size(engine, db_path) / 2**20}
+    db.session.remove()
+
+    t0 = time.perf_counter()
+    for answers, details in db.session.query(Submission.answers, Submission.score_details).yield_per(1000):
+        assert isinstance(answers, dict) and isinstance(details, dict)
+    out["decode answers+details, s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with open(os.path.join(tmp, "export.csv"), "wb") as f:
+        for chunk in _csv_chunks([], _export_columns([])):
+            f.write(chunk)
+    out["csv export, s"] = time.perf_counter() - t0
+    db.session.remove()
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        os.environ["COMPACT_STORAGE_ON_START"] = "0"
+        os.environ["SUBMISSION_ITEMS_BACKFILL_ON_START"] = "0"
+        from dictant_backend.app import create_app
+        from dictant_backend.extensions import db
+        from dictant_backend.services.storage_compaction import compact_all
+
+        app = create_app()
+        with app.app_context():
+            engine = db.engine
+            _fill(engine, args.rows)
+            before = _measure(engine, db_path, tmp)
+
+            t0 = time.perf_counter()
+            compacted = compact_all(batch_size=500)
+            compact_s = time.perf_counter() - t0
+            after = _measure(engine, db_path, tmp)
+
+    print(f"rows={args.rows}, compacted {compacted} rows in {compact_s:.2f}s")
+    for name in before:
+        b, a = before[name], after[name]
+        print(f"{name:<28} before {b:9.3f}  after {a:9.3f}  x{b / a:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Пропускная способность /sessions/submit при одновременной сдаче.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_submit_burst.py --submits 300
+
+Все студенты (у каждого есть строка ActiveSession) отправляют ответы
+одновременно, как при истечении таймера. Сравниваются:
+
+* ``per-request`` — ``GROUP_COMMIT_WINDOW_MS = 0``: каждая отправка
+  коммитит сама (как было раньше, только INSERT и DELETE в одном коммите);
+* ``group`` — групповой коммит с окном ``--window-ms``.
+
+Используется отдельная временная SQLite-база на диске. Если fsync на этой
+машине почти бесплатный (SSD, виртуалка с кэшем), ``--fsync-ms`` добавляет
+задержку к каждому коммиту, имитируя медленный диск.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _prepare_app(db_path: str, fsync_ms: float):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from sqlalchemy import event
+    from dictant_backend.app import create_app
+    from dictant_backend.models import db, Settings
+
+    app = create_app()
+    if fsync_ms > 0:
+        with app.app_context():
+            event.listen(db.engine, "commit", lambda conn: time.sleep(fsync_ms / 1000.0))
+    key = {
+        str(i): {"mnn": f"drug {i}", "forms": ["таблетки"], "indications": ["шизофрения", "мания"]}
+        for i in range(10)
+    }
+    with app.app_context():
+        db.session.add(Settings(session_name="bench", answer_key=json.dumps(key, ensure_ascii=False)))
+        db.session.commit()
+    return app
+
+
+def _add_active(app, mode: str, n: int) -> None:
+    from dictant_backend.models import db, ActiveSession
+
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all([
+            ActiveSession(student_name=f"{mode} {i}", session_name="bench",
+                          start_time=now, last_activity=now, status="active")
+            for i in range(n)
+        ])
+        db.session.commit()
+
+
+def _run(app, mode: str, submits: int, window_ms: float) -> tuple[float, list[float]]:
+    from dictant_backend.services.group_commit import group_committer
+
+    app.config["GROUP_COMMIT_WINDOW_MS"] = window_ms
+    group_committer.init_app(app)
+    _add_active(app, mode, submits)
+
+    client = app.test_client()
+    barrier = threading.Barrier(submits + 1)
+    answers = {str(i): {"mnn": f"drug {i}", "forms": ["таблетки"], "indications": ["мания"]} for i in range(10)}
+
+    def submit(i: int) -> float:
+        barrier.wait()
+        t0 = time.perf_counter()
+        resp = client.post("/sessions/submit", json={
+            "sessionName": "bench",
+            "studentName": f"{mode} {i}",
+            "group": "1",
+            "answers": answers,
+            "autoSubmitted": True,
+        })
+        elapsed = time.perf_counter() - t0
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        return elapsed
+
+    with ThreadPoolExecutor(max_workers=submits) as pool:
+        futures = [pool.submit(submit, i) for i in range(submits)]
+        barrier.wait()
+        t0 = time.perf_counter()
+        samples = [f.result() for f in futures]
+        wall = time.perf_counter() - t0
+    return wall, samples
+
+
+def _report(name: str, wall: float, samples: list[float]) -> None:
+    samples = sorted(samples)
+    q = statistics.quantiles(samples, n=100)
+    print(
+        f"{name:>11}: n={len(samples)} {len(samples) / wall:7.1f} submits/s "
+        f"p50={q[49] * 1000:.1f}ms p95={q[94] * 1000:.1f}ms max={samples[-1] * 1000:.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submits", type=int, default=300)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--fsync-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _prepare_app(os.path.join(tmp, "bench.db"), args.fsync_ms)
+        _report("per-request", *_run(app, "per-request", args.submits, 0))
+        _report("group", *_run(app, "group", args.submits, args.window_ms))
+
+        from dictant_backend.models import ActiveSession, Submission
+        with app.app_context():
+            assert Submission.query.count() == 2 * args.submits
+            assert ActiveSession.query.count() == 0
+
+
+if __name__ == "__main__":
+    main()
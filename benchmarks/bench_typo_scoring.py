@@ -0,0 +1,129 @@
+"""Подсчёт с допуском опечаток: цена индекса TypoMatcher на пакете отправок.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bench_typo_scoring.py --submissions 300 --typo-rate 0.3
+
+Ключ из ``--drugs`` препаратов, пакет отправок (как 300 сдач разом), в
+части ответов — опечатка в одну букву или пробел вместо дефиса. Сравнивает
+score_many по точному совпадению, с допуском через TypoMatcher и с наивным
+перебором: ответ без точного совпадения сравнивается Левенштейном со всеми
+правильными токенами препарата.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dictant_backend.utils.scoring import (  # noqa: E402
+    _bounded_levenshtein, _fold, compile_answer_key, parse_typo_tolerance, score_many,
+)
+
+LETTERS = "абвгдеиклмнопрстуфхц"
+TOLERANCE = "mnn=1,tradeNames=1,indications=1"
+
+
+def _word(rnd: random.Random, n: int) -> str:
+    return "".join(rnd.choice(LETTERS) for _ in range(n))
+
+
+def _key(drugs: int, rnd: random.Random) -> dict:
+    return {
+        f"d{i}": {
+            "mnn": _word(rnd, 10),
+            "tradeNames": [f"{_word(rnd, 7)}-{_word(rnd, 5)}" for _ in range(4)],
+            "forms": ["tablets", "ampoules"],
+            "indications": [f"{_word(rnd, 9)} {_word(rnd, 8)}" for _ in range(5)],
+            "elimination": ["почки"],
+        }
+        for i in range(drugs)
+    }
+
+
+def _typo(s: str, rnd: random.Random) -> str:
+    if "-" in s and rnd.random() < 0.5:
+        return s.replace("-", " ")
+    i = rnd.randrange(len(s))
+    return s[:i] + rnd.choice(LETTERS) + s[i + 1:]
+
+
+def _answers(key: dict, n: int, rate: float, rnd: random.Random) -> list:
+    def maybe(s):
+        return _typo(s, rnd) if rnd.random() < rate else s
+
+    return [
+        {
+            drug_id: {
+                "mnn": maybe(c["mnn"]),
+                "tradeNames": [maybe(t) for t in rnd.sample(c["tradeNames"], 3)],
+                "forms": list(c["forms"]),
+                "indications": [maybe(t) for t in rnd.sample(c["indications"], 4)],
+                "elimination": list(c["elimination"]),
+            }
+            for drug_id, c in key.items()
+        }
+        for _ in range(n)
+    ]
+
+
+def _naive(answers_list: list, key: dict, tolerance: dict) -> int:
+    """Сколько ответов засчитано бы перебором (для сравнения времени)."""
+    hits = 0
+    for answers in answers_list:
+        for drug_id, ans in answers.items():
+            correct = key[drug_id]
+            for category, k in tolerance.items():
+                values = ans.get(category)
+                values = [values] if isinstance(values, str) else values or []
+                truth = correct.get(category)
+                truth = [truth] if isinstance(truth, str) else truth or []
+                truth = [_fold(t.lower()) for t in truth]
+                for v in values:
+                    f = _fold(v.strip().lower())
+                    if f in truth or any(_bounded_levenshtein(f, t, k) is not None for t in truth):
+                        hits += 1
+    return hits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=10)
+    parser.add_argument("--submissions", type=int, default=300)
+    parser.add_argument("--typo-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    key = _key(args.drugs, rnd)
+    answers = _answers(key, args.submissions, args.typo_rate, rnd)
+    tolerance = parse_typo_tolerance(TOLERANCE)
+
+    t0 = time.perf_counter()
+    exact_key = compile_answer_key(key)
+    typo_key = compile_answer_key(key, typo_tolerance=tolerance)
+    compile_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    exact = score_many(answers, exact_key)
+    exact_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    typo = score_many(answers, typo_key)
+    typo_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    _naive(answers, key, tolerance)
+    naive_s = time.perf_counter() - t0
+
+    mean = lambda results: sum(r[0] for r in results) / len(results)  # noqa: E731
+    typos = sum(len(d.get("typos", ())) for _, b in typo for d in b.values())
+    print(f"drugs={args.drugs}, submissions={args.submissions}, typo rate={args.typo_rate}, "
+          f"key compiled in {compile_s * 1000:.1f}ms")
+    print(f"exact match        {exact_s * 1000:7.1f}ms  mean score {mean(exact):.2f}")
+    print(f"TypoMatcher        {typo_s * 1000:7.1f}ms  mean score {mean(typo):.2f}  typos accepted {typos}")
+    print(f"naive levenshtein  {naive_s * 1000:7.1f}ms  (matching only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,30 @@
-from datetime import datetime, timedelta
+import json
 
-from flask import jsonify
+from flask import jsonify, request
 
-from ..models import ActiveSession
-from ..extensions import db
+from ..services.broadcast import active_broadcaster
 from . import admin_bp
 
 
-def _check_stale_sessions() -> None:
-    """Переводит «зависшие» активные сессии в статус 'stale'."""
-    now = datetime.utcnow()
-    stale = ActiveSession.query.filter(
-        ActiveSession.status == "active",
-        ActiveSession.last_activity < now - timedelta(seconds=60),
-    ).all()
-    if not stale:
-        return
-    for st in stale:
-        st.status = "stale"
-    db.session.commit()
-
-
 @admin_bp.route("/active", methods=["GET"])
 def list_active_sessions():
-    """Список текущих сессий (актив + stale)."""
-    _check_stale_sessions()
-    active = ActiveSession.query.order_by(ActiveSession.start_time.asc()).all()
-    results = []
-    for a in active:
-        results.append(
-            {
-                "id": a.id,
-                "studentName": a.student_name,
-                "group": a.group,
-                "sessionName": a.session_name,
-                "startTime": a.start_time.isoformat(),
-                "lastActivity": a.last_activity.isoformat(),
-                "status": a.status,
-            }
-        )
-    return jsonify(results)
+    """
+    Список текущих сессий (актив + stale). Только чтение: stale ставит фоновый sweeper.
+
+    ?sessionName= — только эта комната, X-Active-Seq — номер её последнего
+    active_delta. Без фильтра — все сессии и X-Active-Seqs: {комната: seq}
+    (active_delta нумеруются по комнатам, общего номера нет).
+    """
+    session_name = request.args.get("sessionName") or None
+    if session_name is not None:
+        snapshot = active_broadcaster.snapshot(session_name)
+        resp = jsonify(snapshot["rows"])
+        # с этим номером админка может продолжить по WS в комнате сессии
+        resp.headers["X-Active-Seq"] = str(snapshot["seq"])
+        return resp
 
+    snapshot = active_broadcaster.snapshot(None)
+    resp = jsonify(snapshot["rows"])
+    seqs = {room or "": seq for room, seq in active_broadcaster.seqs().items()}
+    resp.headers["X-Active-Seqs"] = json.dumps(seqs, sort_keys=True)
+    return resp
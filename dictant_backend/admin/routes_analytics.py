@@ -0,0 +1,31 @@
+from flask import jsonify
+
+from ..services.analytics import item_analytics
+from ..services.score_stream import score_stream
+from . import admin_bp
+
+
+@admin_bp.route("/analytics/<session_name>", methods=["GET"])
+def session_analytics(session_name: str):
+    """
+    Сложность заданий сессии: по препаратам и категориям — средний балл,
+    доля промахов (0 баллов) и самые частые неверные ответы.
+    Считается накопительно, без перечитывания отправок.
+    """
+    return jsonify(item_analytics.summary(session_name))
+
+
+@admin_bp.route("/analytics/<session_name>/rebuild", methods=["POST"])
+def rebuild_session_analytics(session_name: str):
+    """Пересобирает агрегаты сессии по истории отправок."""
+    item_analytics.rebuild(session_name)
+    return jsonify(item_analytics.summary(session_name))
+
+
+@admin_bp.route("/scores/<session_name>", methods=["GET"])
+def score_distribution(session_name: str):
+    """
+    Гистограмма и сводка баллов сессии (тот же снимок, что score_snapshot);
+    дальше админка обновляет их по score_delta.
+    """
+    return jsonify(score_stream.snapshot(session_name))
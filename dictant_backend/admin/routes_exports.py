@@ -2,12 +2,17 @@
 
 import json
 import csv
-from io import BytesIO, StringIO
+from io import StringIO
 
-import pandas as pd
-from flask import Blueprint, jsonify, send_file, Response
+import xlsxwriter
+from flask import Blueprint, current_app, jsonify, send_file, Response, request, stream_with_context
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
 
-from ..models import Submission
+from ..extensions import socketio
+from ..models import db, Submission, SubmissionItem
+from ..services.export_cache import export_cache, data_version
+from ..utils.timeparse import parse_date_bound
 
 
 admin_exports_bp = Blueprint("admin_exports", __name__, url_prefix="/admin")
@@ -24,6 +29,13 @@ def _safe_json(val):
         return str(val)
 
 
+def _cell_value(val):
+    """Значение для xlsxwriter: списки/словари из ответов — JSON-строкой (как делал pandas)."""
+    if val is None or isinstance(val, (str, int, float, bool)):
+        return val
+    return _safe_json(val)
+
+
 def _safe_obj(val):
     """Пытаемся распарсить JSON-строку в объект. Если уже объект — вернём как есть."""
     if val is None:
@@ -41,41 +53,97 @@ def _safe_obj(val):
     return {}
 
 
-def _get_submissions_ordered():
+# строк на одну порцию записи / yield_per
+EXPORT_CHUNK_ROWS = 500
+
+# категории из score_details[drug]["details"] для листа «Drugs»
+SCORE_CATEGORIES = [
+    "mnn", "tradeNames", "forms", "formDosages", "indications", "doses", "halfLife", "elimination",
+]
+
+BASE_COLUMNS = [
+    "id", "session_name", "student_name", "group", "start_time", "end_time",
+    "auto_submitted", "warnings_count", "score", "answers_json", "score_details_json",
+]
+SCORE_COLUMNS = ["score_max", "score_raw"]
+
+# варианты ответа, которые предлагает экран диктанта (exam.html): из них
+# колонки по препарату известны до чтения ответов
+ANSWER_FORMS = (
+    "tablets", "capsules", "ointment", "gel", "ampoules",
+    "drops", "powder", "dragee", "spray", "patch",
+)
+DOSE_TYPES = ("min", "avg", "max")
+DOSE_EXTRAS = ("adults", "children", "outpatient", "inpatient")
+
+
+def _export_filters() -> list:
     """
-    У твоей модели Submission нет created_at, поэтому сортируем безопасно.
-    Приоритет:
-      1) start_time (если поле существует)
-      2) id (всегда есть)
+    Необязательные фильтры выгрузки из query string:
+    sessionName, from, to (по start_time).
     """
-    if hasattr(Submission, "start_time"):
-        return Submission.query.order_by(Submission.start_time.asc().nullslast(), Submission.id.asc()).all()
-    return Submission.query.order_by(Submission.id.asc()).all()
+    args = request.args
+    criteria = []
+    if args.get("sessionName"):
+        criteria.append(Submission.session_name == args["sessionName"])
+    if args.get("from"):
+        criteria.append(Submission.start_time >= parse_date_bound(args["from"]))
+    if args.get("to"):
+        criteria.append(Submission.start_time < parse_date_bound(args["to"], upper=True))
+    return criteria
 
 
-def _flatten_submission(sub: Submission) -> dict:
-    answers = _safe_obj(sub.answers)
-    score_details = _safe_obj(sub.score_details)
+def _order(query):
+    # у Submission нет created_at: сортируем по start_time, затем по id
+    return query.order_by(Submission.start_time.asc().nullslast(), Submission.id.asc())
 
-    warnings_obj = _safe_obj(sub.warnings)
-    warnings_count = len(warnings_obj) if isinstance(warnings_obj, list) else 0
 
-    base = {
-        "id": getattr(sub, "id", ""),
-        "session_name": getattr(sub, "session_name", "") or "",
-        "student_name": getattr(sub, "student_name", "") or "",
-        "group": getattr(sub, "group", "") or "",
-        "start_time": sub.start_time.isoformat() if getattr(sub, "start_time", None) else "",
-        "end_time": sub.end_time.isoformat() if getattr(sub, "end_time", None) else "",
-        "auto_submitted": bool(getattr(sub, "auto_submitted", False)),
-        "warnings_count": warnings_count,
-        "score": sub.score if getattr(sub, "score", None) is not None else "",
-        # самое важное — сырой JSON
-        "answers_json": _safe_json(getattr(sub, "answers", "")),
-        "score_details_json": _safe_json(getattr(sub, "score_details", "")),
-    }
+def _iter_submissions(criteria: list):
+    """Отправки по порядку, порциями из БД (без .all())."""
+    return _order(Submission.query.filter(*criteria)).yield_per(EXPORT_CHUNK_ROWS)
+
+
+def _has_submissions(criteria: list) -> bool:
+    return db.session.query(Submission.id).filter(*criteria).first() is not None
 
-    # разворачиваем ответы по препаратам (ключ = drug_id)
+
+def _drug_columns(drug_id: str) -> list[str]:
+    """Колонки ответа на препарат в том же порядке, что у _flatten_answers."""
+    columns = [
+        f"{drug_id}_{name}"
+        for name in ("dictated_type", "mnn", "trade_names", "forms", "indications", "elimination")
+    ]
+    columns += [f"{drug_id}_dosages_{form}" for form in ANSWER_FORMS]
+    for dose_type in DOSE_TYPES:
+        columns.append(f"{drug_id}_dose_{dose_type}_main")
+        columns += [f"{drug_id}_dose_{dose_type}_{extra}" for extra in DOSE_EXTRAS]
+    columns += [f"{drug_id}_half_life_from", f"{drug_id}_half_life_to"]
+    return columns
+
+
+def _export_columns(criteria: list) -> list[str]:
+    """
+    Колонки выгрузки до чтения ответов: препараты — из submission_items
+    (в порядке первого появления), поля препарата — из вариантов экрана.
+    Каждая отправка распаковывается один раз, уже при записи строки;
+    ответы вне этих вариантов остаются только в answers_json.
+    """
+    drug_ids = (
+        db.session.query(SubmissionItem.drug_id)
+        .join(Submission, Submission.id == SubmissionItem.submission_id)
+        .filter(*criteria)
+        .group_by(SubmissionItem.drug_id)
+        .order_by(func.min(SubmissionItem.submission_id))
+    )
+    columns = list(BASE_COLUMNS)
+    for (drug_id,) in drug_ids:
+        columns += _drug_columns(drug_id)
+    return columns + SCORE_COLUMNS
+
+
+def _flatten_answers(answers) -> dict:
+    """Разворачивает ответы по препаратам (ключ = drug_id) в плоские колонки."""
+    base = {}
     if isinstance(answers, dict):
         for drug_id, a in answers.items():
             if not isinstance(a, dict):
@@ -117,67 +185,239 @@ def _flatten_submission(sub: Submission) -> dict:
             if isinstance(hl, dict):
                 base[f"{prefix}_half_life_from"] = hl.get("from", "")
                 base[f"{prefix}_half_life_to"] = hl.get("to", "")
+    return base
 
-    # немного “верхних” полей из score_details (если есть)
+
+def _flatten_score(score_details) -> dict:
+    """Немного «верхних» полей из score_details (если есть)."""
+    base = {}
     if isinstance(score_details, dict):
         if "maxScore" in score_details:
             base["score_max"] = score_details.get("maxScore", "")
         if "rawScore" in score_details:
             base["score_raw"] = score_details.get("rawScore", "")
-
     return base
 
 
-@admin_exports_bp.route("/export", methods=["GET"])
-def export_csv():
-    submissions = _get_submissions_ordered()
-    if not submissions:
-        return jsonify({"error": "Нет данных для экспорта"}), 400
+def _flatten_submission(sub: Submission) -> dict:
+    answers = _safe_obj(sub.answers)
+    score_details = _safe_obj(sub.score_details)
+
+    warnings_obj = _safe_obj(sub.warnings)
+    warnings_count = len(warnings_obj) if isinstance(warnings_obj, list) else 0
 
-    rows = [_flatten_submission(s) for s in submissions]
+    base = {
+        "id": getattr(sub, "id", ""),
+        "session_name": getattr(sub, "session_name", "") or "",
+        "student_name": getattr(sub, "student_name", "") or "",
+        "group": getattr(sub, "group", "") or "",
+        "start_time": sub.start_time.isoformat() if getattr(sub, "start_time", None) else "",
+        "end_time": sub.end_time.isoformat() if getattr(sub, "end_time", None) else "",
+        "auto_submitted": bool(getattr(sub, "auto_submitted", False)),
+        "warnings_count": warnings_count,
+        "score": sub.score if getattr(sub, "score", None) is not None else "",
+        # самое важное — сырой JSON
+        "answers_json": _safe_json(getattr(sub, "answers", "")),
+        "score_details_json": _safe_json(getattr(sub, "score_details", "")),
+    }
+    base.update(_flatten_answers(answers))
+    base.update(_flatten_score(score_details))
+    return base
 
-    # динамический набор колонок
-    all_keys = []
-    seen = set()
-    for r in rows:
-        for k in r.keys():
-            if k not in seen:
-                seen.add(k)
-                all_keys.append(k)
 
+def _csv_chunks(criteria: list, columns: list[str]):
+    """CSV (UTF-8 с BOM — Excel дружит с кириллицей) порциями по EXPORT_CHUNK_ROWS строк."""
     buf = StringIO()
-    writer = csv.DictWriter(buf, fieldnames=all_keys)
+    writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+    buf.write("\ufeff")
     writer.writeheader()
-    for r in rows:
-        writer.writerow(r)
 
-    out = buf.getvalue().encode("utf-8-sig")  # Excel дружит с кириллицей
+    for i, sub in enumerate(_iter_submissions(criteria), 1):
+        writer.writerow(_flatten_submission(sub))
+        if i % EXPORT_CHUNK_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+            # не держим eventlet-хаб, пока пишется большая выгрузка
+            socketio.sleep(0)
+
+    tail = buf.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+
+def _export_params() -> dict:
+    """Параметры, от которых зависит содержимое файла (часть ключа кэша)."""
+    args = request.args
+    sheets = sorted({x.strip() for x in (args.get("sheets") or "").split(",") if x.strip()})
+    return {
+        "sessionName": args.get("sessionName") or None,
+        "from": args.get("from") or None,
+        "to": args.get("to") or None,
+        "sheets": sheets,
+    }
 
-    return Response(
-        out,
-        mimetype="text/csv; charset=utf-8",
-        headers={"Content-Disposition": "attachment; filename=dictant_submissions.csv"},
-    )
 
+def _export_request(kind: str, ext: str, mimetype: str, download_name: str):
+    """
+    Общая часть выгрузок: фильтры, ключ кэша, 304 и файл из кэша.
+    Возвращает (criteria, params, key, готовый ответ или None).
+    """
+    try:
+        criteria = _export_filters()
+    except Exception:
+        return None, None, None, (jsonify({"error": "Invalid query parameters"}), 400)
 
-@admin_exports_bp.route("/export_excel", methods=["GET"])
-def export_excel():
-    submissions = _get_submissions_ordered()
-    if not submissions:
-        return jsonify({"error": "Нет данных для экспорта"}), 400
+    params = _export_params()
+    key = export_cache.make_key(kind, params, data_version(params["sessionName"]))
+    if key in request.if_none_match:
+        return criteria, params, key, Response(status=304, headers={"ETag": f'"{key}"'})
 
-    rows = [_flatten_submission(s) for s in submissions]
-    df = pd.DataFrame(rows)
+    path = export_cache.get(key, ext)
+    if path is not None:
+        return criteria, params, key, _send_cached(path, key, mimetype, download_name)
+    if not _has_submissions(criteria):
+        return criteria, params, key, (jsonify({"error": "Нет данных для экспорта"}), 400)
+    return criteria, params, key, None
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Submissions")
-    output.seek(0)
 
+def _send_cached(path: str, key: str, mimetype: str, download_name: str):
     return send_file(
-        output,
+        path,
+        mimetype=mimetype,
         as_attachment=True,
-        download_name="dictant_submissions.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        download_name=download_name,
+        etag=key,
+        conditional=True,
+        max_age=0,
+    )
+
+
+@admin_exports_bp.route("/export", methods=["GET"])
+def export_csv():
+    """
+    CSV-выгрузка (фильтры: sessionName, from, to) потоком: строки уходят
+    клиенту по мере чтения и параллельно пишутся в кэш выгрузок.
+    """
+    mimetype = "text/csv; charset=utf-8"
+    criteria, _, key, response = _export_request("csv", "csv", mimetype, "dictant_submissions.csv")
+    if response is not None:
+        return response
+
+    chunks = _csv_chunks(criteria, _export_columns(criteria))
+    return Response(
+        stream_with_context(export_cache.stream(key, "csv", chunks)),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": "attachment; filename=dictant_submissions.csv",
+            "ETag": f'"{key}"',
+        },
     )
 
+
+def _write_submissions_sheet(wb, criteria: list, header_fmt) -> None:
+    ws = wb.add_worksheet("Submissions")
+    columns = _export_columns(criteria)
+    ws.write_row(0, 0, columns, header_fmt)
+    for r, sub in enumerate(_iter_submissions(criteria), 1):
+        flat = _flatten_submission(sub)
+        for c, key in enumerate(columns):
+            val = flat.get(key)
+            if val is not None and val != "":
+                ws.write(r, c, _cell_value(val))
+        if r % EXPORT_CHUNK_ROWS == 0:
+            socketio.sleep(0)
+
+
+def _write_drugs_sheet(wb, criteria: list, header_fmt) -> None:
+    """По строке на (отправка, препарат): балл препарата и баллы по категориям."""
+    ws = wb.add_worksheet("Drugs")
+    ws.write_row(0, 0, ["submission_id", "student_name", "group", "drug_id", "score"] + SCORE_CATEGORIES, header_fmt)
+
+    light = _order(
+        Submission.query.options(load_only(
+            Submission.id, Submission.student_name, Submission.group, Submission.score_details,
+        )).filter(*criteria)
+    ).yield_per(EXPORT_CHUNK_ROWS)
+
+    r = 1
+    for sub in light:
+        details = _safe_obj(sub.score_details)
+        if not isinstance(details, dict):
+            continue
+        for drug_id, d in details.items():
+            if not isinstance(d, dict) or "score" not in d:
+                continue
+            cats = d.get("details") or {}
+            row = [sub.id, sub.student_name or "", sub.group or "", drug_id, d.get("score")]
+            for cat in SCORE_CATEGORIES:
+                v = cats.get(cat) if isinstance(cats, dict) else None
+                # formDosages/doses хранят {"total": ...}
+                row.append(v.get("total") if isinstance(v, dict) else v)
+            for c, val in enumerate(row):
+                if val is not None and val != "":
+                    ws.write(r, c, _cell_value(val))
+            r += 1
+
+
+def _write_groups_sheet(wb, criteria: list, header_fmt) -> None:
+    """Сводка по группам — одним GROUP BY в БД."""
+    ws = wb.add_worksheet("Groups")
+    ws.write_row(0, 0, ["group", "submissions", "score_avg", "score_min", "score_max", "auto_submitted"], header_fmt)
+    rows = (
+        db.session.query(
+            Submission.group,
+            func.count(Submission.id),
+            func.avg(Submission.score),
+            func.min(Submission.score),
+            func.max(Submission.score),
+            func.sum(func.coalesce(Submission.auto_submitted, False).cast(db.Integer)),
+        )
+        .filter(*criteria)
+        .group_by(Submission.group)
+        .order_by(Submission.group)
+    )
+    for r, row in enumerate(rows, 1):
+        group, count, avg, mn, mx, auto = row
+        ws.write_row(r, 0, [group or "", count, avg, mn, mx, auto or 0])
+
+
+def _write_xlsx(path: str, criteria: list, sheets: list[str]) -> None:
+    wb = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        # ответы студентов — просто текст, не формулы и не ссылки
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    })
+    header_fmt = wb.add_format({"bold": True})
+    _write_submissions_sheet(wb, criteria, header_fmt)
+    if "drugs" in sheets:
+        _write_drugs_sheet(wb, criteria, header_fmt)
+    if "groups" in sheets:
+        _write_groups_sheet(wb, criteria, header_fmt)
+    wb.close()
+
+
+@admin_exports_bp.route("/export_excel", methods=["GET"])
+def export_excel():
+    """
+    XLSX-выгрузка в режиме constant_memory. Файл собирается фоновой задачей
+    прямо в кэш выгрузок: пока его нет, ответ — 202 с Retry-After, клиент
+    повторяет запрос и получает готовый файл.
+
+    Дополнительные листы: ?sheets=drugs,groups
+    (разбивка баллов по препаратам и сводка по группам).
+    """
+    mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    download_name = "dictant_submissions.xlsx"
+    criteria, params, key, response = _export_request("xlsx", "xlsx", mimetype, download_name)
+    if response is not None:
+        return response
+
+    export_cache.build_in_background(
+        current_app._get_current_object(),
+        key,
+        "xlsx",
+        lambda tmp: _write_xlsx(tmp, criteria, params["sheets"]),
+    )
+    return jsonify({"status": "building"}), 202, {"Retry-After": "2"}
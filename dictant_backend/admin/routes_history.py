@@ -1,17 +1,108 @@
+import base64
 import json
-from flask import jsonify
 
-from ..models import Submission
+from flask import request, jsonify
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+from ..models import db, Submission
+from ..utils.timeparse import parse_iso_time, parse_date_bound
 from . import admin_bp
 
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(sub: Submission) -> str:
+    raw = json.dumps([sub.start_time.isoformat() if sub.start_time else None, sub.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    raw = base64.urlsafe_b64decode(cursor.encode("ascii"))
+    start, sub_id = json.loads(raw)
+    return parse_iso_time(start), int(sub_id)
+
+
+def _warnings_by_type(warnings) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    if isinstance(warnings, list):
+        for w in warnings:
+            t = w.get("type") if isinstance(w, dict) else None
+            counts[t or "other"] = counts.get(t or "other", 0) + 1
+    return counts
+
+
 @admin_bp.route("/sessions", methods=["GET"])
 def list_submissions():
-    """История всех отправленных диктантов."""
-    submissions = Submission.query.order_by(Submission.start_time.desc()).all()
-    results = []
-    for sub in submissions:
-        results.append(
+    """
+    История отправленных диктантов, постранично (новые сверху).
+
+    Параметры: limit, cursor (nextCursor из прошлой страницы), sessionName,
+    group, from/to (по startTime), minScore/maxScore.
+    Полный список предупреждений — /admin/sessions/<id>/warnings.
+    """
+    args = request.args
+    try:
+        limit = min(max(int(args.get("limit", DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        cursor = _decode_cursor(args["cursor"]) if args.get("cursor") else None
+        date_from = parse_date_bound(args["from"], upper=False) if args.get("from") else None
+        date_to = parse_date_bound(args["to"], upper=True) if args.get("to") else None
+        min_score = float(args["minScore"]) if args.get("minScore") else None
+        max_score = float(args["maxScore"]) if args.get("maxScore") else None
+    except Exception:
+        return jsonify({"error": "Invalid query parameters"}), 400
+
+    # answers/score_details в списке не нужны — не тянем их из БД
+    query = Submission.query.options(load_only(
+        Submission.id,
+        Submission.session_name,
+        Submission.student_name,
+        Submission.group,
+        Submission.start_time,
+        Submission.end_time,
+        Submission.warnings,
+        Submission.auto_submitted,
+        Submission.score,
+    ))
+    if args.get("sessionName"):
+        query = query.filter(Submission.session_name == args["sessionName"])
+    if args.get("group"):
+        query = query.filter(Submission.group == args["group"])
+    if date_from is not None:
+        query = query.filter(Submission.start_time >= date_from)
+    if date_to is not None:
+        query = query.filter(Submission.start_time < date_to)
+    if min_score is not None:
+        query = query.filter(Submission.score >= min_score)
+    if max_score is not None:
+        query = query.filter(Submission.score <= max_score)
+
+    # keyset по (start_time desc, id desc); записи без start_time — в конце
+    if cursor is not None:
+        c_start, c_id = cursor
+        if c_start is not None:
+            query = query.filter(or_(
+                Submission.start_time < c_start,
+                and_(Submission.start_time == c_start, Submission.id < c_id),
+                Submission.start_time.is_(None),
+            ))
+        else:
+            query = query.filter(Submission.start_time.is_(None), Submission.id < c_id)
+
+    page = (
+        query.order_by(Submission.start_time.desc().nullslast(), Submission.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    items = []
+    for sub in page:
+        by_type = _warnings_by_type(sub.warnings)
+        items.append(
             {
                 "id": sub.id,
                 "sessionName": sub.session_name,
@@ -19,10 +110,23 @@ def list_submissions():
                 "group": sub.group,
                 "startTime": sub.start_time.isoformat() if sub.start_time else None,
                 "endTime": sub.end_time.isoformat() if sub.end_time else None,
-                "warnings": json.loads(sub.warnings) if sub.warnings else [],
+                "warningsCount": sum(by_type.values()),
+                "warningsByType": by_type,
                 "autoSubmitted": sub.auto_submitted,
                 "score": sub.score,
             }
         )
-    return jsonify(results)
+    return jsonify({
+        "items": items,
+        "nextCursor": _encode_cursor(page[-1]) if has_more else None,
+    })
+
 
+@admin_bp.route("/sessions/<int:submission_id>/warnings", methods=["GET"])
+def get_submission_warnings(submission_id: int):
+    """Полный список предупреждений одной отправки."""
+    sub = db.get_or_404(Submission, submission_id)
+    return jsonify({
+        "id": sub.id,
+        "warnings": sub.warnings if isinstance(sub.warnings, list) else [],
+    })
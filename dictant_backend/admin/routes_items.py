@@ -0,0 +1,92 @@
+from flask import request, jsonify
+import sqlalchemy as sa
+
+from ..models import db, SubmissionItem
+from . import admin_bp
+
+
+GROUPINGS = {
+    "drug": ("drug_id",),
+    "category": ("category",),
+    "drug_category": ("drug_id", "category"),
+}
+MAX_VALUES = 100
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(p.title() for p in rest)
+
+
+@admin_bp.route("/items/stats", methods=["GET"])
+def item_stats():
+    """
+    Средний балл и доля промахов (0 баллов) по препаратам и/или категориям.
+
+    Параметры: sessionName, by = drug | category | drug_category (по умолчанию).
+    Считается в БД по submission_items.
+    """
+    by = request.args.get("by", "drug_category")
+    if by not in GROUPINGS:
+        return jsonify({"error": f"by must be one of {', '.join(GROUPINGS)}"}), 400
+    cols = [getattr(SubmissionItem, c) for c in GROUPINGS[by]]
+
+    query = db.session.query(
+        *cols,
+        sa.func.count().label("answers"),
+        sa.func.avg(SubmissionItem.points).label("mean_points"),
+        sa.func.sum(sa.case((SubmissionItem.points == 0, 1), else_=0)).label("misses"),
+    )
+    if request.args.get("sessionName"):
+        query = query.filter(SubmissionItem.session_name == request.args["sessionName"])
+    rows = query.group_by(*cols).order_by(*cols).all()
+
+    return jsonify([
+        {
+            **{_camel(c): getattr(r, c) for c in GROUPINGS[by]},
+            "answers": r.answers,
+            "meanPoints": r.mean_points,
+            "missRate": (r.misses or 0) / r.answers if r.answers else 0.0,
+        }
+        for r in rows
+    ])
+
+
+@admin_bp.route("/items/values", methods=["GET"])
+def item_values():
+    """
+    Самые частые ответы студентов по препарату и категории.
+
+    Параметры: drugId, category (обязательны), sessionName, wrongOnly=1
+    (только ответы не на полный балл), limit.
+    """
+    args = request.args
+    if not args.get("drugId") or not args.get("category"):
+        return jsonify({"error": "Укажите drugId и category"}), 400
+    try:
+        limit = min(max(int(args.get("limit", 20)), 1), MAX_VALUES)
+    except ValueError:
+        return jsonify({"error": "Invalid query parameters"}), 400
+
+    query = db.session.query(
+        SubmissionItem.value,
+        sa.func.count().label("answers"),
+        sa.func.avg(SubmissionItem.points).label("mean_points"),
+    ).filter(
+        SubmissionItem.drug_id == args["drugId"],
+        SubmissionItem.category == args["category"],
+    )
+    if args.get("sessionName"):
+        query = query.filter(SubmissionItem.session_name == args["sessionName"])
+    if args.get("wrongOnly") == "1":
+        query = query.filter(SubmissionItem.points < 1)
+    rows = (
+        query.group_by(SubmissionItem.value)
+        .order_by(sa.func.count().desc(), SubmissionItem.value)
+        .limit(limit)
+        .all()
+    )
+    return jsonify([
+        {"value": r.value, "answers": r.answers, "meanPoints": r.mean_points}
+        for r in rows
+    ])
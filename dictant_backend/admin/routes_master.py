@@ -0,0 +1,71 @@
+from flask import jsonify, request
+
+from ..extensions import db
+from ..models import MasterDrug, MasterVersion
+from ..services.master_key import version_diff
+from ..services.ru_index import get_ru_index
+from . import admin_bp
+
+
+def _version_dict(v: MasterVersion) -> dict:
+    return {
+        "version": v.id,
+        "digest": v.digest,
+        "source": v.source,
+        "drugs": v.drugs,
+        "added": v.added,
+        "changed": v.changed,
+        "removed": v.removed,
+        "createdAt": v.created_at.isoformat() if v.created_at else None,
+    }
+
+
+@admin_bp.route("/master/versions", methods=["GET"])
+def master_versions():
+    """История загрузок мастер-таблицы, новые сверху."""
+    versions = MasterVersion.query.order_by(MasterVersion.id.desc()).all()
+    return jsonify([_version_dict(v) for v in versions])
+
+
+@admin_bp.route("/master/versions/<int:version>", methods=["GET"])
+def master_version(version: int):
+    """Версия и её разница с предыдущей: drug_id добавленных, изменённых и удалённых."""
+    v = db.session.get(MasterVersion, version)
+    if v is None:
+        return jsonify({"error": "Версия не найдена"}), 404
+    return jsonify({**_version_dict(v), "diff": version_diff(version)})
+
+
+@admin_bp.route("/master/drugs/<drug_id>/history", methods=["GET"])
+def master_drug_history(drug_id: str):
+    """Все записи препарата по версиям (для аудита правок ключа)."""
+    rows = (
+        MasterDrug.query.filter_by(drug_id=drug_id)
+        .order_by(MasterDrug.version_from.asc())
+        .all()
+    )
+    return jsonify([
+        {
+            "versionFrom": r.version_from,
+            "versionTo": r.version_to,
+            "digest": r.digest,
+            "data": r.data,
+        }
+        for r in rows
+    ])
+
+
+@admin_bp.route("/master/suggest", methods=["GET"])
+def master_suggest():
+    """Ближайшие русские названия из мастер-таблицы (?q=...&limit=5) — подсказки при вводе билета."""
+    q = (request.args.get("q") or "").strip()
+    try:
+        limit = min(max(int(request.args.get("limit", 5)), 1), 20)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    index = get_ru_index()
+    hits = index.lookup(q)
+    return jsonify({
+        "exact": [{"drugId": d, "kind": k} for d, k in hits],
+        "suggestions": index.suggest(q, limit) if q else [],
+    })
@@ -0,0 +1,41 @@
+from flask import current_app, request, jsonify
+
+from ..extensions import db
+from ..models import MasterVersion
+from ..services.rescoring import start_rescore, get_job
+from . import admin_bp
+
+
+@admin_bp.route("/rescore", methods=["POST"])
+def rescore_session():
+    """
+    Пересчёт баллов сессии по текущему ключу или по прежней версии
+    мастер-таблицы (masterVersion); фоном, прогресс — по WS.
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        return jsonify({"error": "Invalid or missing JSON"}), 400
+
+    session_name = (data.get("sessionName") or "").strip()
+    if not session_name:
+        return jsonify({"error": "Укажите sessionName"}), 400
+
+    master_version = data.get("masterVersion")
+    if master_version is not None:
+        try:
+            master_version = int(master_version)
+        except (TypeError, ValueError):
+            return jsonify({"error": "masterVersion must be an integer"}), 400
+        if db.session.get(MasterVersion, master_version) is None:
+            return jsonify({"error": "Версия мастер-таблицы не найдена"}), 404
+
+    job = start_rescore(current_app._get_current_object(), session_name, master_version)
+    return jsonify(job.to_dict()), 202
+
+
+@admin_bp.route("/rescore/<job_id>", methods=["GET"])
+def rescore_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Задача не найдена"}), 404
+    return jsonify(job.to_dict())
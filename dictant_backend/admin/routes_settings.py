@@ -4,19 +4,15 @@ from flask import request, jsonify
 
 from ..models import Settings
 from ..extensions import db, socketio
+from ..services.answer_key import invalidate_answer_key
+from ..services.ru_index import RuNameIndex, get_ru_index
+from ..services.settings_snapshot import invalidate_settings_snapshot
 from . import admin_bp
 
 
 _CYR_RE = re.compile(r"[А-Яа-яЁё]")
 
 
-def _norm_ru(s: str) -> str:
-    s = str(s).strip().lower()
-    s = s.replace("ё", "е")
-    s = " ".join(s.split())
-    return s
-
-
 def _validate_ru_only_list(drugs: list) -> tuple[bool, str]:
     if not isinstance(drugs, list):
         return False, "drugs must be a list"
@@ -33,59 +29,31 @@ def _validate_ru_only_list(drugs: list) -> tuple[bool, str]:
     return True, ""
 
 
-def _build_ru_index(answer_key: dict) -> tuple[dict[str, list[str]], dict[str, str]]:
-    """
-    Возвращает:
-    - ru_to_ids: нормализованный RU токен -> list[drug_id] (может быть >1 если в таблице дубликаты)
-    - kind_map: (drug_id + '|' + ru_token) -> 'mnn'|'trade'
-    """
-    ru_to_ids: dict[str, list[str]] = {}
-    kind_map: dict[str, str] = {}
-
-    for drug_id, item in answer_key.items():
-        if not isinstance(item, dict):
-            continue
-
-        inn_ru = _norm_ru(item.get("inn_ru", ""))
-        if inn_ru:
-            ru_to_ids.setdefault(inn_ru, []).append(drug_id)
-            kind_map[f"{drug_id}|{inn_ru}"] = "mnn"
-
-        trade_ru = item.get("trade_names_ru", [])
-        if isinstance(trade_ru, list):
-            for t in trade_ru:
-                tok = _norm_ru(t)
-                if not tok:
-                    continue
-                ru_to_ids.setdefault(tok, []).append(drug_id)
-                kind_map[f"{drug_id}|{tok}"] = "trade"
-
-    return ru_to_ids, kind_map
-
-
-def _resolve_ticket(drugs_ru: list[str], answer_key: dict) -> tuple[list[dict], list[str]]:
+def _resolve_ticket(drugs_ru: list[str], index: RuNameIndex) -> tuple[list[dict], list[str], dict]:
     """
     Возвращает:
     - ticket: list of {drug_id, dictated_ru, dictated_kind}
     - errors: list of strings
+    - suggestions: ненайденное название -> ближайшие из мастер-таблицы
     """
-    ru_to_ids, kind_map = _build_ru_index(answer_key)
-
     errors: list[str] = []
     ticket: list[dict] = []
+    suggestions: dict[str, list[dict]] = {}
 
     used_ids: set[str] = set()
 
     for raw in drugs_ru:
-        tok = _norm_ru(raw)
-        candidates = ru_to_ids.get(tok, [])
+        hits = index.lookup(raw)
 
-        if not candidates:
-            errors.append(f"Не найдено в мастер-таблице: '{raw}'")
+        if not hits:
+            similar = index.suggest(raw)
+            hint = f"; возможно: {', '.join(s['name'] for s in similar)}" if similar else ""
+            errors.append(f"Не найдено в мастер-таблице: '{raw}'{hint}")
+            suggestions[raw] = similar
             continue
 
         # Если найдено несколько — считаем ошибкой (надо чистить дубликаты в таблице)
-        uniq = sorted(set(candidates))
+        uniq = sorted({drug_id for drug_id, _ in hits})
         if len(uniq) > 1:
             errors.append(f"Неоднозначно (несколько drug_id) для '{raw}': {', '.join(uniq)}")
             continue
@@ -95,15 +63,14 @@ def _resolve_ticket(drugs_ru: list[str], answer_key: dict) -> tuple[list[dict],
             errors.append(f"Повтор одного и того же препарата (drug_id={drug_id}) для '{raw}'")
             continue
 
-        dictated_kind = kind_map.get(f"{drug_id}|{tok}", "mnn")
         ticket.append({
             "drug_id": drug_id,
             "dictated_ru": raw.strip(),
-            "dictated_kind": dictated_kind,
+            "dictated_kind": hits[-1][1],
         })
         used_ids.add(drug_id)
 
-    return ticket, errors
+    return ticket, errors, suggestions
 
 
 @admin_bp.route("/settings", methods=["GET"])
@@ -140,14 +107,6 @@ def save_settings():
     if settings is None:
         settings = Settings()
 
-    # подгружаем ключ для сопоставления
-    answer_key = {}
-    if settings.answer_key:
-        try:
-            answer_key = json.loads(settings.answer_key)
-        except Exception:
-            answer_key = {}
-
     if "drugs" in data:
         drugs_ru = data["drugs"]
         ok, msg = _validate_ru_only_list(drugs_ru)
@@ -155,11 +114,12 @@ def save_settings():
             return jsonify({"error": msg}), 400
 
         # Сопоставляем RU -> drug_id, иначе не сохраняем
-        ticket, errors = _resolve_ticket(drugs_ru, answer_key)
+        ticket, errors, suggestions = _resolve_ticket(drugs_ru, get_ru_index())
         if errors:
             return jsonify({
                 "error": "Список препаратов не сохранён: есть проблемы сопоставления",
-                "details": errors
+                "details": errors,
+                "suggestions": suggestions,
             }), 400
 
         settings.drugs = json.dumps(ticket, ensure_ascii=False)
@@ -184,6 +144,8 @@ def save_settings():
 
     db.session.add(settings)
     db.session.commit()
+    invalidate_answer_key()
+    invalidate_settings_snapshot()
 
     payload = {
         "drugs": data.get("drugs", []),
@@ -1,6 +1,8 @@
+import click
 from flask import Flask, send_from_directory
 from .config import Config
 from .extensions import db, socketio, cors
+from .migrations import run_migrations
 
 
 def create_app():
@@ -11,8 +13,71 @@ def create_app():
     db.init_app(app)
     socketio.init_app(app)
 
+    # модели должны быть импортированы до create_all(), иначе таблицы
+    # на свежей базе не создадутся
+    from . import models  # noqa: F401
+
     with app.app_context():
         db.create_all()
+        if app.config.get("AUTO_MIGRATE", True):
+            run_migrations(db.engine)
+            # ключ из Settings.answer_key -> первая версия master_drugs
+            from .services.master_key import fill_ru_indexes, import_legacy_key
+            import_legacy_key()
+            fill_ru_indexes()
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Apply pending schema migrations."""
+        from .services.master_key import fill_ru_indexes, import_legacy_key
+        applied = run_migrations(db.engine)
+        click.echo(f"applied: {applied}" if applied else "database is up to date")
+        if import_legacy_key() is not None:
+            click.echo("settings.answer_key imported as master version 1")
+        indexed = fill_ru_indexes()
+        if indexed:
+            click.echo(f"russian name index built for {indexed} master versions")
+
+    @app.cli.command("db-compact")
+    @click.option("--batch-size", default=500, show_default=True)
+    @click.option("--restart", is_flag=True, help="Scan the whole table again even if a pass has completed.")
+    def db_compact(batch_size, restart):
+        """Re-encode submissions stored in the legacy JSON text format."""
+        from .services.storage_compaction import compact_all
+        click.echo(f"compacted: {compact_all(batch_size, restart=restart)}")
+
+    @app.cli.command("db-backfill-items")
+    @click.option("--batch-size", default=500, show_default=True)
+    @click.option("--restart", is_flag=True, help="Scan the whole table again even if a pass has completed.")
+    def db_backfill_items(batch_size, restart):
+        """Build submission_items rows for submissions that have none."""
+        from .services.submission_items import backfill_all
+        click.echo(f"submissions: {backfill_all(batch_size, restart=restart)}")
+
+    from .services.activity import activity_buffer
+    from .services.analytics import item_analytics
+    from .services.broadcast import active_broadcaster
+    from .services.drafts import draft_store
+    from .services.export_cache import export_cache
+    from .services.group_commit import group_committer
+    from .services.idempotency import submit_dedupe
+    from .services.score_stream import score_stream
+    from .services.storage_compaction import storage_compactor
+    from .services.submission_items import items_backfill
+    from .services.submit_queue import submit_queue
+    from .services.sweeper import stale_sweeper
+    activity_buffer.init_app(app)
+    active_broadcaster.init_app(app)
+    score_stream.init_app(app)
+    draft_store.init_app(app)
+    stale_sweeper.init_app(app)
+    export_cache.init_app(app)
+    group_committer.init_app(app)
+    submit_dedupe.init_app(app)
+    submit_queue.init_app(app)
+    item_analytics.init_app(app)
+    storage_compactor.init_app(app)
+    items_backfill.init_app(app)
 
     # Register Blueprints
     from .admin import admin_bp
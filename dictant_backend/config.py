@@ -20,4 +20,105 @@ class Config:
         'sqlite:///dictant.db'
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Apply pending schema migrations (see ``migrations.py``) on startup.
+    # Disable to run them explicitly with ``flask --app app db-upgrade``.
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') != '0'
 
+    # Student heartbeats are buffered in memory and written to
+    # ``active_sessions`` in one batched UPDATE every N seconds. Set to 0 to
+    # write every heartbeat immediately.
+    ACTIVITY_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 5))
+
+    # Changes to the active-students list are batched per session room for
+    # this many seconds and sent to admins as one ``active_delta`` message.
+    ACTIVE_BROADCAST_WINDOW = float(os.environ.get('ACTIVE_BROADCAST_WINDOW', 0.25))
+
+    # A background task marks active sessions as 'stale' when there has been
+    # no activity for STALE_SESSION_THRESHOLD seconds. It runs every
+    # STALE_SWEEP_INTERVAL seconds (0 disables it).
+    STALE_SESSION_THRESHOLD = float(os.environ.get('STALE_SESSION_THRESHOLD', 60))
+    STALE_SWEEP_INTERVAL = float(os.environ.get('STALE_SWEEP_INTERVAL', 10))
+
+    # Finished CSV/XLSX exports are cached on disk, keyed by the filter
+    # parameters and the data version. Defaults to <instance>/export_cache.
+    EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR')
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+    # Bulk rescoring (POST /admin/rescore): submissions per batched UPDATE
+    # and number of worker processes for scoring (0 = score in-process).
+    # The process pool is only used with the 'threading' async mode; under
+    # eventlet (the default) the job always scores in-process.
+    RESCORE_BATCH_SIZE = int(os.environ.get('RESCORE_BATCH_SIZE', 200))
+    RESCORE_WORKERS = int(os.environ.get('RESCORE_WORKERS', 0))
+
+    # Submission handling: 'sync' scores and stores each submission inside
+    # the request; 'queue' appends it to the submission_journal table,
+    # answers 202 with a receipt (GET /sessions/submit/<receipt>) and lets a
+    # background worker process the journal in batches.
+    SUBMIT_MODE = os.environ.get('SUBMIT_MODE', 'sync')
+    SUBMIT_QUEUE_INTERVAL = float(os.environ.get('SUBMIT_QUEUE_INTERVAL', 0.2))
+    SUBMIT_QUEUE_BATCH_SIZE = int(os.environ.get('SUBMIT_QUEUE_BATCH_SIZE', 200))
+    # Processed journal rows are kept this long for status lookups.
+    SUBMIT_JOURNAL_RETENTION_HOURS = float(os.environ.get('SUBMIT_JOURNAL_RETENTION_HOURS', 24))
+
+    # Synchronous submits arriving within this many milliseconds are written
+    # (Submission insert + ActiveSession delete) in one transaction, up to
+    # GROUP_COMMIT_MAX_BATCH submissions. Set the window to 0 to commit each
+    # submission on its own.
+    GROUP_COMMIT_WINDOW_MS = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 5))
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+
+    # Retried submits with the same submission id return the original
+    # result. Recently seen ids are kept in an in-memory LRU of this size;
+    # older ones are found through the database index.
+    SUBMIT_DEDUPE_CACHE_SIZE = int(os.environ.get('SUBMIT_DEDUPE_CACHE_SIZE', 10000))
+
+    # Draft autosave: deltas are applied in memory and drafts are written to
+    # the drafts table every DRAFT_FLUSH_INTERVAL seconds (0 = immediately).
+    # DRAFT_MAX_OPS caps the number of operations in one delta.
+    DRAFT_FLUSH_INTERVAL = float(os.environ.get('DRAFT_FLUSH_INTERVAL', 5))
+    DRAFT_MAX_OPS = int(os.environ.get('DRAFT_MAX_OPS', 200))
+
+    # Submission answers/warnings/score_details are stored as compressed
+    # compact JSON. Rows written in the old text format are re-encoded in
+    # the background at startup, COMPACT_STORAGE_BATCH_SIZE rows per commit
+    # (or by hand with `flask --app app db-compact`).
+    COMPACT_STORAGE_ON_START = os.environ.get('COMPACT_STORAGE_ON_START', '1') != '0'
+    COMPACT_STORAGE_BATCH_SIZE = int(os.environ.get('COMPACT_STORAGE_BATCH_SIZE', 500))
+
+    # Every scored submission is also stored as normalized per-drug,
+    # per-category rows (submission_items) for the /admin/items/* aggregates.
+    # Submissions saved before that table existed are backfilled in the
+    # background at startup (or with `flask --app app db-backfill-items`).
+    SUBMISSION_ITEMS_BACKFILL_ON_START = os.environ.get('SUBMISSION_ITEMS_BACKFILL_ON_START', '1') != '0'
+    SUBMISSION_ITEMS_BATCH_SIZE = int(os.environ.get('SUBMISSION_ITEMS_BATCH_SIZE', 500))
+
+    # Item-difficulty analytics (/admin/analytics/<session>) are kept as
+    # running aggregates in memory and written to the session_analytics
+    # table every ANALYTICS_FLUSH_INTERVAL seconds (0 = on every submission).
+    # Most common wrong answers are tracked with ANALYTICS_TOPK_CAPACITY
+    # counters per drug and category; ANALYTICS_TOP_WRONG of them are shown.
+    ANALYTICS_FLUSH_INTERVAL = float(os.environ.get('ANALYTICS_FLUSH_INTERVAL', 10))
+    ANALYTICS_TOPK_CAPACITY = int(os.environ.get('ANALYTICS_TOPK_CAPACITY', 32))
+    ANALYTICS_TOP_WRONG = int(os.environ.get('ANALYTICS_TOP_WRONG', 5))
+
+    # Live score distribution per session (score_delta over Socket.IO):
+    # histogram columns over 0..10 points and the coalescing window for
+    # deltas, in seconds (0 = send on every submission).
+    SCORE_HISTOGRAM_BINS = int(os.environ.get('SCORE_HISTOGRAM_BINS', 10))
+    SCORE_BROADCAST_WINDOW = float(os.environ.get('SCORE_BROADCAST_WINDOW', 0.5))
+
+    # Typos forgiven when scoring, per category, as "category=edits" pairs
+    # (mnn, tradeNames, forms, indications, elimination; at most 2 edits),
+    # e.g. "mnn=1,tradeNames=1". Off by default: it changes scores.
+    # Words shorter than 5 letters, or 4 letters per allowed edit, are
+    # matched exactly, as are key words within the tolerance of another
+    # drug's word. Changing it changes the answer-key version, so
+    # /admin/rescore picks up sessions scored with the old setting.
+    SCORING_TYPO_TOLERANCE = os.environ.get('SCORING_TYPO_TOLERANCE', '')
+
+    # Relative tolerance for numbers when scoring form dosages, daily doses
+    # and half-life (0.05 = 5%; 0 = exact). Dosages are compared as values
+    # with units, so "0,5 г" matches "500 мг" at any tolerance. Like the typo
+    # setting, it is part of the answer-key version.
+    SCORING_NUMERIC_TOLERANCE = float(os.environ.get('SCORING_NUMERIC_TOLERANCE', 0))
@@ -0,0 +1,196 @@
+"""Lightweight versioned schema migrations.
+
+``db.create_all()`` only creates missing tables; it never adds columns or
+indexes to tables that already exist. This module fills that gap without
+pulling in Alembic: every migration is a numbered function that receives a
+connection inside its own transaction, and applied versions are recorded
+in the ``schema_migrations`` table.
+
+Migrations must be idempotent (check before create), because a fresh
+database already gets the current schema from ``create_all()`` and the
+migrations then only record their version.
+
+Migrations run automatically from ``create_app`` (unless ``AUTO_MIGRATE``
+is disabled) and can be run by hand with ``flask --app app db-upgrade``.
+
+Long data passes (re-encoding old rows, building derived rows) are too slow
+to run inside a migration transaction; they run in batches in the
+background and keep their progress in the ``data_tasks`` table, so a
+restart resumes where the last run stopped and a finished pass is never
+rescanned.
+"""
+
+from datetime import datetime
+from typing import Callable
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+
+_meta = sa.MetaData()
+schema_migrations = sa.Table(
+    "schema_migrations",
+    _meta,
+    sa.Column("version", sa.Integer, primary_key=True),
+    sa.Column("name", sa.String(200), nullable=False),
+    sa.Column("applied_at", sa.DateTime, nullable=False),
+)
+data_tasks = sa.Table(
+    "data_tasks",
+    _meta,
+    sa.Column("name", sa.String(100), primary_key=True),
+    sa.Column("last_id", sa.Integer, nullable=False, default=0),
+    sa.Column("completed_at", sa.DateTime, nullable=True),
+)
+
+
+# ---------------------------
+# Helpers for migrations
+# ---------------------------
+
+def _has_index(conn: Connection, table: str, name: str) -> bool:
+    return any(ix["name"] == name for ix in sa.inspect(conn).get_indexes(table))
+
+
+def create_index(conn: Connection, name: str, table: str, *columns: str, unique: bool = False) -> None:
+    """Create an index unless an index with this name already exists."""
+    if _has_index(conn, table, name):
+        return
+    t = sa.Table(table, sa.MetaData(), *(sa.Column(c) for c in columns))
+    sa.Index(name, *(t.c[c] for c in columns), unique=unique).create(conn)
+
+
+def add_column(conn: Connection, table: str, column: sa.Column) -> None:
+    """``ALTER TABLE ... ADD COLUMN`` unless the column already exists."""
+    if any(c["name"] == column.name for c in sa.inspect(conn).get_columns(table)):
+        return
+    col_type = column.type.compile(dialect=conn.dialect)
+    ddl = f"ALTER TABLE {conn.dialect.identifier_preparer.quote(table)} ADD COLUMN " \
+          f"{conn.dialect.identifier_preparer.quote(column.name)} {col_type}"
+    conn.execute(sa.text(ddl))
+
+
+# ---------------------------
+# Migrations
+# ---------------------------
+
+def _m001_hot_path_indexes(conn: Connection) -> None:
+    """Indexes for active-session lookups, the stale sweep and history listing."""
+    # start_session relies on one row per (student, session); remove
+    # duplicates left by older versions before enforcing it.
+    conn.execute(sa.text(
+        "DELETE FROM active_sessions WHERE id NOT IN ("
+        " SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM active_sessions"
+        " GROUP BY student_name, session_name) AS keep)"
+    ))
+    create_index(conn, "uq_active_sessions_student_session", "active_sessions",
+                 "student_name", "session_name", unique=True)
+    create_index(conn, "ix_active_sessions_status_last_activity", "active_sessions",
+                 "status", "last_activity")
+    create_index(conn, "ix_submissions_session_start", "submissions", "session_name", "start_time")
+    create_index(conn, "ix_submissions_start_id", "submissions", "start_time", "id")
+
+
+def _m002_submission_key_version(conn: Connection) -> None:
+    """Answer-key version each score was computed with (bulk rescoring)."""
+    add_column(conn, "submissions", sa.Column("key_version", sa.String(32)))
+
+
+def _m003_client_submission_ids(conn: Connection) -> None:
+    """Client submission ids for idempotent submit."""
+    add_column(conn, "submissions", sa.Column("client_submission_id", sa.String(64)))
+    create_index(conn, "uq_submissions_client_submission_id", "submissions",
+                 "client_submission_id", unique=True)
+    if sa.inspect(conn).has_table("submission_journal"):
+        add_column(conn, "submission_journal", sa.Column("client_submission_id", sa.String(64)))
+        create_index(conn, "uq_submission_journal_client_submission_id", "submission_journal",
+                     "client_submission_id", unique=True)
+
+
+def _m004_binary_json_columns(conn: Connection) -> None:
+    """Submission JSON columns hold encoded bytes (utils.jsoncodec) instead of text."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        return  # SQLite stores BLOBs in TEXT columns as is
+    q = conn.dialect.identifier_preparer.quote
+    types = {c["name"]: c["type"] for c in sa.inspect(conn).get_columns("submissions")}
+    for col in ("answers", "warnings", "score_details"):
+        if isinstance(types.get(col), sa.LargeBinary):
+            continue  # fresh database: create_all() already made it binary
+        if dialect == "postgresql":
+            conn.execute(sa.text(
+                f"ALTER TABLE submissions ALTER COLUMN {q(col)} TYPE BYTEA "
+                f"USING convert_to({q(col)}, 'UTF8')"
+            ))
+        elif dialect in ("mysql", "mariadb"):
+            conn.execute(sa.text(f"ALTER TABLE submissions MODIFY {q(col)} LONGBLOB"))
+
+
+def _m005_master_ru_index(conn: Connection) -> None:
+    """Russian-name index stored with each master-table version."""
+    add_column(conn, "master_versions", sa.Column("ru_index", sa.LargeBinary))
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "hot_path_indexes", _m001_hot_path_indexes),
+    (2, "submission_key_version", _m002_submission_key_version),
+    (3, "client_submission_ids", _m003_client_submission_ids),
+    (4, "binary_json_columns", _m004_binary_json_columns),
+    (5, "master_ru_index", _m005_master_ru_index),
+]
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.begin() as conn:
+        _meta.create_all(conn, tables=[schema_migrations, data_tasks])
+        return set(conn.execute(sa.select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """Apply pending migrations in order. Returns the versions applied now."""
+    done = applied_versions(engine)
+    applied = []
+    for version, name, fn in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow(),
+                ))
+        except IntegrityError:
+            # another worker applied the same version concurrently
+            continue
+        applied.append(version)
+    return applied
+
+
+# ---------------------------
+# Background data tasks
+# ---------------------------
+
+def task_progress(conn: Connection, name: str) -> tuple[int, bool]:
+    """(last processed id, completed) of a batched data task."""
+    _meta.create_all(conn, tables=[data_tasks])
+    row = conn.execute(
+        sa.select(data_tasks.c.last_id, data_tasks.c.completed_at).where(data_tasks.c.name == name)
+    ).first()
+    if row is None:
+        return 0, False
+    return row.last_id, row.completed_at is not None
+
+
+def save_task_progress(conn: Connection, name: str, last_id: int, completed: bool = False) -> None:
+    """Record progress of a data task; the caller commits."""
+    values = {"last_id": last_id, "completed_at": datetime.utcnow() if completed else None}
+    updated = conn.execute(
+        data_tasks.update().where(data_tasks.c.name == name).values(**values)
+    ).rowcount
+    if not updated:
+        conn.execute(data_tasks.insert().values(name=name, **values))
@@ -13,14 +13,25 @@ primary models are defined:
 * :class:`Submission` records each submission from a student. It captures
   identifying information about the student, the name of the session under
   which the submission took place, timestamps for the start and end of the
-  test, any warnings (stored as JSON), the answers provided (also JSON),
+  test, any warnings, the answers provided (both stored as compressed JSON),
   and whether the submission was sent automatically (due to inactivity or
   time expiry) or manually by the student.
+
+:class:`ActiveSession` tracks students currently writing,
+:class:`SubmissionJournal` is the durable submit queue used when
+submissions are processed asynchronously, :class:`Draft` holds
+autosaved answers of students who have not submitted yet,
+:class:`SubmissionItem` is a normalized per-drug, per-category copy of
+each scored submission for SQL-side analytics, and
+:class:`SessionAnalytics` persists the running item-difficulty aggregates
+of a session, and :class:`MasterVersion` / :class:`MasterDrug` hold the
+master table as per-drug rows versioned by upload.
 """
 
 from datetime import datetime  # можно оставить, если где-то пригодится
 
 from .extensions import db  # <-- ключевое: используем общий db
+from .utils.jsoncodec import CompressedJSON
 
 
 class Settings(db.Model):
@@ -48,12 +59,21 @@ class Settings(db.Model):
     # structure is a dictionary where each key is a string index ("0".."9")
     # and the value contains the correct answers for that drug (mnn,
     # trade names, forms, indications, doses, half-life and elimination).
+    # Legacy: the key now lives in ``master_drugs``; a value left here by an
+    # older release is imported as the first master version and cleared.
     answer_key = db.Column(db.Text, nullable=True)
 
 
 class Submission(db.Model):
     """Represents a completed or automatically submitted test from a student."""
     __tablename__ = "submissions"
+    # Existing databases get these indexes from ``migrations.py``; keep the
+    # names in sync.
+    __table_args__ = (
+        db.Index("ix_submissions_session_start", "session_name", "start_time"),
+        db.Index("ix_submissions_start_id", "start_time", "id"),
+        db.Index("uq_submissions_client_submission_id", "client_submission_id", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     # Name of the session at the time of submission
@@ -66,10 +86,12 @@ class Submission(db.Model):
     start_time = db.Column(db.DateTime, nullable=True)
     # ISO timestamp when the student finished or was auto-submitted
     end_time = db.Column(db.DateTime, nullable=True)
-    # JSON encoded list of warnings (each warning can be a dict with type/time)
-    warnings = db.Column(db.Text, nullable=True)
-    # JSON encoded dict of answers
-    answers = db.Column(db.Text, nullable=True)
+    # List of warnings (each warning can be a dict with type/time). The JSON
+    # columns of this model are stored compressed (see ``utils.jsoncodec``)
+    # but read and written as plain Python objects.
+    warnings = db.Column(CompressedJSON, nullable=True)
+    # Dict of answers
+    answers = db.Column(CompressedJSON, nullable=True)
     # Whether the submission was automatically sent (True) or manually (False)
     auto_submitted = db.Column(db.Boolean, default=False)
 
@@ -78,15 +100,30 @@ class Submission(db.Model):
     # automatic scoring is disabled.
     score = db.Column(db.Float, nullable=True)
 
-    # Optional JSON encoded breakdown of the score for each drug and
-    # category. This can be used for detailed reporting. The format is a
-    # dictionary keyed by drug index with nested details about how each
-    # component of the answer was graded.
-    score_details = db.Column(db.Text, nullable=True)
+    # Optional breakdown of the score for each drug and category. This can
+    # be used for detailed reporting. The format is a dictionary keyed by
+    # drug index with nested details about how each component of the
+    # answer was graded.
+    score_details = db.Column(CompressedJSON, nullable=True)
+
+    # Version of the answer key (see ``services.answer_key``) that ``score``
+    # and ``score_details`` were computed with. Used by bulk rescoring to
+    # skip submissions that are already up to date.
+    key_version = db.Column(db.String(32), nullable=True)
+
+    # Client-generated id of the submit attempt (or a hash of
+    # student/session/startTime). Retries with the same id return the
+    # original result instead of inserting a duplicate.
+    client_submission_id = db.Column(db.String(64), nullable=True)
 
 
 class ActiveSession(db.Model):
     __tablename__ = "active_sessions"
+    # Индексы дублируются в migrations.py для существующих баз.
+    __table_args__ = (
+        db.Index("uq_active_sessions_student_session", "student_name", "session_name", unique=True),
+        db.Index("ix_active_sessions_status_last_activity", "status", "last_activity"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -109,3 +146,162 @@ class ActiveSession(db.Model):
     # Можешь при желании хранить прогресс
     # например процент заполненных полей, если надо
 
+
+class SubmissionJournal(db.Model):
+    """Durable queue of accepted-but-not-yet-processed submissions.
+
+    With ``SUBMIT_MODE = 'queue'`` the submit endpoint only stores the raw
+    payload here and returns the receipt; a background worker turns pending
+    rows into :class:`Submission` records (see ``services.submit_queue``).
+    The journal row is marked done in the same transaction that inserts the
+    submission, so replaying pending rows after a crash never duplicates.
+    """
+    __tablename__ = "submission_journal"
+    __table_args__ = (
+        db.Index("ix_submission_journal_status_id", "status", "id"),
+        db.Index("uq_submission_journal_client_submission_id", "client_submission_id", unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Opaque id returned to the client (GET /sessions/submit/<receipt>)
+    receipt = db.Column(db.String(32), nullable=False, unique=True)
+    # JSON encoded submit payload (answers already in answer-key order)
+    payload = db.Column(db.Text, nullable=False)
+    # Same as Submission.client_submission_id
+    client_submission_id = db.Column(db.String(64), nullable=True)
+    # pending | done | failed
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    created_at = db.Column(db.DateTime, nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    # Filled in once the submission has been written
+    submission_id = db.Column(db.Integer, nullable=True)
+    score = db.Column(db.Float, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+
+class Draft(db.Model):
+    """Server-side autosave of a student's unfinished answers.
+
+    Written behind from the in-memory store in ``services.drafts`` and
+    removed once the student submits.
+    """
+    __tablename__ = "drafts"
+    __table_args__ = (
+        db.Index("uq_drafts_student_session", "student_name", "session_name", unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_name = db.Column(db.String(200), nullable=False)
+    session_name = db.Column(db.String(200), nullable=False)
+    # Compact JSON of the answers dict (same shape as Submission.answers)
+    answers = db.Column(db.Text, nullable=False)
+    # Number of delta batches applied so far
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class SubmissionItem(db.Model):
+    """One scored category of one drug in a submission.
+
+    Derived from ``Submission.answers`` and ``score_details`` (see
+    ``services.submission_items``) so that per-drug and per-category
+    statistics are a ``GROUP BY`` instead of decoding every submission.
+    Written in the same transaction as the submission, replaced on
+    rescoring and backfilled for older rows.
+    """
+    __tablename__ = "submission_items"
+    __table_args__ = (
+        db.Index("ix_submission_items_submission", "submission_id"),
+        # covering indexes for the aggregates (points read from the index)
+        db.Index("ix_submission_items_session_drug_category", "session_name", "drug_id", "category", "points"),
+        db.Index("ix_submission_items_drug_category", "drug_id", "category", "points"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, nullable=False)
+    # Copied from the submission to filter aggregates without a join
+    session_name = db.Column(db.String(200), nullable=True)
+    # Key of the drug in the answer key / answers dict
+    drug_id = db.Column(db.String(64), nullable=False)
+    # mnn | tradeNames | forms | formDosages | indications | doses | halfLife | elimination
+    category = db.Column(db.String(32), nullable=False)
+    # Points for the category, 0..1 (the "total" for formDosages/doses)
+    points = db.Column(db.Float, nullable=False)
+    # Student's answer as compared by scoring (``utils.scoring.normalized_value``)
+    value = db.Column(db.Text, nullable=True)
+
+
+class SessionAnalytics(db.Model):
+    """Persisted running aggregates behind ``/admin/analytics/<session>``.
+
+    Maintained in memory by ``services.analytics`` from every submission's
+    score breakdown and written here periodically, so the endpoint never
+    rescans submissions. ``submissions`` and ``last_submission_id`` tell
+    whether the saved state has fallen behind the submissions table.
+    """
+    __tablename__ = "session_analytics"
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_name = db.Column(db.String(200), nullable=False, unique=True)
+    # Answer-key version of the most recent submission counted
+    key_version = db.Column(db.String(32), nullable=True)
+    # Number of submissions included in ``state``
+    submissions = db.Column(db.Integer, nullable=False, default=0)
+    # Highest submission id included in ``state``
+    last_submission_id = db.Column(db.Integer, nullable=False, default=0)
+    # Counters and top-k sketches (see ``services.analytics``)
+    state = db.Column(CompressedJSON, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class MasterVersion(db.Model):
+    """One upload of the master table that changed at least one drug.
+
+    Versions are numbered by ``id``; the drugs of a version are the
+    ``MasterDrug`` rows valid at it. ``digest`` identifies the full key
+    content and is what submissions store as ``key_version``.
+    """
+    __tablename__ = "master_versions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(32), nullable=False, index=True)
+    # Name of the uploaded file ("settings.answer_key" for the legacy import)
+    source = db.Column(db.String(255), nullable=True)
+    # Number of drugs in this version and the diff against the previous one
+    drugs = db.Column(db.Integer, nullable=False, default=0)
+    added = db.Column(db.Integer, nullable=False, default=0)
+    changed = db.Column(db.Integer, nullable=False, default=0)
+    removed = db.Column(db.Integer, nullable=False, default=0)
+    # [[russian name, drug_id, "mnn" | "trade"], ...] for ticket resolution
+    # (see ``services.ru_index``); built at upload
+    ru_index = db.Column(CompressedJSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+class MasterDrug(db.Model):
+    """Answer-key entry of one drug, valid for a range of master versions.
+
+    A row is valid from ``version_from`` up to, but not including,
+    ``version_to``; the current row of a drug has ``version_to`` NULL.
+    An upload only closes and inserts rows for drugs whose content
+    (``digest``) changed, so older versions stay readable for rescoring
+    and audit.
+    """
+    __tablename__ = "master_drugs"
+    __table_args__ = (
+        db.Index("uq_master_drugs_drug_version", "drug_id", "version_from", unique=True),
+        db.Index("ix_master_drugs_current", "version_to", "drug_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    drug_id = db.Column(db.String(64), nullable=False)
+    version_from = db.Column(db.Integer, nullable=False)
+    version_to = db.Column(db.Integer, nullable=True)
+    # sha256 of the canonical JSON of ``data``
+    digest = db.Column(db.String(64), nullable=False)
+    # Russian names copied out of ``data`` for ticket resolution; the
+    # (normalized, single-line) trade names are joined with newlines
+    inn_ru = db.Column(db.String(255), nullable=True)
+    trade_names_ru = db.Column(db.Text, nullable=True)
+    # The entry as built by ``utils.master_table.convert_master_row``
+    data = db.Column(CompressedJSON, nullable=False)
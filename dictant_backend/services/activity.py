@@ -0,0 +1,130 @@
+"""Буфер heartbeat-событий студентов (write-behind).
+
+``student_activity`` приходит от каждого студента каждые несколько секунд.
+Вместо SELECT + UPDATE + commit на каждое событие запоминаем время
+последней активности в памяти и раз в ``ACTIVITY_FLUSH_INTERVAL`` секунд
+пишем всё накопленное в ``ActiveSession`` одним пакетным UPDATE.
+
+Сброс делает фоновая задача socketio; кроме того, touch() сам сбрасывает
+буфер, если с прошлого сброса прошло больше интервала (на случай, когда
+фоновые задачи не крутятся, например под dev-сервером). При остановке
+процесса буфер сбрасывается через atexit. ``ACTIVITY_FLUSH_INTERVAL <= 0``
+возвращает прежнее поведение: запись сразу.
+"""
+
+import atexit
+import threading
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from ..extensions import db, socketio
+from ..models import ActiveSession
+from .broadcast import active_broadcaster, serialize_active
+
+
+class ActivityBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (student_name, session_name) -> время последней активности
+        self._pending: dict[tuple[str, str], datetime] = {}
+        self._interval = 5.0
+        self._last_flush = time.monotonic()
+
+    def init_app(self, app) -> None:
+        self._interval = float(app.config.get("ACTIVITY_FLUSH_INTERVAL", 5.0))
+        if self._interval > 0:
+            socketio.start_background_task(self._run, app)
+        atexit.register(self._flush_on_exit, app)
+
+    # ---------------------------
+    # Запись
+    # ---------------------------
+
+    def touch(self, student_name: str, session_name: str, when: datetime | None = None) -> None:
+        """Запоминает активность студента; в БД попадёт при следующем сбросе."""
+        with self._lock:
+            self._pending[(student_name, session_name)] = when or datetime.utcnow()
+        if time.monotonic() - self._last_flush >= self._interval:
+            self.flush()
+
+    def discard(self, student_name: str, session_name: str) -> None:
+        """Забывает несброшенную активность (сессия создана заново или закрыта)."""
+        with self._lock:
+            self._pending.pop((student_name, session_name), None)
+
+    def flush(self) -> int:
+        """Пишет накопленную активность в БД. Возвращает число событий в пакете."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        t = ActiveSession.__table__
+        stmt = (
+            sa.update(t)
+            .where(
+                t.c.student_name == sa.bindparam("b_student"),
+                t.c.session_name == sa.bindparam("b_session"),
+            )
+            .values(last_activity=sa.bindparam("b_last"), status="active")
+        )
+        params = [
+            {"b_student": student, "b_session": session, "b_last": last}
+            for (student, session), last in pending.items()
+        ]
+        try:
+            db.session.execute(stmt, params)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._restore(pending)
+            raise
+
+        self._broadcast(pending)
+        return len(pending)
+
+    def _broadcast(self, pending: dict) -> None:
+        by_room: dict[str, list[str]] = {}
+        for student, session in pending:
+            by_room.setdefault(session, []).append(student)
+        for session, students in by_room.items():
+            rows = ActiveSession.query.filter(
+                ActiveSession.session_name == session,
+                ActiveSession.student_name.in_(students),
+            ).all()
+            for a in rows:
+                active_broadcaster.changed(session, serialize_active(a))
+
+    def _restore(self, pending: dict) -> None:
+        # не теряем heartbeat'ы при ошибке записи: вернём их в буфер,
+        # не затирая более свежие
+        with self._lock:
+            for k, last in pending.items():
+                if k not in self._pending or self._pending[k] < last:
+                    self._pending[k] = last
+
+    # ---------------------------
+    # Фоновый сброс
+    # ---------------------------
+
+    def _run(self, app) -> None:
+        while True:
+            socketio.sleep(self._interval)
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    app.logger.exception("activity flush failed")
+
+    def _flush_on_exit(self, app) -> None:
+        with app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception("activity flush on shutdown failed")
+
+
+activity_buffer = ActivityBuffer()
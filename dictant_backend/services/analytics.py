@@ -0,0 +1,382 @@
+"""Сложность заданий по сессии: накопительные агрегаты для /admin/analytics.
+
+Для каждой сессии в памяти держатся счётчики (число ответов, сумма баллов,
+число промахов) по препаратам, по категориям и по парам
+(препарат, категория), а для пар — ещё и top-k частых неверных ответов
+(Space-Saving, ``ANALYTICS_TOPK_CAPACITY`` счётчиков). Каждая записанная
+отправка добавляется к ним по своему breakdown из compute_score, так что
+эндпоинт не перечитывает отправки.
+
+Состояние сохраняется в ``session_analytics`` отложенно, раз в
+``ANALYTICS_FLUSH_INTERVAL`` секунд (фоновая задача + atexit, как у
+черновиков). Если сессии нет в памяти (после рестарта или выгрузки),
+новая отправка подгружает её сохранённое состояние, а чтение догоняет его
+отправками с id больше сохранённого (для сессий без состояния — всей
+историей). Заново по истории агрегаты строятся только после пересчёта
+баллов (смена ключа) или по POST /admin/analytics/<session>/rebuild.
+"""
+
+import atexit
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import sqlalchemy as sa
+
+from ..extensions import db, socketio
+from ..models import SessionAnalytics, Submission
+from ..utils.scoring import CATEGORIES, normalized_value
+
+# чистые агрегаты, которых давно не читали, выгружаются из памяти
+IDLE_EVICT_SECONDS = 600
+SCAN_BATCH_SIZE = 500
+
+
+class TopK:
+    """Space-Saving: самые частые значения потока в фиксированной памяти.
+
+    Счётчик может быть завышен не больше чем на свою ``error``.
+    """
+    __slots__ = ("capacity", "counters")
+
+    def __init__(self, capacity: int, counters: Optional[dict] = None):
+        self.capacity = capacity
+        # значение -> [счёт, погрешность]
+        self.counters: dict[str, list[int]] = counters or {}
+
+    def add(self, value: str) -> None:
+        c = self.counters.get(value)
+        if c is not None:
+            c[0] += 1
+        elif len(self.counters) < self.capacity:
+            self.counters[value] = [1, 0]
+        else:
+            victim = min(self.counters, key=lambda v: self.counters[v][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[value] = [floor + 1, floor]
+
+    def top(self, n: int) -> list[dict]:
+        items = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[0]))[:n]
+        return [{"value": v, "count": c} for v, (c, _) in items]
+
+
+class _Cell:
+    __slots__ = ("count", "points", "misses", "wrong")
+
+    def __init__(self, wrong: Optional[TopK] = None):
+        self.count = 0
+        self.points = 0.0
+        self.misses = 0
+        self.wrong = wrong
+
+    def add(self, points: float, wrong_value: Optional[str] = None) -> None:
+        self.count += 1
+        self.points += points
+        if points == 0:
+            self.misses += 1
+        if self.wrong is not None and wrong_value is not None and points < 1:
+            self.wrong.add(wrong_value)
+
+    def summary(self, mean_key: str) -> dict:
+        return {
+            "answers": self.count,
+            mean_key: self.points / self.count if self.count else None,
+            "missRate": self.misses / self.count if self.count else None,
+        }
+
+    def to_state(self) -> list:
+        out = [self.count, self.points, self.misses]
+        if self.wrong is not None:
+            out.append(self.wrong.counters)
+        return out
+
+    @classmethod
+    def from_state(cls, state: list, capacity: int = 0) -> "_Cell":
+        cell = cls(TopK(capacity, state[3]) if len(state) > 3 else None)
+        cell.count, cell.points, cell.misses = state[0], state[1], state[2]
+        return cell
+
+
+class _Rebuild:
+    """Идёт проход по истории: живые отправки откладываются до его конца."""
+    __slots__ = ("scanned", "pending")
+
+    def __init__(self):
+        self.scanned: set[int] = set()
+        self.pending: list[tuple] = []
+
+
+class _SessionStats:
+    __slots__ = ("key_version", "submissions", "last_id", "drugs", "categories", "cells",
+                 "dirty", "touched", "rebuild")
+
+    def __init__(self):
+        self.key_version: Optional[str] = None
+        self.submissions = 0
+        self.last_id = 0
+        self.drugs: dict[str, _Cell] = {}
+        self.categories: dict[str, _Cell] = {}
+        # (drug_id, category) -> _Cell с top-k неверных ответов
+        self.cells: dict[tuple[str, str], _Cell] = {}
+        self.dirty = False
+        self.touched = time.monotonic()
+        self.rebuild: Optional[_Rebuild] = None
+
+    def add(self, sub_id: int, key_version: Optional[str], answers, breakdown, capacity: int) -> None:
+        self.submissions += 1
+        self.last_id = max(self.last_id, sub_id)
+        if key_version:
+            self.key_version = key_version
+        self.dirty = True
+        if not isinstance(breakdown, dict):
+            return
+        answers = answers if isinstance(answers, dict) else {}
+        for drug_id, drug in breakdown.items():
+            if not isinstance(drug, dict) or not isinstance(drug.get("details"), dict):
+                continue
+            self.drugs.setdefault(drug_id, _Cell()).add(float(drug.get("score") or 0.0))
+            student_ans = answers.get(drug_id)
+            for category, pts in drug["details"].items():
+                if isinstance(pts, dict):
+                    pts = pts.get("total")
+                if not isinstance(pts, (int, float)):
+                    continue
+                self.categories.setdefault(category, _Cell()).add(pts)
+                cell = self.cells.get((drug_id, category))
+                if cell is None:
+                    cell = self.cells[(drug_id, category)] = _Cell(TopK(capacity))
+                cell.add(pts, normalized_value(student_ans, category) if pts < 1 else None)
+
+    def to_state(self) -> dict:
+        return {
+            "drugs": {k: c.to_state() for k, c in self.drugs.items()},
+            "categories": {k: c.to_state() for k, c in self.categories.items()},
+            "cells": [[d, cat, c.to_state()] for (d, cat), c in self.cells.items()],
+        }
+
+    @classmethod
+    def from_row(cls, row: SessionAnalytics, capacity: int) -> "_SessionStats":
+        stats = cls()
+        stats.key_version = row.key_version
+        stats.submissions = row.submissions or 0
+        stats.last_id = row.last_submission_id or 0
+        state = row.state if isinstance(row.state, dict) else {}
+        stats.drugs = {k: _Cell.from_state(v) for k, v in (state.get("drugs") or {}).items()}
+        stats.categories = {k: _Cell.from_state(v) for k, v in (state.get("categories") or {}).items()}
+        stats.cells = {(d, cat): _Cell.from_state(v, capacity) for d, cat, v in (state.get("cells") or [])}
+        return stats
+
+
+class ItemAnalytics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[str, _SessionStats] = {}
+        self._interval = 10.0
+        self._last_flush = time.monotonic()
+        self.capacity = 32
+        self.top_wrong = 5
+
+    def init_app(self, app) -> None:
+        self._interval = float(app.config.get("ANALYTICS_FLUSH_INTERVAL", 10.0))
+        self.capacity = int(app.config.get("ANALYTICS_TOPK_CAPACITY", 32))
+        self.top_wrong = int(app.config.get("ANALYTICS_TOP_WRONG", 5))
+        if self._interval > 0:
+            socketio.start_background_task(self._run, app)
+        atexit.register(self._flush_on_exit, app)
+
+    # ---------------------------
+    # Обновление
+    # ---------------------------
+
+    def record(self, submission: Submission) -> None:
+        """Учитывает только что записанную отправку."""
+        name = submission.session_name
+        if not name:
+            return
+        item = (submission.id, submission.key_version, submission.answers, submission.score_details)
+        with self._lock:
+            stats = self._stats.get(name)
+        if stats is None:
+            stats = self._load(name, submission.id)
+            if stats is None:
+                return
+        with self._lock:
+            stats = self._stats.setdefault(name, stats)
+            if stats.rebuild is not None:
+                stats.rebuild.pending.append(item)
+                return
+            stats.add(*item, self.capacity)
+
+        if self._interval <= 0 or time.monotonic() - self._last_flush >= self._interval:
+            self.flush()
+
+    def rebuild(self, session_name: str) -> None:
+        """Строит агрегаты сессии заново по всем её отправкам."""
+        stats = _SessionStats()
+        stats.rebuild = _Rebuild()
+        with self._lock:
+            self._stats[session_name] = stats
+        self._scan(stats, session_name)
+
+    # ---------------------------
+    # Чтение
+    # ---------------------------
+
+    def summary(self, session_name: str) -> dict:
+        stats = self._ensure(session_name)
+        with self._lock:
+            stats.touched = time.monotonic()
+            drugs = []
+            for drug_id, cell in stats.drugs.items():
+                categories = []
+                for category in _ordered(c for d, c in stats.cells if d == drug_id):
+                    c = stats.cells[(drug_id, category)]
+                    categories.append({
+                        "category": category,
+                        **c.summary("meanPoints"),
+                        "topWrong": c.wrong.top(self.top_wrong) if c.wrong else [],
+                    })
+                drugs.append({"drugId": drug_id, **cell.summary("meanScore"), "categories": categories})
+            # самые трудные препараты — сверху
+            drugs.sort(key=lambda d: (d["meanScore"] if d["meanScore"] is not None else 1.0, d["drugId"]))
+            return {
+                "sessionName": session_name,
+                "keyVersion": stats.key_version,
+                "submissions": stats.submissions,
+                "drugs": drugs,
+                "categories": [
+                    {"category": c, **stats.categories[c].summary("meanPoints")}
+                    for c in _ordered(stats.categories)
+                ],
+            }
+
+    def _ensure(self, session_name: str) -> _SessionStats:
+        with self._lock:
+            stats = self._stats.get(session_name)
+        if stats is not None:
+            return stats
+
+        row = SessionAnalytics.query.filter_by(session_name=session_name).first()
+        stats = _SessionStats.from_row(row, self.capacity) if row else _SessionStats()
+        stats.rebuild = _Rebuild()
+        with self._lock:
+            current = self._stats.setdefault(session_name, stats)
+        if current is not stats:
+            return current  # параллельно загрузил другой запрос
+
+        # догоняем отправки, не попавшие в сохранённое состояние (например,
+        # записанные после последнего сохранения перед падением)
+        self._scan(stats, session_name, after_id=stats.last_id)
+        return stats
+
+    def _load(self, session_name: str, submission_id: int) -> Optional[_SessionStats]:
+        """
+        Сохранённое состояние сессии для record(). None — если его нет, а у
+        сессии есть более ранние отправки: их вместе с этой учтёт чтение.
+        """
+        row = SessionAnalytics.query.filter_by(session_name=session_name).first()
+        if row is not None:
+            return _SessionStats.from_row(row, self.capacity)
+        earlier = db.session.query(
+            sa.exists().where(Submission.session_name == session_name, Submission.id != submission_id)
+        ).scalar()
+        return None if earlier else _SessionStats()
+
+    def _scan(self, stats: _SessionStats, session_name: str, after_id: int = 0) -> None:
+        """Добавляет к stats отправки сессии с id > after_id, затем отложенные живые."""
+        try:
+            last_id = after_id
+            while True:
+                rows = (
+                    db.session.query(Submission.id, Submission.key_version,
+                                     Submission.answers, Submission.score_details)
+                    .filter(Submission.session_name == session_name, Submission.id > last_id)
+                    .order_by(Submission.id.asc())
+                    .limit(SCAN_BATCH_SIZE)
+                    .all()
+                )
+                if not rows:
+                    break
+                for r in rows:
+                    stats.add(r.id, r.key_version, r.answers, r.score_details, self.capacity)
+                    stats.rebuild.scanned.add(r.id)
+                last_id = rows[-1].id
+                socketio.sleep(0)
+        finally:
+            with self._lock:
+                rebuild, stats.rebuild = stats.rebuild, None
+                for item in rebuild.pending:
+                    if item[0] not in rebuild.scanned:
+                        stats.add(*item, self.capacity)
+
+    # ---------------------------
+    # Отложенная запись
+    # ---------------------------
+
+    def flush(self) -> int:
+        """Пишет изменённые агрегаты в БД. Возвращает число сессий."""
+        now = time.monotonic()
+        with self._lock:
+            self._last_flush = now
+            pending = {}
+            for name, stats in list(self._stats.items()):
+                if stats.rebuild is not None:
+                    continue
+                if stats.dirty:
+                    pending[name] = (stats, stats.to_state(), stats.submissions, stats.last_id, stats.key_version)
+                    stats.dirty = False
+                elif now - stats.touched >= IDLE_EVICT_SECONDS:
+                    del self._stats[name]
+        if not pending:
+            return 0
+
+        try:
+            existing = {
+                r.session_name: r
+                for r in SessionAnalytics.query.filter(SessionAnalytics.session_name.in_(list(pending)))
+            }
+            stamp = datetime.utcnow()
+            for name, (_, state, submissions, last_id, key_version) in pending.items():
+                row = existing.get(name)
+                if row is None:
+                    row = SessionAnalytics(session_name=name)
+                    db.session.add(row)
+                row.state = state
+                row.submissions = submissions
+                row.last_submission_id = last_id
+                row.key_version = key_version
+                row.updated_at = stamp
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                for stats, *_ in pending.values():
+                    stats.dirty = True
+            raise
+        return len(pending)
+
+    def _run(self, app) -> None:
+        while True:
+            socketio.sleep(self._interval)
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    app.logger.exception("analytics flush failed")
+
+    def _flush_on_exit(self, app) -> None:
+        with app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception("analytics flush on shutdown failed")
+
+
+def _ordered(categories) -> list[str]:
+    """Категории в порядке подсчёта, незнакомые — в конце."""
+    order = {c: i for i, c in enumerate(CATEGORIES)}
+    return sorted(set(categories), key=lambda c: (order.get(c, len(order)), c))
+
+
+item_analytics = ItemAnalytics()
@@ -0,0 +1,94 @@
+"""Кэш скомпилированного ключа ответов.
+
+Ключ хранится по препаратам с версиями (``services.master_key``). В кэше —
+только препараты текущего ticket, разобранные и нормализованные один раз
+на версию, а не на каждый submit, вместе с индексами опечаток по
+``SCORING_TYPO_TOLERANCE`` и разобранными дозировками. Версия ключа —
+``MasterVersion.digest`` с меткой правил подсчёта и допусков.
+
+Кэш живёт в процессе; его сбрасывают маршруты, меняющие Settings или
+мастер-таблицу (``upload_master_table``, ``save_settings``).
+"""
+
+import hashlib
+from typing import Iterable, Optional
+
+from flask import current_app
+
+from ..models import MasterVersion, Settings
+from ..utils.scoring import SCORING_RULES, CompiledAnswerKey, compile_answer_key, parse_typo_tolerance
+from .cache import VersionedCache
+from .master_key import current_version, load_drugs
+from .settings_snapshot import parse_ticket
+
+
+def _ticket_drug_ids() -> set[str]:
+    settings = Settings.query.first()
+    if settings is None:
+        return set()
+    try:
+        ticket = parse_ticket(settings.drugs)
+    except Exception:
+        ticket = []
+    return {str(item.get("drug_id")) for item in ticket if isinstance(item, dict) and item.get("drug_id")}
+
+
+def _typo_tolerance() -> dict[str, int]:
+    return parse_typo_tolerance(current_app.config.get("SCORING_TYPO_TOLERANCE", ""))
+
+
+def _numeric_tolerance() -> float:
+    return max(0.0, float(current_app.config.get("SCORING_NUMERIC_TOLERANCE") or 0.0))
+
+
+def key_version(digest: str, tolerance: dict[str, int], numeric_tolerance: float = 0.0) -> str:
+    """Версия ключа: хеш мастер-таблицы плюс метка правил подсчёта и допусков."""
+    spec = ",".join(f"{c}={k}" for c, k in sorted(tolerance.items()))
+    if numeric_tolerance:
+        spec += f";num={numeric_tolerance:g}"
+    spec += f";rules={SCORING_RULES}"
+    return f"{digest}-t{hashlib.sha256(spec.encode('utf-8')).hexdigest()[:6]}"
+
+
+def compile_key_for(drug_ids: Iterable[str], version: Optional[MasterVersion] = None) -> CompiledAnswerKey:
+    """Ключ только для drug_ids на версии ``version`` (None — текущей), без кэша."""
+    if version is None:
+        version = current_version()
+    if version is None:
+        return compile_answer_key({})
+    tolerance = _typo_tolerance()
+    numeric = _numeric_tolerance()
+    return compile_answer_key(
+        load_drugs(drug_ids, version.id),
+        version=key_version(version.digest, tolerance, numeric),
+        typo_tolerance=tolerance,
+        numeric_tolerance=numeric,
+    )
+
+
+def _load_compiled() -> tuple[CompiledAnswerKey, frozenset]:
+    drug_ids = _ticket_drug_ids()
+    return compile_key_for(drug_ids), frozenset(drug_ids)
+
+
+_cache = VersionedCache(_load_compiled)
+
+
+def get_compiled_key(drug_ids: Iterable[str] | None = None) -> CompiledAnswerKey:
+    """
+    Скомпилированный ключ препаратов ticket текущей версии (из кэша, если есть).
+
+    drug_ids — препараты из ответов: если среди них есть не из ticket
+    (ticket сменили во время сессии), ключ собирается с ними, мимо кэша.
+    """
+    compiled, loaded = _cache.get()
+    if drug_ids is not None:
+        extra = {str(d) for d in drug_ids} - loaded
+        if extra:
+            return compile_key_for(loaded | extra)
+    return compiled
+
+
+def invalidate_answer_key() -> None:
+    """Сбрасывает кэш: следующий get_compiled_key() перечитает ключ из БД."""
+    _cache.invalidate()
@@ -0,0 +1,154 @@
+"""Пакетная рассылка изменений списка активных студентов.
+
+Раньше каждое изменение ActiveSession рассылало пустой ``active_updated``,
+и каждая вкладка админки перезапрашивала весь /admin/active. Теперь
+изменения копятся по комнатам (комната = session_name) в течение
+``ACTIVE_BROADCAST_WINDOW`` секунд и уходят одним сообщением::
+
+    active_delta {"sessionName", "seq", "added": [...], "changed": [...], "removed": [id, ...]}
+
+``seq`` растёт на 1 с каждым delta в комнате. Если клиент видит пропуск,
+он шлёт ``active_resync`` и получает ``active_snapshot`` {"seq", "rows"};
+после этого применяет только delta с большим seq.
+"""
+
+import threading
+import time
+
+from ..extensions import socketio
+from ..models import ActiveSession
+
+
+def serialize_active(a: ActiveSession) -> dict:
+    return {
+        "id": a.id,
+        "studentName": a.student_name,
+        "group": a.group,
+        "sessionName": a.session_name,
+        "startTime": a.start_time.isoformat(),
+        "lastActivity": a.last_activity.isoformat(),
+        "status": a.status,
+    }
+
+
+class _RoomState:
+    __slots__ = ("seq", "added", "changed", "removed", "since", "scheduled")
+
+    def __init__(self):
+        self.seq = 0
+        self.added: dict[int, dict] = {}
+        self.changed: dict[int, dict] = {}
+        self.removed: set[int] = set()
+        # когда в комнате появилось первое несброшенное изменение
+        self.since: float | None = None
+        self.scheduled = False
+
+
+class ActiveBroadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms: dict[str | None, _RoomState] = {}
+        self._window = 0.25
+
+    def init_app(self, app) -> None:
+        self._window = float(app.config.get("ACTIVE_BROADCAST_WINDOW", 0.25))
+
+    # ---------------------------
+    # Изменения
+    # ---------------------------
+
+    def added(self, room: str | None, row: dict) -> None:
+        with self._lock:
+            st = self._room(room)
+            st.removed.discard(row["id"])
+            st.changed.pop(row["id"], None)
+            st.added[row["id"]] = row
+        self._schedule(room)
+
+    def changed(self, room: str | None, row: dict) -> None:
+        with self._lock:
+            st = self._room(room)
+            if row["id"] in st.added:
+                # ещё не разосланная строка — остаётся «added», но свежая
+                st.added[row["id"]] = row
+            else:
+                st.changed[row["id"]] = row
+        self._schedule(room)
+
+    def removed(self, room: str | None, row_id: int) -> None:
+        with self._lock:
+            st = self._room(room)
+            st.changed.pop(row_id, None)
+            if st.added.pop(row_id, None) is None:
+                st.removed.add(row_id)
+        self._schedule(room)
+
+    # ---------------------------
+    # Рассылка
+    # ---------------------------
+
+    def flush(self, room: str | None) -> None:
+        with self._lock:
+            st = self._room(room)
+            st.scheduled = False
+            st.since = None
+            if not (st.added or st.changed or st.removed):
+                return
+            st.seq += 1
+            payload = {
+                "sessionName": room,
+                "seq": st.seq,
+                "added": list(st.added.values()),
+                "changed": list(st.changed.values()),
+                "removed": sorted(st.removed),
+            }
+            st.added, st.changed, st.removed = {}, {}, set()
+        socketio.emit("active_delta", payload, room=room)
+
+    def snapshot(self, room: str | None) -> dict:
+        """Полное состояние комнаты для ресинхронизации клиента."""
+        query = ActiveSession.query
+        if room is not None:
+            query = query.filter(ActiveSession.session_name == room)
+        rows = [serialize_active(a) for a in query.order_by(ActiveSession.start_time.asc()).all()]
+        return {"sessionName": room, "seq": self.seq(room), "rows": rows}
+
+    def seq(self, room: str | None) -> int:
+        with self._lock:
+            return self._room(room).seq
+
+    def seqs(self) -> dict[str | None, int]:
+        """Номера последних delta по всем комнатам."""
+        with self._lock:
+            return {room: st.seq for room, st in self._rooms.items()}
+
+    def _room(self, room: str | None) -> _RoomState:
+        st = self._rooms.get(room)
+        if st is None:
+            st = self._rooms[room] = _RoomState()
+        return st
+
+    def _schedule(self, room: str | None) -> None:
+        if self._window <= 0:
+            self.flush(room)
+            return
+        now = time.monotonic()
+        with self._lock:
+            st = self._room(room)
+            if st.since is None:
+                st.since = now
+            overdue = now - st.since >= 2 * self._window
+            start_timer = not st.scheduled
+            st.scheduled = True
+        if overdue:
+            # таймер почему-то не сработал (нет фонового цикла) — шлём сами
+            self.flush(room)
+        elif start_timer:
+            socketio.start_background_task(self._flush_later, room)
+
+    def _flush_later(self, room: str | None) -> None:
+        socketio.sleep(self._window)
+        self.flush(room)
+
+
+active_broadcaster = ActiveBroadcaster()
@@ -0,0 +1,43 @@
+"""Простой процессный кэш для данных, которые меняются только из админки."""
+
+import threading
+from typing import Any, Callable
+
+
+_MISSING = object()
+
+
+class VersionedCache:
+    """Лениво вычисляемое значение с явным сбросом.
+
+    ``version`` увеличивается при каждом invalidate(). Если сброс пришёл,
+    пока другой запрос ещё строил значение по старым данным, результат
+    отдаётся вызывающему, но в кэш не попадает.
+    """
+
+    def __init__(self, loader: Callable[[], Any]):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value: Any = _MISSING
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self) -> Any:
+        value = self._value
+        if value is not _MISSING:
+            return value
+
+        version = self._version
+        value = self._loader()
+        with self._lock:
+            if version == self._version:
+                self._value = value
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._value = _MISSING
+            self._version += 1
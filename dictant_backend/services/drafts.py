@@ -0,0 +1,299 @@
+"""Черновики ответов студентов (автосохранение).
+
+Раньше ответы жили только в браузере до /sessions/submit: упал браузер —
+всё пропало. Клиент теперь периодически шлёт только изменения в формате
+JSON Patch (подмножество)::
+
+    {"op": "replace", "path": "/<drug>/<field>[/<key>...]", "value": ...}
+    {"op": "remove",  "path": "/<drug>/<field>"}
+
+``add`` равносилен ``replace``. Путь через существующее значение, которое
+не объект (список, строка, число), — конфликт: дельта отклоняется целиком,
+а сохранённый ответ не затирается. Дельты применяются к черновику в памяти;
+в таблицу ``drafts`` черновики пишутся отложенно (write-behind) раз в
+``DRAFT_FLUSH_INTERVAL`` секунд компактным JSON — по аналогии с
+activity_buffer: фоновая задача, сброс из apply() при просрочке и atexit.
+``DRAFT_FLUSH_INTERVAL <= 0`` — запись сразу.
+
+start_session отдаёт сохранённый черновик вместе с билетом, так что после
+переподключения студент продолжает с того же места. После сдачи черновик
+удаляется, а опоздавшие дельты отклоняются: черновик заводится только для
+студента с ActiveSession и не заводится заново после discard(), пока
+студент снова не начнёт диктант (reopen()).
+"""
+
+import atexit
+import copy
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import sqlalchemy as sa
+
+from ..extensions import db, socketio
+from ..models import ActiveSession, Draft
+
+MAX_PATH_DEPTH = 4
+# чистые черновики, которых давно не трогали, выгружаются из памяти
+IDLE_EVICT_SECONDS = 600
+
+
+class DraftError(ValueError):
+    """Некорректная дельта."""
+
+
+class _Draft:
+    __slots__ = ("answers", "version", "dirty", "touched")
+
+    def __init__(self, answers: dict, version: int):
+        self.answers = answers
+        self.version = version
+        self.dirty = False
+        self.touched = time.monotonic()
+
+
+def _compact(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _parse_path(path) -> list[str]:
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise DraftError(f"invalid path: {path!r}")
+    parts = [p.replace("~1", "/").replace("~0", "~") for p in path[1:].split("/")]
+    if not 2 <= len(parts) <= MAX_PATH_DEPTH or not all(parts):
+        raise DraftError(f"path must be /<drug>/<field>[/...]: {path!r}")
+    return parts
+
+
+def _parse_ops(ops) -> list[tuple[str, list[str], object]]:
+    if not isinstance(ops, list):
+        raise DraftError("ops must be a list")
+    parsed = []
+    for op in ops:
+        if not isinstance(op, dict):
+            raise DraftError("each op must be an object")
+        kind = op.get("op")
+        if kind not in ("add", "replace", "remove"):
+            raise DraftError(f"unsupported op: {kind!r}")
+        parsed.append((kind, _parse_path(op.get("path")), op.get("value")))
+    return parsed
+
+
+def _apply_op(answers: dict, kind: str, parts: list[str], value) -> None:
+    node = answers
+    for i, part in enumerate(parts[:-1]):
+        child = node.get(part)
+        if not isinstance(child, dict):
+            if kind == "remove":
+                return
+            if child is not None:
+                path = "/" + "/".join(parts[:i + 1])
+                raise DraftError(f"conflict: {path} is not an object")
+            child = node[part] = {}
+        node = child
+    if kind == "remove":
+        node.pop(parts[-1], None)
+    else:
+        node[parts[-1]] = value
+
+
+class DraftStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (student_name, session_name) -> черновик
+        self._drafts: dict[tuple[str, str], _Draft] = {}
+        # сданные (student_name, session_name) -> когда: поздние дельты не
+        # должны заводить черновик заново
+        self._closed: dict[tuple[str, str], float] = {}
+        self._interval = 5.0
+        self._last_flush = time.monotonic()
+        self.max_ops = 200
+
+    def init_app(self, app) -> None:
+        self._interval = float(app.config.get("DRAFT_FLUSH_INTERVAL", 5.0))
+        self.max_ops = int(app.config.get("DRAFT_MAX_OPS", 200))
+        if self._interval > 0:
+            socketio.start_background_task(self._run, app)
+        atexit.register(self._flush_on_exit, app)
+
+    # ---------------------------
+    # Чтение / запись
+    # ---------------------------
+
+    def apply(self, student_name: str, session_name: str, ops) -> int:
+        """Применяет дельты к черновику. Возвращает его новую версию."""
+        if not student_name or not session_name:
+            raise DraftError("studentName and sessionName are required")
+        parsed = _parse_ops(ops)
+        if len(parsed) > self.max_ops:
+            raise DraftError(f"too many ops (max {self.max_ops})")
+
+        key = (student_name, session_name)
+        draft = self._get_or_load(key)
+        with self._lock:
+            if key in self._closed:
+                # discard() успел между загрузкой и применением
+                raise DraftError("session is already submitted")
+            # применяем к копиям затронутых препаратов: конфликт в любой
+            # операции оставляет черновик как был
+            answers = dict(draft.answers)
+            for drug in {parts[0] for _, parts, _ in parsed}:
+                if drug in answers:
+                    answers[drug] = copy.deepcopy(answers[drug])
+            for kind, parts, value in parsed:
+                _apply_op(answers, kind, parts, value)
+            draft.answers = answers
+            draft.version += 1
+            draft.dirty = True
+            draft.touched = time.monotonic()
+            version = draft.version
+
+        if time.monotonic() - self._last_flush >= self._interval:
+            self.flush()
+        return version
+
+    def get(self, student_name: str, session_name: str) -> Optional[tuple[dict, int]]:
+        """(answers, version) черновика или None, если его нет."""
+        key = (student_name, session_name)
+        with self._lock:
+            draft = self._drafts.get(key)
+            if draft is not None:
+                draft.touched = time.monotonic()
+                return copy.deepcopy(draft.answers), draft.version
+        row = self._load_row(key)
+        if row is None:
+            return None
+        return row.answers, row.version
+
+    def discard(self, student_name: str, session_name: str) -> None:
+        """Забывает черновик и удаляет его строку в текущей транзакции (без коммита)."""
+        with self._lock:
+            self._drafts.pop((student_name, session_name), None)
+            self._closed[(student_name, session_name)] = time.monotonic()
+        Draft.query.filter_by(
+            student_name=student_name,
+            session_name=session_name,
+        ).delete(synchronize_session=False)
+
+    def reopen(self, student_name: str, session_name: str) -> None:
+        """Студент снова начал диктант — черновик можно заводить."""
+        with self._lock:
+            self._closed.pop((student_name, session_name), None)
+
+    def _get_or_load(self, key: tuple[str, str]) -> _Draft:
+        with self._lock:
+            if key in self._closed:
+                raise DraftError("session is already submitted")
+            draft = self._drafts.get(key)
+        if draft is not None:
+            return draft
+        # после рестарта продолжаем сохранённый черновик, а не начинаем с нуля
+        row = self._load_row(key)
+        if row is None and not self._is_active(key):
+            # сдано (или не начато): _closed мог не пережить рестарт
+            raise DraftError("no active session")
+        loaded = row or _Draft({}, 0)
+        with self._lock:
+            if key in self._closed:
+                raise DraftError("session is already submitted")
+            return self._drafts.setdefault(key, loaded)
+
+    @staticmethod
+    def _is_active(key: tuple[str, str]) -> bool:
+        return db.session.query(
+            ActiveSession.query.filter_by(student_name=key[0], session_name=key[1]).exists()
+        ).scalar()
+
+    @staticmethod
+    def _load_row(key: tuple[str, str]) -> Optional[_Draft]:
+        row = Draft.query.filter_by(student_name=key[0], session_name=key[1]).first()
+        if row is None:
+            return None
+        try:
+            answers = json.loads(row.answers)
+        except Exception:
+            answers = {}
+        return _Draft(answers if isinstance(answers, dict) else {}, row.version or 0)
+
+    # ---------------------------
+    # Отложенная запись
+    # ---------------------------
+
+    def flush(self) -> int:
+        """Пишет изменённые черновики в БД. Возвращает их число."""
+        now = time.monotonic()
+        with self._lock:
+            self._last_flush = now
+            pending = {}
+            for key, draft in list(self._drafts.items()):
+                if draft.dirty:
+                    pending[key] = (_compact(draft.answers), draft.version)
+                    draft.dirty = False
+                elif now - draft.touched >= IDLE_EVICT_SECONDS:
+                    del self._drafts[key]
+            # дальше поздние дельты отсекает проверка ActiveSession
+            for key, closed_at in list(self._closed.items()):
+                if now - closed_at >= IDLE_EVICT_SECONDS:
+                    del self._closed[key]
+        if not pending:
+            return 0
+
+        try:
+            existing = {
+                (r.student_name, r.session_name): r
+                for r in Draft.query.filter(
+                    sa.tuple_(Draft.student_name, Draft.session_name).in_(list(pending))
+                )
+            }
+            stamp = datetime.utcnow()
+            with self._lock:
+                # черновик мог быть сдан (discard), пока мы читали БД
+                live = {k: v for k, v in pending.items() if k in self._drafts}
+            for (student, session), (answers, version) in live.items():
+                row = existing.get((student, session))
+                if row is None:
+                    db.session.add(Draft(
+                        student_name=student,
+                        session_name=session,
+                        answers=answers,
+                        version=version,
+                        updated_at=stamp,
+                    ))
+                elif (row.version or 0) <= version:
+                    row.answers = answers
+                    row.version = version
+                    row.updated_at = stamp
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._restore(pending)
+            raise
+        return len(live)
+
+    def _restore(self, pending: dict) -> None:
+        with self._lock:
+            for key in pending:
+                draft = self._drafts.get(key)
+                if draft is not None:
+                    draft.dirty = True
+
+    def _run(self, app) -> None:
+        while True:
+            socketio.sleep(self._interval)
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    app.logger.exception("draft flush failed")
+
+    def _flush_on_exit(self, app) -> None:
+        with app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception("draft flush on shutdown failed")
+
+
+draft_store = DraftStore()
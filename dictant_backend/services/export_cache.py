@@ -0,0 +1,167 @@
+"""Дисковый кэш готовых выгрузок (CSV/XLSX).
+
+Ключ выгрузки — параметры фильтра плюс версия данных: счётчик изменений
+отправок сессии (или всех сессий, если выгрузка не по одной сессии). Его
+увеличивают запись отправки (notify_submission) и каждая порция пересчёта
+баллов (``bump``); счётчики живут в памяти процесса, а метка запуска в
+версии не даёт после рестарта отдать файл, собранный по старым данным.
+Пока данные не менялись, повторное «Экспорт» отдаёт уже готовый файл с
+диска; ключ же служит ETag, так что браузер с тем же файлом получает 304.
+
+CSV отдаётся потоком и копируется в кэш по ходу отдачи (``stream``), XLSX
+собирается фоновой задачей (``build_in_background``).
+
+Размер каталога ограничен ``EXPORT_CACHE_MAX_BYTES``; при переполнении
+удаляются давно не использованные файлы (mtime обновляется при каждом
+попадании).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+from typing import Callable, Iterable, Iterator, Optional
+
+from ..extensions import db, socketio
+
+
+class ExportCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.directory: str | None = None
+        self.max_bytes = 256 * 1024 * 1024
+        self._boot = uuid.uuid4().hex[:8]
+        # session_name -> счётчик изменений; _total — по всем сессиям
+        self._versions: dict[Optional[str], int] = {}
+        self._total = 0
+        # ключи, которые сейчас собираются фоном
+        self._building: set[str] = set()
+
+    def init_app(self, app) -> None:
+        self.directory = app.config.get("EXPORT_CACHE_DIR") or os.path.join(app.instance_path, "export_cache")
+        self.max_bytes = int(app.config.get("EXPORT_CACHE_MAX_BYTES", self.max_bytes))
+        os.makedirs(self.directory, exist_ok=True)
+
+    # ---------------------------
+    # Версия данных
+    # ---------------------------
+
+    def bump(self, session_name: Optional[str]) -> None:
+        """Отправки сессии изменились (новая отправка, пересчёт баллов)."""
+        with self._lock:
+            self._versions[session_name or None] = self._versions.get(session_name or None, 0) + 1
+            self._total += 1
+
+    def data_version(self, session_name: Optional[str] = None) -> list:
+        """Всё, от чего зависит содержимое выгрузки (без запросов к БД)."""
+        if session_name:
+            return [self._boot, session_name, self._versions.get(session_name, 0)]
+        return [self._boot, self._total]
+
+    # ---------------------------
+    # Файлы
+    # ---------------------------
+
+    @staticmethod
+    def make_key(kind: str, params: dict, version: list) -> str:
+        raw = json.dumps([kind, params, version], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        path = self._path(key, ext)
+        try:
+            os.utime(path)  # LRU: отмечаем использование
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, ext: str, write: Callable[[str], None]) -> str:
+        """Создаёт файл выгрузки через ``write(tmp_path)`` и кладёт его в кэш."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            path = self._path(key, ext)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict(keep=path)
+        return path
+
+    def stream(self, key: str, ext: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Отдаёт ``chunks`` дальше и параллельно пишет их в файл кэша. Файл
+        попадает в кэш, только если поток дочитан до конца (клиент не оборвал).
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            path = self._path(key, ext)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict(keep=path)
+
+    def build_in_background(self, app, key: str, ext: str, write: Callable[[str], None]) -> None:
+        """Собирает файл через ``put`` фоновой задачей; повторный вызов с тем же ключом ничего не делает."""
+        with self._lock:
+            if key in self._building:
+                return
+            self._building.add(key)
+        socketio.start_background_task(self._build, app, key, ext, write)
+
+    def is_building(self, key: str) -> bool:
+        with self._lock:
+            return key in self._building
+
+    def _build(self, app, key: str, ext: str, write: Callable[[str], None]) -> None:
+        with app.app_context():
+            try:
+                self.put(key, ext, write)
+            except Exception:
+                app.logger.exception("export build failed")
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._building.discard(key)
+
+    def _evict(self, keep: str) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.endswith(".tmp"):
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+export_cache = ExportCache()
+
+
+def data_version(session_name: Optional[str] = None) -> list:
+    return export_cache.data_version(session_name)
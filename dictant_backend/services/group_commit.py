@@ -0,0 +1,179 @@
+"""Групповой коммит отправок.
+
+Синхронный /sessions/submit делал два коммита (INSERT Submission и DELETE
+ActiveSession), то есть минимум два fsync на отправку. Когда отправки
+идут пачкой (конец диктанта), это упирается в диск SQLite.
+
+Здесь запросы, пришедшие в пределах ``GROUP_COMMIT_WINDOW_MS``, пишутся
+одной транзакцией. Первый запрос становится лидером: открывает пакет, ждёт
+окно (или пока пакет не наберёт ``GROUP_COMMIT_MAX_BATCH``), затем в своей
+сессии добавляет все Submission, удаляет ActiveSession и коммитит один раз.
+Остальные запросы (ведомые) только кладут свои данные в пакет и ждут
+событие готовности; результат или ошибка коммита возвращается каждому.
+Submission собирается ещё до входа в пакет, так что кривые данные
+(``startTime: "garbage"``) роняют только свой запрос. Если общий коммит
+всё же не прошёл, лидер пишет отправки пакета по одной — каждый запрос
+получает только свою ошибку.
+Пакеты коммитятся по очереди, и пока идёт коммит одного, следующий
+продолжает набираться — чем медленнее диск, тем крупнее пакеты.
+
+Ожидание — обычные threading.Event/Lock: под eventlet (monkey_patch) они
+зелёные, под dev-сервером — настоящие потоки. ``GROUP_COMMIT_WINDOW_MS <= 0``
+отключает группировку: каждая отправка коммитится сама.
+"""
+
+import threading
+from typing import Optional
+
+from ..extensions import db
+from ..models import Submission
+from .analytics import item_analytics
+from .broadcast import active_broadcaster
+from .session import delete_active_session, new_submission
+from .submission_items import add_items
+
+
+class _Item:
+    __slots__ = ("data", "score", "score_details", "key_version", "done", "submission", "removed_id", "error")
+
+    def __init__(self, data, score, score_details, key_version):
+        self.data = data
+        self.score = score
+        self.score_details = score_details
+        self.key_version = key_version
+        self.done = threading.Event()
+        # ошибки разбора данных — здесь, в потоке самого запроса
+        self.submission: Optional[Submission] = new_submission(data, score, score_details, key_version)
+        self.removed_id: Optional[int] = None
+        self.error: Optional[BaseException] = None
+
+    def rebuild(self) -> None:
+        # после rollback объект из сессии больше не годится для повторной записи
+        self.submission = new_submission(self.data, self.score, self.score_details, self.key_version)
+        self.removed_id = None
+
+
+class _Batch:
+    def __init__(self):
+        self.items: list[_Item] = []
+        # взводится, когда пакет набрал максимум — лидер не ждёт окно до конца
+        self.full = threading.Event()
+
+
+class GroupCommitter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._open: Optional[_Batch] = None
+        self.window = 0.005
+        self.max_batch = 64
+
+    def init_app(self, app) -> None:
+        self.window = float(app.config.get("GROUP_COMMIT_WINDOW_MS", 5)) / 1000.0
+        self.max_batch = max(1, int(app.config.get("GROUP_COMMIT_MAX_BATCH", 64)))
+
+    def submit(self, data: dict, score, score_details: dict, key_version: str | None) -> tuple[Submission, Optional[int]]:
+        """
+        Записывает отправку и закрывает активную сессию студента.
+        Возвращает (Submission, id удалённой ActiveSession или None).
+        """
+        item = _Item(data, score, score_details, key_version)
+        if self.window <= 0:
+            self._commit([item])
+            return self._result(item)
+
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.items.append(item)
+            if len(batch.items) >= self.max_batch:
+                # следующий запрос откроет новый пакет
+                self._open = None
+                batch.full.set()
+
+        if not leader:
+            item.done.wait()
+            return self._result(item)
+
+        batch.full.wait(self.window)
+        # пока коммитит предыдущий пакет, этот остаётся открытым и продолжает
+        # набирать отправки; заодно лидеры не спорят за блокировку SQLite
+        with self._commit_lock:
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._commit(batch.items)
+        return self._result(item)
+
+    @staticmethod
+    def _result(item: _Item) -> tuple[Submission, Optional[int]]:
+        if item.error is not None:
+            raise item.error
+        return item.submission, item.removed_id
+
+    @staticmethod
+    def _write(items: list[_Item]) -> None:
+        for it in items:
+            db.session.add(it.submission)
+            it.removed_id = delete_active_session(it.data.get("studentName"), it.data.get("sessionName"))
+        db.session.flush()
+        add_items(it.submission for it in items)
+        # Submission уходят ведомым в другие запросы: отвязываем их от
+        # сессии лидера до коммита, чтобы commit их не «протух» (expire)
+        for it in items:
+            db.session.expunge(it.submission)
+        db.session.commit()
+
+    @staticmethod
+    def _fail(it: _Item, error: BaseException) -> None:
+        it.submission = None
+        it.removed_id = None
+        it.error = error
+
+    @classmethod
+    def _write_alone(cls, it: _Item) -> None:
+        try:
+            it.rebuild()
+            cls._write([it])
+        except BaseException as e:
+            db.session.rollback()
+            cls._fail(it, e)
+
+    @classmethod
+    def _commit(cls, items: list[_Item]) -> None:
+        try:
+            cls._write(items)
+        except Exception as e:
+            db.session.rollback()
+            if len(items) == 1:
+                cls._fail(items[0], e)
+            else:
+                # одна отправка не должна ронять весь пакет: пишем по одной
+                for it in items:
+                    cls._write_alone(it)
+        except BaseException as e:
+            db.session.rollback()
+            for it in items:
+                cls._fail(it, e)
+        finally:
+            for it in items:
+                it.done.set()
+
+
+group_committer = GroupCommitter()
+
+
+def record_submission(
+    data: dict,
+    score: float | None,
+    score_details: dict,
+    key_version: str | None,
+) -> Submission:
+    """Сохраняет отправку (групповым коммитом) и убирает студента из активных."""
+    submission, removed_id = group_committer.submit(data, score, score_details, key_version)
+    item_analytics.record(submission)
+    if removed_id is not None:
+        active_broadcaster.removed(data.get("sessionName") or None, removed_id)
+    return submission
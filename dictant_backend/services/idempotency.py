@@ -0,0 +1,114 @@
+"""Идемпотентный /sessions/submit.
+
+На нестабильном Wi-Fi студент (или браузер) повторяет отправку, и каждый
+повтор раньше заново считал баллы и вставлял ещё один Submission. Теперь
+у каждой отправки есть id: ``submissionId`` от клиента или, если его нет,
+хеш ФИО/сессии/startTime. Повтор с тем же id получает исходный ответ без
+подсчёта и записи.
+
+Индекс повторов двухуровневый: ограниченный LRU в памяти
+(``SUBMIT_DEDUPE_CACHE_SIZE``) и уникальный индекс по
+``client_submission_id`` в БД (Submission и журнал очереди), который
+переживает рестарт и вытеснение из LRU. Одновременные запросы с одним id
+(повтор, пока первый ещё обрабатывается) ждут первый и получают его ответ.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from ..models import Submission, SubmissionJournal
+
+MAX_CLIENT_ID_LENGTH = 64
+
+
+def client_submission_id(data: dict) -> Optional[str]:
+    """id отправки: submissionId клиента или хеш student|session|startTime."""
+    raw = data.get("submissionId")
+    if isinstance(raw, str) and raw.strip():
+        raw = raw.strip()
+        if len(raw) <= MAX_CLIENT_ID_LENGTH:
+            return raw
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    start = data.get("startTime")
+    if not start:
+        return None  # без startTime разные попытки не отличить от повторов
+    seed = f"{data.get('studentName')}|{data.get('sessionName')}|{start}"
+    return "h:" + hashlib.sha256(seed.encode("utf-8")).hexdigest()[:32]
+
+
+class SubmitDedupe:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[str, dict] = OrderedDict()
+        self._inflight: dict[str, threading.Event] = {}
+        self.capacity = 10000
+
+    def init_app(self, app) -> None:
+        self.capacity = max(0, int(app.config.get("SUBMIT_DEDUPE_CACHE_SIZE", self.capacity)))
+
+    def begin(self, client_id: str) -> Optional[dict]:
+        """
+        Ответ на уже принятую отправку с этим id или None.
+
+        None означает, что вызывающий теперь «владеет» id и обязан вызвать
+        finish() (в том числе при ошибке).
+        """
+        while True:
+            with self._lock:
+                cached = self._cache.get(client_id)
+                if cached is not None:
+                    self._cache.move_to_end(client_id)
+                    return cached
+                pending = self._inflight.get(client_id)
+                if pending is None:
+                    self._inflight[client_id] = threading.Event()
+                    break
+            pending.wait(30)
+
+        try:
+            found = self._load(client_id)
+        except Exception:
+            self.finish(client_id, None)
+            raise
+        if found is not None:
+            self.finish(client_id, found)
+        return found
+
+    def finish(self, client_id: str, response: Optional[dict]) -> None:
+        """Запоминает ответ (None — попытка не удалась) и будит ожидающих."""
+        with self._lock:
+            if response is not None and self.capacity > 0:
+                self._cache[client_id] = response
+                self._cache.move_to_end(client_id)
+                while len(self._cache) > self.capacity:
+                    self._cache.popitem(last=False)
+            event = self._inflight.pop(client_id, None)
+        if event is not None:
+            event.set()
+
+    @staticmethod
+    def _load(client_id: str) -> Optional[dict]:
+        entry = (
+            SubmissionJournal.query
+            .with_entities(SubmissionJournal.receipt)
+            .filter_by(client_submission_id=client_id)
+            .first()
+        )
+        if entry is not None:
+            return {"status": "queued", "receipt": entry.receipt}
+
+        sub = (
+            Submission.query
+            .with_entities(Submission.score)
+            .filter_by(client_submission_id=client_id)
+            .first()
+        )
+        if sub is not None:
+            return {"status": "ok", "score": sub.score}
+        return None
+
+
+submit_dedupe = SubmitDedupe()
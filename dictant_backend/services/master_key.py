@@ -0,0 +1,223 @@
+"""Мастер-таблица по препаратам, с версиями загрузок.
+
+Каждый препарат — строка ``master_drugs`` с диапазоном версий
+[version_from, version_to); у текущей строки version_to пустой. Загрузка
+сравнивает новую таблицу с текущей по хешу записи каждого препарата и
+пишет только разницу под новым номером версии (``master_versions``):
+изменённые и удалённые строки закрываются, изменённые и новые —
+добавляются. Если ничего не изменилось, новая версия не создаётся.
+
+Читатели берут только нужные препараты (ticket, ответы сессии) на
+текущей или любой прежней версии. Версия ключа в отправках
+(``Submission.key_version``) — ``MasterVersion.digest``: хеш содержимого
+всей таблицы, одинаковый в разных процессах.
+
+Ключ, оставшийся в ``Settings.answer_key`` от прежних версий, при старте
+переносится первой версией (``import_legacy_key``).
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+
+import sqlalchemy as sa
+
+from ..extensions import db
+from ..models import MasterDrug, MasterVersion, Settings
+from ..utils.master_table import norm_ru
+
+_CHUNK = 500
+
+
+def drug_digest(item: dict) -> str:
+    """Хеш записи препарата (по каноническому JSON)."""
+    raw = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def key_digest(digests: dict[str, str]) -> str:
+    """Версия всего ключа по хешам его препаратов."""
+    h = hashlib.sha256()
+    for drug_id in sorted(digests):
+        h.update(f"{drug_id}:{digests[drug_id]}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def current_version() -> Optional[MasterVersion]:
+    return MasterVersion.query.order_by(MasterVersion.id.desc()).first()
+
+
+def version_by_digest(digest: str) -> Optional[MasterVersion]:
+    return (
+        MasterVersion.query.filter_by(digest=digest)
+        .order_by(MasterVersion.id.desc())
+        .first()
+    )
+
+
+def _valid_at(version: Optional[int]):
+    if version is None:
+        return MasterDrug.version_to.is_(None)
+    return sa.and_(
+        MasterDrug.version_from <= version,
+        sa.or_(MasterDrug.version_to.is_(None), MasterDrug.version_to > version),
+    )
+
+
+def load_drugs(drug_ids: Iterable[str], version: Optional[int] = None) -> dict[str, dict]:
+    """Записи ключа для drug_ids на версии ``version`` (None — текущей)."""
+    ids = sorted({str(d) for d in drug_ids})
+    out: dict[str, dict] = {}
+    for i in range(0, len(ids), _CHUNK):
+        rows = (
+            db.session.query(MasterDrug.drug_id, MasterDrug.data)
+            .filter(_valid_at(version), MasterDrug.drug_id.in_(ids[i:i + _CHUNK]))
+            .all()
+        )
+        out.update({drug_id: data for drug_id, data in rows})
+    return out
+
+
+def ru_names(version: Optional[int] = None) -> dict[str, dict]:
+    """drug_id -> {"inn_ru", "trade_names_ru"} всех препаратов версии — без остальной записи."""
+    rows = (
+        db.session.query(MasterDrug.drug_id, MasterDrug.inn_ru, MasterDrug.trade_names_ru)
+        .filter(_valid_at(version))
+        .yield_per(1000)
+    )
+    return {
+        drug_id: {"inn_ru": inn_ru or "", "trade_names_ru": trade_ru.split("\n") if trade_ru else []}
+        for drug_id, inn_ru, trade_ru in rows
+    }
+
+
+def build_ru_names(answer_key: dict) -> list[list[str]]:
+    """[[название, drug_id, 'mnn'|'trade'], ...] — сохраняемая часть индекса."""
+    out = []
+    for drug_id, item in answer_key.items():
+        if not isinstance(item, dict):
+            continue
+        inn_ru = norm_ru(item.get("inn_ru"))
+        if inn_ru:
+            out.append([inn_ru, str(drug_id), "mnn"])
+        trade_ru = item.get("trade_names_ru")
+        if isinstance(trade_ru, list):
+            for t in trade_ru:
+                tok = norm_ru(t)
+                if tok:
+                    out.append([tok, str(drug_id), "trade"])
+    out.sort()
+    return out
+
+
+def _drug_row(drug_id: str, item: dict, digest: str, version: int) -> dict:
+    trade_ru = item.get("trade_names_ru")
+    trade_ru = [str(t) for t in trade_ru if t] if isinstance(trade_ru, list) else []
+    return {
+        "drug_id": drug_id,
+        "version_from": version,
+        "version_to": None,
+        "digest": digest,
+        "inn_ru": item.get("inn_ru") or None,
+        "trade_names_ru": "\n".join(trade_ru) or None,
+        "data": item,
+    }
+
+
+def save_master_key(answer_key: dict[str, dict], source: str | None = None,
+                    digest: str | None = None) -> tuple[Optional[MasterVersion], dict]:
+    """
+    Записывает ключ как новую версию — только разницу с текущей. Без коммита.
+
+    Возвращает (версия, diff); diff — {"added", "changed", "removed"}
+    (списки drug_id). Если разницы нет, версия — текущая (None, если
+    таблица ещё пуста).
+    """
+    new_digests = {str(k): drug_digest(v) for k, v in answer_key.items()}
+    old_digests = dict(
+        db.session.query(MasterDrug.drug_id, MasterDrug.digest).filter(_valid_at(None)).all()
+    )
+    diff = {
+        "added": sorted(k for k in new_digests if k not in old_digests),
+        "changed": sorted(k for k, d in new_digests.items() if k in old_digests and old_digests[k] != d),
+        "removed": sorted(k for k in old_digests if k not in new_digests),
+    }
+    if not any(diff.values()):
+        return current_version(), diff
+
+    version = MasterVersion(
+        digest=digest or key_digest(new_digests),
+        source=source,
+        drugs=len(new_digests),
+        added=len(diff["added"]),
+        changed=len(diff["changed"]),
+        removed=len(diff["removed"]),
+        ru_index=build_ru_names(answer_key),
+        created_at=datetime.utcnow(),
+    )
+    db.session.add(version)
+    db.session.flush()
+
+    closed = diff["changed"] + diff["removed"]
+    for i in range(0, len(closed), _CHUNK):
+        db.session.execute(
+            sa.update(MasterDrug)
+            .where(MasterDrug.version_to.is_(None), MasterDrug.drug_id.in_(closed[i:i + _CHUNK]))
+            .values(version_to=version.id)
+        )
+    written = diff["added"] + diff["changed"]
+    for i in range(0, len(written), _CHUNK):
+        db.session.execute(sa.insert(MasterDrug), [
+            _drug_row(k, answer_key[k], new_digests[k], version.id)
+            for k in written[i:i + _CHUNK]
+        ])
+    return version, diff
+
+
+def version_diff(version: int) -> dict:
+    """{"added", "changed", "removed"} версии относительно предыдущей (для аудита)."""
+    opened = {
+        d for (d,) in db.session.query(MasterDrug.drug_id).filter(MasterDrug.version_from == version)
+    }
+    closed = {
+        d for (d,) in db.session.query(MasterDrug.drug_id).filter(MasterDrug.version_to == version)
+    }
+    return {
+        "added": sorted(opened - closed),
+        "changed": sorted(opened & closed),
+        "removed": sorted(closed - opened),
+    }
+
+
+def import_legacy_key() -> Optional[MasterVersion]:
+    """Переносит ``Settings.answer_key`` первой версией, если версий ещё нет."""
+    if db.session.query(MasterVersion.id).limit(1).scalar() is not None:
+        return None
+    settings = Settings.query.first()
+    if settings is None or not settings.answer_key:
+        return None
+
+    try:
+        answer_key = json.loads(settings.answer_key)
+    except Exception:
+        answer_key = {}
+    if not isinstance(answer_key, dict):
+        answer_key = {}
+    # версия — прежний хеш JSON-текста, чтобы уже посчитанные отправки
+    # не считались устаревшими
+    legacy_digest = hashlib.sha256(settings.answer_key.encode("utf-8")).hexdigest()[:16]
+    version, _ = save_master_key(answer_key, source="settings.answer_key", digest=legacy_digest)
+    settings.answer_key = None
+    db.session.commit()
+    return version
+
+
+def fill_ru_indexes() -> int:
+    """Строит ru_index версиям, сохранённым до его появления. Возвращает их число."""
+    versions = MasterVersion.query.filter(MasterVersion.ru_index.is_(None)).all()
+    for version in versions:
+        version.ru_index = build_ru_names(ru_names(version.id))
+    if versions:
+        db.session.commit()
+    return len(versions)
@@ -0,0 +1,237 @@
+"""Пересчёт баллов сессии после правки мастер-таблицы.
+
+Админ запускает задачу для одной сессии; она идёт фоном:
+
+* читает отправки сессии порциями по id (keyset), пропуская те, что уже
+  посчитаны по текущей версии ключа (``Submission.key_version``);
+* считает баллы против ключа текущей или указанной прежней версии
+  мастер-таблицы, скомпилированного только для препаратов сессии: в этом
+  же процессе небольшими порциями score_many с ``socketio.sleep(0)`` между
+  ними, чтобы не держать цикл событий. Пул процессов (``RESCORE_WORKERS``)
+  используется только в режиме ``threading``: под eventlet (обычный режим
+  приложения) пул из зелёного потока ненадёжен, и задача считает в
+  процессе; ключ передаётся в каждый процесс пула один раз при старте;
+* пишет результаты пакетным UPDATE по первичному ключу и заменяет строки
+  submission_items, по коммиту на порцию;
+* шлёт прогресс в комнату сессии: ``rescore_progress`` и ``rescore_finished``;
+* в конце заново строит агрегаты сессии для /admin/analytics и живое
+  распределение баллов.
+"""
+
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import dataclass, asdict
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy import or_
+from sqlalchemy.types import NullType
+
+from ..extensions import db, socketio
+from ..models import MasterVersion, Submission, SubmissionItem
+from ..utils.jsoncodec import decode_json
+from ..utils.scoring import CompiledAnswerKey, score_many
+from .analytics import item_analytics
+from .answer_key import compile_key_for, get_compiled_key
+from .export_cache import export_cache
+from .score_stream import score_stream
+from .submission_items import replace_items
+
+
+@dataclass
+class RescoreJob:
+    id: str
+    session_name: str
+    # номер версии мастер-таблицы; None — текущая
+    master_version: int | None = None
+    key_version: str = ""
+    status: str = "queued"  # queued | running | done | failed
+    total: int = 0
+    done: int = 0
+    error: str | None = None
+    started_at: str | None = None
+    finished_at: str | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+_jobs: dict[str, RescoreJob] = {}
+
+# отправок на один вызов score_many между уступками циклу событий
+INLINE_CHUNK = 50
+
+
+# ---------------------------
+# Воркеры пула
+# ---------------------------
+
+_worker_key: CompiledAnswerKey | None = None
+
+
+def _init_worker(compiled: CompiledAnswerKey) -> None:
+    global _worker_key
+    _worker_key = compiled
+
+
+def _score_batch(raw_answers: list, compiled: CompiledAnswerKey | None = None) -> list:
+    """[(score, breakdown), ...] для списка сырых (закодированных) answers."""
+    compiled = compiled or _worker_key
+    answers_list = []
+    for raw in raw_answers:
+        try:
+            answers = decode_json(raw)
+        except Exception:
+            answers = {}
+        answers_list.append(answers if isinstance(answers, dict) else {})
+    return score_many(answers_list, compiled)
+
+
+# ---------------------------
+# Задача
+# ---------------------------
+
+def get_job(job_id: str) -> RescoreJob | None:
+    return _jobs.get(job_id)
+
+
+def start_rescore(app, session_name: str, master_version: int | None = None) -> RescoreJob:
+    """Запускает пересчёт сессии (или возвращает уже идущий для неё)."""
+    for job in _jobs.values():
+        if job.session_name == session_name and job.status in ("queued", "running"):
+            return job
+
+    job = RescoreJob(id=uuid.uuid4().hex, session_name=session_name, master_version=master_version)
+    _jobs[job.id] = job
+    socketio.start_background_task(_run_job, app, job)
+    return job
+
+
+def _pending_filter(session_name: str, key_version: str):
+    return sa.and_(
+        Submission.session_name == session_name,
+        or_(Submission.key_version.is_(None), Submission.key_version != key_version),
+    )
+
+
+def _run_job(app, job: RescoreJob) -> None:
+    with app.app_context():
+        try:
+            _rescore(app, job)
+            job.status = "done"
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception("rescore failed")
+            job.status = "failed"
+            job.error = str(e)
+        job.finished_at = datetime.utcnow().isoformat()
+        socketio.emit("rescore_finished", job.to_dict(), room=job.session_name or None)
+
+
+def _session_key(job: RescoreJob) -> CompiledAnswerKey:
+    # препараты сессии — из submission_items, плюс текущий ticket; ответы
+    # разбираем только у отправок, для которых строк items ещё нет
+    drug_ids = {
+        d for (d,) in db.session.query(SubmissionItem.drug_id)
+        .filter(SubmissionItem.session_name == job.session_name)
+        .distinct()
+    }
+    drug_ids |= set(get_compiled_key().drugs)
+    no_items = (
+        db.session.query(Submission.answers)
+        .filter(Submission.session_name == job.session_name)
+        .filter(~sa.exists().where(SubmissionItem.submission_id == Submission.id))
+        .yield_per(500)
+    )
+    for (answers,) in no_items:
+        if isinstance(answers, dict):
+            drug_ids.update(str(k) for k in answers)
+    version = None
+    if job.master_version is not None:
+        version = db.session.get(MasterVersion, job.master_version)
+        if version is None:
+            raise ValueError(f"master version {job.master_version} not found")
+    return compile_key_for(drug_ids, version)
+
+
+def _rescore(app, job: RescoreJob) -> None:
+    compiled = _session_key(job)
+    job.key_version = compiled.version
+    job.status = "running"
+    job.started_at = datetime.utcnow().isoformat()
+
+    pending = _pending_filter(job.session_name, compiled.version)
+    job.total = db.session.query(sa.func.count(Submission.id)).filter(pending).scalar() or 0
+
+    batch_size = int(app.config.get("RESCORE_BATCH_SIZE", 200))
+    workers = int(app.config.get("RESCORE_WORKERS", 0))
+    if workers > 0 and socketio.async_mode != "threading":
+        app.logger.warning(
+            "RESCORE_WORKERS=%s ignored: process pool is not supported under %s, scoring in-process",
+            workers, socketio.async_mode,
+        )
+        workers = 0
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(compiled,)) if workers > 0 else None
+
+    try:
+        last_id = 0
+        while True:
+            # answers берём сырыми: распаковка — в воркерах пула
+            rows = (
+                db.session.query(Submission.id, sa.type_coerce(Submission.answers, NullType).label("answers"))
+                .filter(pending, Submission.id > last_id)
+                .order_by(Submission.id.asc())
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            results = _score_rows(pool, [r.answers for r in rows], compiled, workers)
+            db.session.execute(sa.update(Submission), [
+                {
+                    "id": r.id,
+                    "score": score,
+                    "score_details": breakdown or {},
+                    "key_version": compiled.version,
+                }
+                for r, (score, breakdown) in zip(rows, results)
+            ])
+            replace_items(job.session_name, [
+                (r.id, decode_json(r.answers), breakdown)
+                for r, (_, breakdown) in zip(rows, results)
+            ])
+            db.session.commit()
+            export_cache.bump(job.session_name)
+
+            job.done += len(rows)
+            socketio.emit("rescore_progress", job.to_dict(), room=job.session_name or None)
+            socketio.sleep(0)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    if job.done:
+        # баллы сменились — агрегаты /admin/analytics и живое распределение
+        # баллов строим заново
+        item_analytics.rebuild(job.session_name)
+        score_stream.reset(job.session_name)
+
+
+def _score_rows(pool, raw_answers: list, compiled: CompiledAnswerKey, workers: int) -> list:
+    if pool is None:
+        out = []
+        for i in range(0, len(raw_answers), INLINE_CHUNK):
+            out.extend(_score_batch(raw_answers[i:i + INLINE_CHUNK], compiled))
+            socketio.sleep(0)
+        return out
+
+    # режим threading: задача — обычный поток, можно просто ждать пул
+    step = max(1, -(-len(raw_answers) // workers))
+    futures = [pool.submit(_score_batch, raw_answers[i:i + step]) for i in range(0, len(raw_answers), step)]
+    wait(futures)
+    out = []
+    for f in futures:
+        out.extend(f.result())
+    return out
@@ -0,0 +1,193 @@
+"""Индекс русских названий мастер-таблицы для сопоставления ticket.
+
+Строится один раз при загрузке таблицы (``master_key.build_ru_names``) и
+хранится вместе с версией (``MasterVersion.ru_index``): список (название,
+drug_id, 'mnn'|'trade'); версиям из времени до индекса его дописывает
+``master_key.fill_ru_indexes`` при миграции. В процессе индекс кэшируется
+по номеру версии, так что save_settings не перебирает ключ на каждый запрос.
+
+Для названий, которых нет в таблице, индекс подсказывает ближайшие:
+триграммный индекс (триграмма -> названия с ней) даёт кандидатов, которые
+ранжируются по коэффициенту Дайса, при равенстве — по расстоянию
+Левенштейна. На десятках тысяч названий запрос занимает доли миллисекунды:
+считаются только названия, у которых есть общие с запросом триграммы.
+Кандидатами всегда становятся и названия, начинающиеся с запроса, и
+короткие названия в одной правке от него — у них слишком мало триграмм,
+чтобы отбор по ним их находил.
+"""
+
+import bisect
+import threading
+from collections import Counter
+from itertools import groupby
+from typing import Optional
+
+from ..models import MasterVersion
+from ..utils.master_table import norm_ru
+from .master_key import build_ru_names, current_version, ru_names
+
+SUGGEST_LIMIT = 3
+# подсказки с меньшим сходством не показываем
+MIN_SIMILARITY = 0.3
+# сколько кандидатов на каждую подсказку проверять точным сходством
+_SHORTLIST = 20
+# индексы скольких последних версий держать в памяти
+_KEEP_VERSIONS = 2
+# названия не длиннее этого сравниваются с запросом по расстоянию правки
+_SHORT_NAME = 4
+
+
+def _trigrams(name: str) -> set[str]:
+    s = f"  {name} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+class RuNameIndex:
+    """Точный и нечёткий поиск drug_id по русскому названию."""
+
+    def __init__(self, names: list):
+        # название -> [(drug_id, kind), ...] (больше одного — дубликаты в таблице)
+        self.exact: dict[str, list[tuple[str, str]]] = {}
+        for name, drug_id, kind in names:
+            self.exact.setdefault(name, []).append((drug_id, kind))
+        self.names: list[str] = sorted(self.exact)
+        self._sizes: list[int] = []
+        self._postings: dict[str, set[int]] = {}
+        # длина -> короткие названия этой длины
+        self._short: dict[int, list[int]] = {}
+        for i, name in enumerate(self.names):
+            grams = _trigrams(name)
+            self._sizes.append(len(grams))
+            for g in grams:
+                self._postings.setdefault(g, set()).add(i)
+            if len(name) <= _SHORT_NAME:
+                self._short.setdefault(len(name), []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, name: str) -> list[tuple[str, str]]:
+        """[(drug_id, kind), ...] для точного (после нормализации) совпадения."""
+        return self.exact.get(norm_ru(name), [])
+
+    def suggest(self, name: str, limit: int = SUGGEST_LIMIT) -> list[dict]:
+        """До ``limit`` ближайших названий: {name, drugIds, kind, similarity}."""
+        query = norm_ru(name)
+        grams = _trigrams(query)
+        if not query or not grams:
+            return []
+
+        # Название, у которого с запросом хотя бы половина триграмм общие,
+        # содержит одну из (q - q//2) самых редких триграмм запроса. Частые
+        # триграммы («ин », «тин») не перебираем: по ним только досчитываем
+        # общие триграммы у лучших кандидатов.
+        postings = [self._postings.get(g, ()) for g in grams]
+        postings.sort(key=len)
+        split = len(postings) - len(postings) // 2
+        shared: Counter = Counter()
+        for p in postings[:split]:
+            shared.update(p)
+        candidates = {i for i, _ in shared.most_common(limit * _SHORTLIST)}
+        prefixed = set(self._prefixed(query, limit * _SHORTLIST))
+        near = self._near_short(query)
+        candidates |= prefixed | near
+        if not candidates:
+            return []
+
+        # названия с запросом в начале идут первыми (ввод ещё не закончен),
+        # дальше — по сходству
+        q_size = len(grams)
+        scored = []
+        for i in candidates:
+            n = sum(i in p for p in postings)
+            sim = 2.0 * n / (q_size + self._sizes[i])
+            if sim >= MIN_SIMILARITY or i in prefixed or i in near:
+                scored.append((i not in prefixed, -sim, i))
+        scored.sort()
+
+        # при равном месте ближе то, что меньше правок; Левенштейна
+        # считаем только внутри таких групп
+        best: list[tuple[bool, float, int]] = []
+        for _, group in groupby(scored, key=lambda t: t[:2]):
+            if len(best) >= limit:
+                break
+            group = list(group)
+            if len(group) > 1:
+                group.sort(key=lambda t: (_levenshtein(query, self.names[t[2]]), self.names[t[2]]))
+            best.extend(group)
+
+        out = []
+        for _, neg_sim, i in best[:limit]:
+            hits = self.exact[self.names[i]]
+            out.append({
+                "name": self.names[i],
+                "drugIds": sorted({d for d, _ in hits}),
+                "kind": hits[0][1],
+                "similarity": round(-neg_sim, 3),
+            })
+        return out
+
+    def _prefixed(self, query: str, limit: int) -> list[int]:
+        """Названия, начинающиеся с запроса (self.names отсортирован)."""
+        start = bisect.bisect_left(self.names, query)
+        out = []
+        for i in range(start, min(start + limit, len(self.names))):
+            if not self.names[i].startswith(query):
+                break
+            out.append(i)
+        return out
+
+    def _near_short(self, query: str) -> set[int]:
+        """Короткие названия в одной правке от запроса."""
+        if len(query) > _SHORT_NAME + 1:
+            return set()
+        out = set()
+        for size in (len(query) - 1, len(query), len(query) + 1):
+            for i in self._short.get(size, ()):
+                if _levenshtein(query, self.names[i]) <= 1:
+                    out.add(i)
+        return out
+
+
+_lock = threading.Lock()
+_indexes: dict[int, RuNameIndex] = {}
+
+
+def _load_names(version: MasterVersion) -> list:
+    if version.ru_index is not None:
+        return version.ru_index
+    # версия из времени до индекса, а миграции не запускались: собираем по
+    # строкам master_drugs, но не пишем — запись дело fill_ru_indexes
+    return build_ru_names(ru_names(version.id))
+
+
+def get_ru_index(version: Optional[MasterVersion] = None) -> RuNameIndex:
+    """Индекс названий версии (None — текущей); пустой, если таблица не загружена."""
+    if version is None:
+        version = current_version()
+    if version is None:
+        return RuNameIndex([])
+
+    with _lock:
+        index = _indexes.get(version.id)
+    if index is not None:
+        return index
+
+    index = RuNameIndex(_load_names(version))
+    with _lock:
+        _indexes[version.id] = index
+        for old in sorted(_indexes)[:-_KEEP_VERSIONS]:
+            del _indexes[old]
+    return index
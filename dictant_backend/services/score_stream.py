@@ -0,0 +1,362 @@
+"""Живое распределение баллов сессии для админки.
+
+Вместо перезапроса /admin/sessions админка получает по сокету гистограмму
+баллов и сводку: число отправок, средний балл, медиану, min/max и долю
+авто-отправок. Каждая отправка (notify_submission) обновляет их за O(1):
+медиана оценивается потоково алгоритмом P² (пять маркеров, без хранения
+баллов).
+
+Изменения копятся по комнатам (комната = session_name) в течение
+``SCORE_BROADCAST_WINDOW`` секунд и уходят одним сообщением::
+
+    score_delta {"sessionName", "seq", "bins": [[index, +n], ...], "stats": {...}}
+
+``bins`` — прибавки к столбцам гистограммы (``SCORE_HISTOGRAM_BINS``
+столбцов на 0–10 баллов), ``stats`` — сводка целиком (она маленькая).
+Как и для active_delta: при пропуске seq клиент шлёт ``score_resync`` и
+получает ``score_snapshot`` {"sessionName", "seq", "bins", "stats"}; тот же
+снимок отдаёт GET /admin/scores/<session>.
+
+Распределение сессии строится одним проходом по колонке score её
+отправок — при первом запросе снимка или, если первой пришла отправка,
+фоновой задачей, которая затем шлёт снимок в комнату (запрос отправки
+сканом не задерживается). После пересчёта баллов оно строится заново, а
+сессии без отправок и запросов ``IDLE_EVICT_SECONDS`` выгружаются из памяти.
+"""
+
+import bisect
+import threading
+import time
+from typing import Optional
+
+from ..extensions import db, socketio
+from ..models import Submission
+
+MAX_SCORE = 10.0
+IDLE_EVICT_SECONDS = 600
+# уведомления об отправках приходят не по порядку id лишь в пределах
+# группового коммита; id старше этого срока сдвигают loaded_id
+SEEN_TTL_SECONDS = 60
+SEED_BATCH_SIZE = 1000
+
+
+class P2Quantile:
+    """Потоковая оценка квантиля p за O(1) памяти (P², Jain & Chlamtac, 1985)."""
+    __slots__ = ("p", "heights", "pos", "desired", "step")
+
+    def __init__(self, p: float = 0.5):
+        self.p = p
+        # первые 5 наблюдений храним как есть (отсортированными)
+        self.heights: list[float] = []
+        self.pos = [0, 1, 2, 3, 4]
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.step = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        q, n = self.heights, self.pos
+        if len(q) < 5:
+            bisect.insort(q, x)
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.step[i]
+
+        # подтягиваем средние маркеры к желаемым позициям
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                h = self._parabolic(i, d)
+                if not q[i - 1] < h < q[i + 1]:
+                    h = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = h
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.pos
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        q = self.heights
+        if not q:
+            return None
+        if len(q) < 5 or self.pos[4] < 5:
+            # пока наблюдений ≤ 5 — точный квантиль
+            rank = self.p * (len(q) - 1)
+            lo = int(rank)
+            hi = min(lo + 1, len(q) - 1)
+            return q[lo] + (q[hi] - q[lo]) * (rank - lo)
+        return q[2]
+
+
+class _SessionDist:
+    __slots__ = ("bins", "count", "scored", "total", "auto", "min", "max", "median",
+                 "seq", "loaded_id", "seen", "pending_bins", "dirty", "since", "scheduled",
+                 "touched")
+
+    def __init__(self, n_bins: int):
+        self.bins = [0] * n_bins
+        self.count = 0
+        self.scored = 0
+        self.total = 0.0
+        self.auto = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.median = P2Quantile(0.5)
+        self.seq = 0
+        # старшая учтённая отправка и id после неё (id -> время): уведомления
+        # приходят в любом порядке (ведомые группового коммита, потоки
+        # dev-сервера), так что «последний id» ничего не гарантирует
+        self.loaded_id = 0
+        self.seen: dict[int, float] = {}
+        # несброшенные прибавки: index -> n
+        self.pending_bins: dict[int, int] = {}
+        self.dirty = False
+        self.since: Optional[float] = None
+        self.scheduled = False
+        self.touched = time.monotonic()
+
+    def add_new(self, sub_id: Optional[int], score: Optional[float], auto_submitted: bool) -> bool:
+        """Учитывает отправку, если её ещё нет в распределении."""
+        now = time.monotonic()
+        self.touched = now
+        if sub_id is not None:
+            if sub_id <= self.loaded_id or sub_id in self.seen:
+                return False  # уже попала в загрузку из БД или учтена
+            self.seen[sub_id] = now
+        self.add(score, auto_submitted)
+        return True
+
+    def prune_seen(self, now: float) -> None:
+        """Сдвигает loaded_id за давно учтённые id и забывает их."""
+        seen = self.seen
+        while seen:
+            sub_id = next(iter(seen))
+            if seen[sub_id] > now - SEEN_TTL_SECONDS:
+                break
+            del seen[sub_id]
+            self.loaded_id = max(self.loaded_id, sub_id)
+        for sub_id in [i for i in seen if i <= self.loaded_id]:
+            del seen[sub_id]
+
+    def add(self, score: Optional[float], auto_submitted: bool) -> None:
+        self.count += 1
+        if auto_submitted:
+            self.auto += 1
+        self.dirty = True
+        if score is None:
+            return
+        score = float(score)
+        self.scored += 1
+        self.total += score
+        self.min = score if self.min is None else min(self.min, score)
+        self.max = score if self.max is None else max(self.max, score)
+        self.median.add(score)
+        width = MAX_SCORE / len(self.bins)
+        i = min(max(int(score / width), 0), len(self.bins) - 1)
+        self.bins[i] += 1
+        self.pending_bins[i] = self.pending_bins.get(i, 0) + 1
+
+    def stats(self) -> dict:
+        median = self.median.value()
+        return {
+            "count": self.count,
+            "scored": self.scored,
+            "mean": round(self.total / self.scored, 3) if self.scored else None,
+            "median": round(median, 3) if median is not None else None,
+            "min": self.min,
+            "max": self.max,
+            "autoRatio": round(self.auto / self.count, 4) if self.count else None,
+        }
+
+
+class ScoreStream:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: dict[str, _SessionDist] = {}
+        # сессии, которые строятся фоном: отправки, пришедшие во время прохода
+        self._seeding: dict[str, list[tuple]] = {}
+        self._app = None
+        self._window = 0.5
+        self.n_bins = 10
+
+    def init_app(self, app) -> None:
+        self._app = app
+        self._window = float(app.config.get("SCORE_BROADCAST_WINDOW", 0.5))
+        self.n_bins = int(app.config.get("SCORE_HISTOGRAM_BINS", 10))
+
+    # ---------------------------
+    # Обновление
+    # ---------------------------
+
+    def add(self, submission: Submission) -> None:
+        """Учитывает записанную отправку и планирует score_delta в её комнату."""
+        name = submission.session_name
+        if not name:
+            return
+        item = (submission.id, submission.score, bool(submission.auto_submitted))
+        start = False
+        with self._lock:
+            pending = self._seeding.get(name)
+            dist = self._sessions.get(name) if pending is None else None
+            if pending is None and dist is None:
+                if self._app is None:
+                    return
+                # распределения в памяти нет: строим его фоном, а не в запросе
+                pending = self._seeding[name] = []
+                start = True
+            if pending is not None:
+                pending.append(item)
+            elif not dist.add_new(*item):
+                return
+        if dist is not None:
+            self._schedule(name)
+        elif start:
+            socketio.start_background_task(self._seed, name)
+
+    def reset(self, session_name: str) -> None:
+        """Строит распределение заново (баллы пересчитаны) и шлёт снимок в комнату."""
+        self._install(session_name, self._load(session_name), replace=True)
+        socketio.emit("score_snapshot", self.snapshot(session_name), room=session_name)
+
+    def _ensure(self, session_name: str) -> _SessionDist:
+        with self._lock:
+            dist = self._sessions.get(session_name)
+            if dist is not None:
+                dist.touched = time.monotonic()
+                return dist
+        return self._install(session_name, self._load(session_name))
+
+    def _load(self, session_name: str) -> _SessionDist:
+        """
+        Один проход по баллам сессии. Отправки, пришедшие за время прохода,
+        копятся в _seeding и добавляются в _install.
+        """
+        with self._lock:
+            self._seeding.setdefault(session_name, [])
+        try:
+            dist = _SessionDist(self.n_bins)
+            last_id = 0
+            while True:
+                rows = (
+                    db.session.query(Submission.id, Submission.score, Submission.auto_submitted)
+                    .filter(Submission.session_name == session_name, Submission.id > last_id)
+                    .order_by(Submission.id.asc())
+                    .limit(SEED_BATCH_SIZE)
+                    .all()
+                )
+                if not rows:
+                    break
+                for sub_id, score, auto in rows:
+                    dist.add(score, bool(auto))
+                last_id = dist.loaded_id = rows[-1].id
+                socketio.sleep(0)
+        except BaseException:
+            with self._lock:
+                self._seeding.pop(session_name, None)
+            raise
+        return dist
+
+    def _install(self, session_name: str, dist: _SessionDist, replace: bool = False) -> _SessionDist:
+        with self._lock:
+            current = self._sessions.get(session_name)
+            if current is not None and not replace:
+                return current  # параллельно загрузил другой запрос
+            if current is not None:
+                # seq продолжается: клиенты не должны принять старые delta за новые
+                dist.seq = current.seq + 1
+            self._sessions[session_name] = dist
+            for item in self._seeding.pop(session_name, ()):
+                dist.add_new(*item)
+            dist.pending_bins, dist.dirty = {}, False
+            return dist
+
+    def _seed(self, session_name: str) -> None:
+        """Фоновая загрузка распределения; клиенты комнаты получают снимок."""
+        with self._app.app_context():
+            try:
+                self._ensure(session_name)
+            except Exception:
+                self._app.logger.exception("score distribution load failed")
+                return
+        socketio.emit("score_snapshot", self.snapshot(session_name), room=session_name)
+
+    # ---------------------------
+    # Рассылка
+    # ---------------------------
+
+    def snapshot(self, session_name: str) -> dict:
+        dist = self._ensure(session_name)
+        with self._lock:
+            return {
+                "sessionName": session_name,
+                "seq": dist.seq,
+                "bins": list(dist.bins),
+                "stats": dist.stats(),
+            }
+
+    def flush(self, session_name: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            dist = self._sessions.get(session_name)
+            if dist is None:
+                return
+            dist.scheduled = False
+            dist.since = None
+            dist.prune_seen(now)
+            if not dist.dirty:
+                return
+            dist.seq += 1
+            payload = {
+                "sessionName": session_name,
+                "seq": dist.seq,
+                "bins": sorted([i, n] for i, n in dist.pending_bins.items()),
+                "stats": dist.stats(),
+            }
+            dist.pending_bins, dist.dirty = {}, False
+        socketio.emit("score_delta", payload, room=session_name)
+
+    def _evict_idle(self, now: float) -> None:
+        """Выгружает распределения, которых давно не обновляли и не запрашивали."""
+        for name, dist in list(self._sessions.items()):
+            if not dist.dirty and not dist.scheduled and now - dist.touched >= IDLE_EVICT_SECONDS:
+                del self._sessions[name]
+
+    def _schedule(self, session_name: str) -> None:
+        if self._window <= 0:
+            self.flush(session_name)
+            return
+        now = time.monotonic()
+        with self._lock:
+            dist = self._sessions[session_name]
+            if dist.since is None:
+                dist.since = now
+            overdue = now - dist.since >= 2 * self._window
+            start_timer = not dist.scheduled
+            dist.scheduled = True
+        if overdue:
+            # таймер почему-то не сработал (нет фонового цикла) — шлём сами
+            self.flush(session_name)
+        elif start_timer:
+            socketio.start_background_task(self._flush_later, session_name)
+
+    def _flush_later(self, session_name: str) -> None:
+        socketio.sleep(self._window)
+        self.flush(session_name)
+
+
+score_stream = ScoreStream()
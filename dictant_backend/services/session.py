@@ -1,12 +1,19 @@
-from datetime import datetime, timedelta
-import json
+from datetime import datetime
 import hashlib
 import random
 from typing import List, Optional
 
 from flask_socketio import SocketIO
+from sqlalchemy.exc import IntegrityError
 
-from ..models import db, Settings, ActiveSession, Submission
+from ..models import db, ActiveSession, Submission
+from .activity import activity_buffer
+from .broadcast import active_broadcaster, serialize_active
+from .drafts import draft_store
+from .export_cache import export_cache
+from .score_stream import score_stream
+from .settings_snapshot import get_settings_snapshot
+from .submission_items import add_items
 
 
 # ---------------------------
@@ -23,19 +30,48 @@ def _stable_shuffle(n: int, seed_str: str) -> List[int]:
     return idx
 
 
+def _upsert_active(student_name: str, group: str | None, session_name: str, now: datetime) -> tuple[bool, dict]:
+    active = ActiveSession.query.filter_by(
+        student_name=student_name,
+        session_name=session_name,
+    ).first()
+
+    is_new = active is None
+    if is_new:
+        active = ActiveSession(
+            student_name=student_name,
+            group=group,
+            session_name=session_name,
+            start_time=now,
+            last_activity=now,
+            status="active",
+        )
+        db.session.add(active)
+    else:
+        active.status = "active"
+        active.last_activity = now
+
+    db.session.flush()
+    row = serialize_active(active)
+    db.session.commit()
+    return is_new, row
+
+
 # ---------------------------
 # Student start
 # ---------------------------
 
-def start_session(data: dict, socketio: SocketIO) -> tuple[dict, int]:
+def start_session(data: dict, socketio: SocketIO) -> tuple[dict | bytes, int]:
     """
     Старт диктанта студентом.
     Возвращает ticket (уже перемешанный под конкретного студента).
+
+    Успешный ответ — готовые JSON-байты из снимка настроек, ошибки — dict.
     """
     code = (data.get("code") or "").strip()
 
-    settings = Settings.query.first()
-    if settings is None or (settings.code or "").strip() != code:
+    snapshot = get_settings_snapshot()
+    if snapshot is None or (snapshot.code or "").strip() != code:
         return {"error": "Неверный код"}, 400
 
     student_name = (data.get("studentName") or "").strip()
@@ -45,120 +81,146 @@ def start_session(data: dict, socketio: SocketIO) -> tuple[dict, int]:
 
     now = datetime.utcnow()
 
-    active = ActiveSession.query.filter_by(
-        student_name=student_name,
-        session_name=settings.session_name or "",
-    ).first()
-
-    if not active:
-        active = ActiveSession(
-            student_name=student_name,
-            group=group,
-            session_name=settings.session_name or "",
-            start_time=now,
-            last_activity=now,
-            status="active",
-        )
-        db.session.add(active)
-    else:
-        active.status = "active"
-        active.last_activity = now
-
-    db.session.commit()
-
-    # ticket хранится в settings.drugs как list[dict] [{drug_id, dictated_ru, dictated_kind}]
-    raw = json.loads(settings.drugs) if settings.drugs else []
-    ticket: list = []
-    if isinstance(raw, list) and raw:
-        if isinstance(raw[0], dict):
-            ticket = raw
-        else:
-            # fallback старого формата: просто строки
-            ticket = [{"drug_id": str(i), "dictated_ru": str(x), "dictated_kind": "mnn"} for i, x in enumerate(raw)]
-
-    n = len(ticket)
-    seed_str = f"{settings.session_name}|{student_name}|{group}|{settings.code}|ticket_v1"
+    try:
+        is_new, row = _upsert_active(student_name, group, snapshot.session_name or "", now)
+    except IntegrityError:
+        # параллельный вход того же студента успел создать строку
+        # (уникальный индекс student_name+session_name) — просто обновим её
+        db.session.rollback()
+        is_new, row = _upsert_active(student_name, group, snapshot.session_name or "", now)
+    activity_buffer.discard(student_name, snapshot.session_name or "")
+    draft_store.reopen(student_name, snapshot.session_name or "")
+
+    n = len(snapshot.ticket)
+    seed_str = f"{snapshot.session_name}|{student_name}|{group}|{snapshot.code}|ticket_v1"
     order = _stable_shuffle(n, seed_str) if n > 0 else []
-    ticket_shuffled = [ticket[i] for i in order] if n > 0 else []
 
-    response = {
-        "sessionName": settings.session_name,
-        "duration": settings.duration or 0,
-        "indicationKey": settings.indication_key,
-        "indicationSets": json.loads(settings.indication_sets) if settings.indication_sets else {},
-        "ticket": ticket_shuffled,
-    }
+    room = snapshot.session_name or None
+    if is_new:
+        active_broadcaster.added(room, row)
+    else:
+        active_broadcaster.changed(room, row)
 
-    room = settings.session_name or None
-    socketio.emit("active_updated", {}, room=room)
-    return response, 200
+    # переподключение: отдаём автосохранённые ответы вместе с билетом
+    saved = draft_store.get(student_name, snapshot.session_name or "")
+    draft = {"answers": saved[0], "version": saved[1]} if saved else None
+    return snapshot.render_start_payload(order, draft), 200
 
 
 def update_activity(student_name: str, session_name: str, socketio: SocketIO) -> None:
+    """Heartbeat студента: пишется в БД пакетно через activity_buffer."""
     if not student_name or not session_name:
         return
-    active = ActiveSession.query.filter_by(
-        student_name=student_name,
-        session_name=session_name,
-    ).first()
-    if not active:
-        return
-    active.status = "active"
-    active.last_activity = datetime.utcnow()
-    db.session.commit()
-    socketio.emit("active_updated", {}, room=session_name)
-
-
-def check_stale_sessions() -> None:
-    """Помечаем active как stale, если нет активности > 60 сек."""
-    now = datetime.utcnow()
-    stale = ActiveSession.query.filter(
-        ActiveSession.status == "active",
-        ActiveSession.last_activity < now - timedelta(seconds=60),
-    ).all()
-    if not stale:
-        return
-    for s in stale:
-        s.status = "stale"
-    db.session.commit()
+    activity_buffer.touch(student_name, session_name)
 
 
 # ---------------------------
 # Submission helpers (нужны routes_submit.py)
 # ---------------------------
 
-def close_active_session(student_name: str, session_name: str) -> None:
-    """Удаляем запись из ActiveSession после сдачи."""
+def remap_answers_to_key_order(answers: dict, drug_order: list) -> dict:
+    """
+    drug_order: список показанный_индекс -> исходный_индекс (как в ключе)
+    Если answers ключуются "0..n-1" по показанному порядку, возвращаем dict,
+    где ключи — исходные индексы.
+    """
+    if not isinstance(answers, dict) or not isinstance(drug_order, list):
+        return answers
+
+    n = len(drug_order)
+    if n == 0:
+        return answers
+
+    shown_keys = {str(i) for i in range(n)}
+    if set(map(str, answers.keys())) != shown_keys:
+        # ответы уже, вероятно, в ключевом порядке или в другом формате
+        return answers
+
+    remapped = {}
+    for shown_i in range(n):
+        original_i = drug_order[shown_i]
+        remapped[str(original_i)] = answers.get(str(shown_i), {})
+    return remapped
+
+
+def delete_active_session(student_name: str, session_name: str) -> Optional[int]:
+    """
+    Удаляет запись ActiveSession (и черновик студента) без коммита.
+    Возвращает id ActiveSession (или None).
+    """
     if not student_name:
-        return
+        return None
+    activity_buffer.discard(student_name, session_name or "")
+    draft_store.discard(student_name, session_name or "")
     active = ActiveSession.query.filter_by(
         student_name=student_name,
         session_name=session_name or "",
     ).first()
-    if active:
-        db.session.delete(active)
+    if active is None:
+        return None
+    row_id = active.id
+    db.session.delete(active)
+    return row_id
+
+
+def close_active_session(student_name: str, session_name: str) -> None:
+    """Удаляем запись из ActiveSession после сдачи."""
+    row_id = delete_active_session(student_name, session_name)
+    if row_id is not None:
         db.session.commit()
+        active_broadcaster.removed(session_name or None, row_id)
 
 
-def create_submission_record(data: dict, score: float | None, score_details: dict) -> Submission:
-    """
-    Создаёт запись Submission и сохраняет в БД.
-    """
+def new_submission(
+    data: dict,
+    score: float | None,
+    score_details: dict,
+    key_version: str | None = None,
+) -> Submission:
+    """Submission из данных отправки, ещё не в сессии. Кривое время — ValueError."""
     from ..utils.timeparse import parse_iso_time
 
-    submission = Submission(
+    return Submission(
         session_name=data.get("sessionName"),
         student_name=data.get("studentName"),
         group=data.get("group"),
         start_time=parse_iso_time(data.get("startTime")),
         end_time=parse_iso_time(data.get("endTime")),
-        warnings=json.dumps(data.get("warnings", []), ensure_ascii=False),
-        answers=json.dumps(data.get("answers", {}), ensure_ascii=False),
+        warnings=data.get("warnings", []),
+        answers=data.get("answers", {}),
         auto_submitted=bool(data.get("autoSubmitted")),
         score=score,
-        score_details=json.dumps(score_details or {}, ensure_ascii=False),
+        score_details=score_details or {},
+        key_version=key_version,
+        client_submission_id=data.get("submissionId"),
     )
+
+
+def build_submission_record(
+    data: dict,
+    score: float | None,
+    score_details: dict,
+    key_version: str | None = None,
+) -> Submission:
+    """Собирает Submission из данных отправки и добавляет в сессию (без коммита)."""
+    submission = new_submission(data, score, score_details, key_version)
     db.session.add(submission)
+    return submission
+
+
+def create_submission_record(
+    data: dict,
+    score: float | None,
+    score_details: dict,
+    key_version: str | None = None,
+) -> Submission:
+    """
+    Создаёт запись Submission и сохраняет в БД.
+    key_version — версия ключа, по которой посчитан балл.
+    """
+    submission = build_submission_record(data, score, score_details, key_version)
+    db.session.flush()
+    add_items([submission])
     db.session.commit()
     return submission
 
@@ -168,9 +230,14 @@ def notify_submission(submission: Submission, socketio: SocketIO) -> None:
     WS уведомления админке:
     - student_finished
     - submission_created
-    - active_updated
+    - score_delta (живое распределение баллов, пакетами — см. score_stream)
+
+    Удаление из списка активных рассылает close_active_session (active_delta).
+    Заодно сдвигает версию данных для кэша выгрузок.
     """
     room = submission.session_name or None
+    export_cache.bump(submission.session_name)
+    score_stream.add(submission)
 
     socketio.emit(
         "student_finished",
@@ -198,6 +265,4 @@ def notify_submission(submission: Submission, socketio: SocketIO) -> None:
         room=room,
     )
 
-    socketio.emit("active_updated", {}, room=room)
-
 
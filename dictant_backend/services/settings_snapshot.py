@@ -0,0 +1,90 @@
+"""Снимок настроек для /sessions/start.
+
+Все студенты одной сессии получают одинаковые настройки и один и тот же
+ticket, отличается только порядок препаратов. Поэтому JSON-части ответа
+сериализуем один раз при изменении Settings, а на каждый вход остаётся
+перестановка и склейка готовых байтов.
+
+Кэш сбрасывают ``save_settings`` и ``upload_master_table``.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from ..models import Settings
+from .cache import VersionedCache
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def parse_ticket(raw_drugs: str | None) -> list[dict]:
+    """ticket хранится в settings.drugs как list[dict] [{drug_id, dictated_ru, dictated_kind}]."""
+    raw = json.loads(raw_drugs) if raw_drugs else []
+    ticket: list = []
+    if isinstance(raw, list) and raw:
+        if isinstance(raw[0], dict):
+            ticket = raw
+        else:
+            # fallback старого формата: просто строки
+            ticket = [{"drug_id": str(i), "dictated_ru": str(x), "dictated_kind": "mnn"} for i, x in enumerate(raw)]
+    return ticket
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    version: int
+    code: str | None
+    session_name: str | None
+    ticket: list
+    # ticket[i], уже сериализованный в JSON
+    ticket_items: tuple
+    # '{"sessionName":...,"indicationSets":{...},"ticket":['
+    head: bytes
+
+    def render_start_payload(self, order: list[int], draft: Optional[dict] = None) -> bytes:
+        """Тело ответа /sessions/start с ticket в порядке ``order`` (и черновиком, если есть)."""
+        items = self.ticket_items
+        body = self.head + b",".join(items[i] for i in order) + b"]"
+        if draft is not None:
+            body += b',"draft":' + _dumps(draft)
+        return body + b"}"
+
+
+def _build_snapshot() -> Optional[SettingsSnapshot]:
+    settings = Settings.query.first()
+    if settings is None:
+        return None
+
+    ticket = parse_ticket(settings.drugs)
+    indication_sets = json.loads(settings.indication_sets) if settings.indication_sets else {}
+
+    head = (
+        b'{"sessionName":' + _dumps(settings.session_name)
+        + b',"duration":' + _dumps(settings.duration or 0)
+        + b',"indicationKey":' + _dumps(settings.indication_key)
+        + b',"indicationSets":' + _dumps(indication_sets)
+        + b',"ticket":['
+    )
+    return SettingsSnapshot(
+        version=_cache.version,
+        code=settings.code,
+        session_name=settings.session_name,
+        ticket=ticket,
+        ticket_items=tuple(_dumps(item) for item in ticket),
+        head=head,
+    )
+
+
+_cache = VersionedCache(_build_snapshot)
+
+
+def get_settings_snapshot() -> Optional[SettingsSnapshot]:
+    """Текущий снимок настроек (None, если настройки ещё не сохранены)."""
+    return _cache.get()
+
+
+def invalidate_settings_snapshot() -> None:
+    _cache.invalidate()
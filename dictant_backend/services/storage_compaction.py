@@ -0,0 +1,121 @@
+"""Фоновая перепаковка старых отправок в компактный формат.
+
+Новые отправки пишутся через ``CompressedJSON`` сразу сжатыми, а строки,
+сохранённые раньше, остаются JSON-текстом (они читаются как есть, но
+занимают больше места). Эта задача проходит таблицу порциями по id и
+перекодирует такие строки — по коммиту на порцию, чтобы не держать долгую
+блокировку записи. Запускается фоном при старте
+(``COMPACT_STORAGE_ON_START``) или вручную: ``flask --app app db-compact``.
+Прогресс хранится в ``data_tasks``: после полного прохода старт таблицу
+больше не читает (на не-SQLite базах проход читает каждую строку).
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.types import NullType
+
+from ..extensions import db, socketio
+from ..migrations import save_task_progress, task_progress
+from ..models import Submission
+from ..utils.jsoncodec import decode_json, encode_json, is_encoded
+
+JSON_COLUMNS = ("answers", "warnings", "score_details")
+COMPACT_TASK = "storage_compaction"
+
+
+def _raw(column):
+    # без CompressedJSON: нужны байты/текст как они лежат в БД
+    return sa.type_coerce(column, NullType).label(column.key)
+
+
+def _legacy_filter():
+    """На SQLite сразу отбираем строки, где хоть одна колонка ещё TEXT."""
+    if db.engine.dialect.name != "sqlite":
+        return sa.true()
+    t = Submission.__table__
+    return sa.or_(*(sa.func.typeof(t.c[name]) == "text" for name in JSON_COLUMNS))
+
+
+def compact_batch(after_id: int, batch_size: int) -> tuple[int, int]:
+    """
+    Перекодирует одну порцию строк с id > after_id.
+    Возвращает (последний просмотренный id или 0, число перекодированных строк).
+    """
+    t = Submission.__table__
+    rows = db.session.execute(
+        sa.select(t.c.id, *(_raw(t.c[name]) for name in JSON_COLUMNS))
+        .where(t.c.id > after_id, _legacy_filter())
+        .order_by(t.c.id.asc())
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0, 0
+
+    updates = []
+    for row in rows:
+        values = {}
+        for name in JSON_COLUMNS:
+            raw = getattr(row, name)
+            if raw is not None and not is_encoded(raw):
+                values[name] = encode_json(decode_json(raw))
+        if values:
+            values["b_id"] = row.id
+            updates.append(values)
+
+    # по колонкам отдельно: у строк может быть разный набор старых колонок
+    for name in JSON_COLUMNS:
+        params = [{"b_id": u["b_id"], "b_value": u[name]} for u in updates if name in u]
+        if params:
+            db.session.execute(
+                sa.update(t)
+                .where(t.c.id == sa.bindparam("b_id"))
+                .values({name: sa.type_coerce(sa.bindparam("b_value"), NullType)}),
+                params,
+            )
+    db.session.commit()
+    return rows[-1].id, len(updates)
+
+
+def compact_all(batch_size: int = 500, pause: float = 0.0, restart: bool = False) -> int:
+    """
+    Перекодирует старые строки, продолжая с id прошлого запуска.
+    Завершённый проход не повторяется: новые строки пишутся сразу сжатыми.
+    restart=True проходит таблицу заново. Возвращает число строк.
+    """
+    last_id, done = task_progress(db.session.connection(), COMPACT_TASK)
+    if restart:
+        last_id, done = 0, False
+    db.session.commit()
+    if done:
+        return 0
+    total = 0
+    while True:
+        batch_last, n = compact_batch(last_id, batch_size)
+        if batch_last:
+            last_id = batch_last
+            total += n
+        save_task_progress(db.session.connection(), COMPACT_TASK, last_id, completed=not batch_last)
+        db.session.commit()
+        if not batch_last:
+            return total
+        socketio.sleep(pause)
+
+
+class StorageCompactor:
+    def init_app(self, app) -> None:
+        if app.config.get("COMPACT_STORAGE_ON_START", True):
+            socketio.start_background_task(self._run, app)
+
+    @staticmethod
+    def _run(app) -> None:
+        batch_size = int(app.config.get("COMPACT_STORAGE_BATCH_SIZE", 500))
+        with app.app_context():
+            try:
+                n = compact_all(batch_size, pause=0.05)
+                if n:
+                    app.logger.info("compacted %d submissions", n)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("submission storage compaction failed")
+
+
+storage_compactor = StorageCompactor()
@@ -0,0 +1,155 @@
+"""Нормализованная копия оценённых ответов: таблица ``submission_items``.
+
+Одна строка на категорию препарата в отправке: баллы из score_details и
+ответ студента в том виде, в каком его сравнивает подсчёт
+(``normalized_value``). Статистика по препаратам и категориям считается
+``GROUP BY`` по этой таблице, без разбора JSON каждой отправки.
+
+Строки пишутся в той же транзакции, что и Submission (групповой коммит,
+очередь), заменяются при пересчёте баллов, а для отправок, сохранённых
+до появления таблицы, достраиваются фоном при старте
+(``SUBMISSION_ITEMS_BACKFILL_ON_START``) или командой
+``flask --app app db-backfill-items``. Прогресс достройки хранится в
+``data_tasks``: после полного прохода старт её больше не повторяет.
+"""
+
+from typing import Iterable
+
+import sqlalchemy as sa
+
+from ..extensions import db, socketio
+from ..migrations import save_task_progress, task_progress
+from ..models import Submission, SubmissionItem
+from ..utils.scoring import normalized_value
+
+BACKFILL_TASK = "submission_items_backfill"
+
+
+def item_rows(submission_id: int, session_name: str | None, answers, score_details) -> list[dict]:
+    """Строки submission_items для одной отправки."""
+    if not isinstance(score_details, dict):
+        return []
+    answers = answers if isinstance(answers, dict) else {}
+    rows = []
+    for drug_id, drug in score_details.items():
+        details = drug.get("details") if isinstance(drug, dict) else None
+        if not isinstance(details, dict):
+            continue
+        student_ans = answers.get(drug_id)
+        for category, pts in details.items():
+            if isinstance(pts, dict):
+                pts = pts.get("total")
+            if not isinstance(pts, (int, float)):
+                continue
+            rows.append({
+                "submission_id": submission_id,
+                "session_name": session_name,
+                "drug_id": str(drug_id),
+                "category": category,
+                "points": float(pts),
+                "value": normalized_value(student_ans, category),
+            })
+    return rows
+
+
+def _insert(rows: list[dict]) -> None:
+    if rows:
+        db.session.execute(sa.insert(SubmissionItem), rows)
+
+
+def add_items(submissions: Iterable[Submission]) -> None:
+    """Добавляет строки для только что записанных (после flush) отправок, без коммита."""
+    rows = []
+    for sub in submissions:
+        rows.extend(item_rows(sub.id, sub.session_name, sub.answers, sub.score_details))
+    _insert(rows)
+
+
+def replace_items(session_name: str | None, scored: Iterable[tuple[int, dict, dict]]) -> None:
+    """
+    Заменяет строки пересчитанных отправок: scored — (id, answers, breakdown).
+    Без коммита.
+    """
+    scored = list(scored)
+    if not scored:
+        return
+    db.session.execute(
+        sa.delete(SubmissionItem).where(SubmissionItem.submission_id.in_([s[0] for s in scored]))
+    )
+    rows = []
+    for sub_id, answers, breakdown in scored:
+        rows.extend(item_rows(sub_id, session_name, answers, breakdown))
+    _insert(rows)
+
+
+# ---------------------------
+# Достройка для старых отправок
+# ---------------------------
+
+def backfill_batch(after_id: int, batch_size: int) -> tuple[int, int]:
+    """
+    Строит строки для порции отправок с id > after_id, у которых их нет.
+    Возвращает (последний просмотренный id или 0, число отправок).
+    """
+    has_items = sa.exists().where(SubmissionItem.submission_id == Submission.id)
+    subs = (
+        db.session.query(Submission.id, Submission.session_name, Submission.answers, Submission.score_details)
+        .filter(Submission.id > after_id, ~has_items)
+        .order_by(Submission.id.asc())
+        .limit(batch_size)
+        .all()
+    )
+    if not subs:
+        return 0, 0
+    rows = []
+    for sub in subs:
+        rows.extend(item_rows(sub.id, sub.session_name, sub.answers, sub.score_details))
+    _insert(rows)
+    db.session.commit()
+    return subs[-1].id, len(subs)
+
+
+def backfill_all(batch_size: int = 500, pause: float = 0.0, restart: bool = False) -> int:
+    """
+    Достраивает строки для отправок без них, продолжая с id прошлого запуска.
+    Завершённый проход не повторяется: новые отправки получают строки при
+    записи. restart=True проходит таблицу заново. Возвращает число отправок.
+    """
+    last_id, done = task_progress(db.session.connection(), BACKFILL_TASK)
+    if restart:
+        last_id, done = 0, False
+    db.session.commit()
+    if done:
+        return 0
+    total = 0
+    while True:
+        batch_last, n = backfill_batch(last_id, batch_size)
+        if batch_last:
+            last_id = batch_last
+            total += n
+        save_task_progress(db.session.connection(), BACKFILL_TASK, last_id, completed=not batch_last)
+        db.session.commit()
+        if not batch_last:
+            return total
+        socketio.sleep(pause)
+
+
+class ItemsBackfill:
+    def init_app(self, app) -> None:
+        if app.config.get("SUBMISSION_ITEMS_BACKFILL_ON_START", True):
+            socketio.start_background_task(self._run, app)
+
+    @staticmethod
+    def _run(app) -> None:
+        batch_size = int(app.config.get("SUBMISSION_ITEMS_BATCH_SIZE", 500))
+        with app.app_context():
+            try:
+                n = backfill_all(batch_size, pause=0.05)
+                if n:
+                    app.logger.info("built submission items for %d submissions", n)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("submission items backfill failed")
+
+
+items_backfill = ItemsBackfill()
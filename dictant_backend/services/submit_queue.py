@@ -0,0 +1,230 @@
+"""Асинхронный приём отправок через журнал (``SUBMIT_MODE = 'queue'``).
+
+Под конец диктанта таймер истекает у всех сразу, и каждый /sessions/submit
+синхронно считает баллы, пишет Submission, удаляет ActiveSession и шлёт
+события. В режиме очереди запрос только кладёт payload в таблицу
+``submission_journal`` (один INSERT + commit) и сразу отвечает квитанцией.
+
+Фоновая задача раз в ``SUBMIT_QUEUE_INTERVAL`` секунд разбирает журнал
+порциями до ``SUBMIT_QUEUE_BATCH_SIZE``: считает баллы одним score_many,
+добавляет Submission, удаляет ActiveSession и помечает строки журнала
+выполненными — всё одним коммитом на порцию. После коммита рассылаются
+события админке.
+
+Строка журнала становится 'done' в той же транзакции, что и её
+Submission, поэтому после падения процесса оставшиеся 'pending' просто
+разбираются заново при старте — без потерь и дублей. Как и activity_buffer,
+enqueue() сам разбирает журнал, если фоновая задача давно не успевала.
+Разбор рассчитан на один процесс приложения (eventlet).
+"""
+
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from ..extensions import db, socketio
+from ..models import Submission, SubmissionJournal
+from ..utils.scoring import compute_score, score_many
+from .analytics import item_analytics
+from .answer_key import get_compiled_key
+from .broadcast import active_broadcaster
+from .session import delete_active_session, new_submission, notify_submission
+from .submission_items import add_items
+
+
+class SubmitQueue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self._interval = 0.2
+        self._batch_size = 200
+        self._retention = timedelta(hours=24)
+        self._last_drain = time.monotonic()
+        self._last_prune = 0.0
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get("SUBMIT_MODE", "sync") == "queue"
+        self._interval = float(app.config.get("SUBMIT_QUEUE_INTERVAL", 0.2))
+        self._batch_size = int(app.config.get("SUBMIT_QUEUE_BATCH_SIZE", 200))
+        self._retention = timedelta(hours=float(app.config.get("SUBMIT_JOURNAL_RETENTION_HOURS", 24)))
+        # разбор запускаем и в синхронном режиме: в журнале могли остаться
+        # необработанные строки с тех пор, когда очередь была включена
+        socketio.start_background_task(self._run, app)
+
+    # ---------------------------
+    # Приём
+    # ---------------------------
+
+    def enqueue(self, data: dict) -> str:
+        """
+        Сохраняет отправку в журнал и возвращает квитанцию. Данные, из которых
+        не собрать Submission (кривые startTime/endTime), — ValueError сразу,
+        а не при разборе.
+        """
+        new_submission(data, None, {})
+        receipt = uuid.uuid4().hex
+        db.session.add(SubmissionJournal(
+            receipt=receipt,
+            payload=json.dumps(data, ensure_ascii=False),
+            client_submission_id=data.get("submissionId"),
+            status="pending",
+            created_at=datetime.utcnow(),
+        ))
+        db.session.commit()
+        if time.monotonic() - self._last_drain >= self._interval * 5:
+            self.drain()
+        return receipt
+
+    @staticmethod
+    def status(receipt: str) -> SubmissionJournal | None:
+        return SubmissionJournal.query.filter_by(receipt=receipt).first()
+
+    # ---------------------------
+    # Разбор
+    # ---------------------------
+
+    def drain(self) -> int:
+        """Обрабатывает одну порцию журнала. Возвращает число строк в ней."""
+        if not self._lock.acquire(blocking=False):
+            return 0  # порцию уже разбирает другой greenlet
+        try:
+            self._last_drain = time.monotonic()
+            return self._drain_batch()
+        finally:
+            self._lock.release()
+
+    def _drain_batch(self) -> int:
+        rows = (
+            SubmissionJournal.query
+            .filter_by(status="pending")
+            .order_by(SubmissionJournal.id.asc())
+            .limit(self._batch_size)
+            .all()
+        )
+        if not rows:
+            return 0
+
+        payloads = []
+        drug_ids: set[str] = set()
+        for row in rows:
+            try:
+                data = json.loads(row.payload)
+            except Exception:
+                data = None
+            payloads.append(data if isinstance(data, dict) else None)
+            answers = data.get("answers") if isinstance(data, dict) else None
+            if isinstance(answers, dict):
+                drug_ids.update(str(k) for k in answers)
+        compiled = get_compiled_key(drug_ids)
+        results = self._score(payloads, compiled)
+        existing = self._existing_submissions(payloads)
+
+        now = datetime.utcnow()
+        written = []
+        try:
+            for row, data, result in zip(rows, payloads, results):
+                row.processed_at = now
+                prior = existing.get(data.get("submissionId")) if data is not None else None
+                if prior is not None:
+                    # та же отправка уже записана (например, синхронно до
+                    # включения очереди) — второй Submission не создаём
+                    row.status = "done"
+                    row.submission_id, row.score = prior
+                    continue
+                if isinstance(result, Exception):
+                    row.status = "failed"
+                    row.error = f"{type(result).__name__}: {result}"
+                    continue
+                score, breakdown = result
+                try:
+                    submission = new_submission(data, score, breakdown, compiled.version)
+                except Exception as e:
+                    # строка из журнала до проверки в enqueue — не держим ею очередь
+                    row.status = "failed"
+                    row.error = f"{type(e).__name__}: {e}"
+                    continue
+                db.session.add(submission)
+                removed_id = delete_active_session(data.get("studentName"), data.get("sessionName"))
+                written.append((row, submission, removed_id))
+            db.session.flush()
+            add_items(submission for _, submission, _ in written)
+            for row, submission, _ in written:
+                row.status = "done"
+                row.submission_id = submission.id
+                row.score = submission.score
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for _, submission, removed_id in written:
+            item_analytics.record(submission)
+            if removed_id is not None:
+                active_broadcaster.removed(submission.session_name or None, removed_id)
+            notify_submission(submission, socketio)
+        return len(rows)
+
+    @staticmethod
+    def _existing_submissions(payloads: list) -> dict:
+        """client_submission_id -> (id, score) уже записанных Submission."""
+        ids = {p.get("submissionId") for p in payloads if p is not None and p.get("submissionId")}
+        if not ids:
+            return {}
+        rows = (
+            db.session.query(Submission.client_submission_id, Submission.id, Submission.score)
+            .filter(Submission.client_submission_id.in_(ids))
+            .all()
+        )
+        return {r.client_submission_id: (r.id, r.score) for r in rows}
+
+    @staticmethod
+    def _score(payloads: list, compiled) -> list:
+        """[(score, breakdown) | Exception, ...] в порядке payloads."""
+        answers = [(p.get("answers") or {}) if p is not None else {} for p in payloads]
+        try:
+            results = score_many(answers, compiled)
+        except Exception:
+            # кривые ответы у кого-то одного — считаем поштучно
+            results = []
+            for a in answers:
+                try:
+                    results.append(compute_score(a, compiled))
+                except Exception as e:
+                    results.append(e)
+        return [
+            ValueError("payload is not a JSON object") if p is None else r
+            for p, r in zip(payloads, results)
+        ]
+
+    def _prune(self) -> None:
+        """Удаляет старые обработанные строки журнала."""
+        cutoff = datetime.utcnow() - self._retention
+        SubmissionJournal.query.filter(
+            SubmissionJournal.status != "pending",
+            SubmissionJournal.processed_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    # ---------------------------
+    # Фоновый разбор
+    # ---------------------------
+
+    def _run(self, app) -> None:
+        while True:
+            with app.app_context():
+                try:
+                    # после рестарта первой итерацией доразбираем хвост журнала
+                    while self.drain() >= self._batch_size:
+                        socketio.sleep(0)
+                    if time.monotonic() - self._last_prune >= 3600:
+                        self._last_prune = time.monotonic()
+                        self._prune()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("submission queue drain failed")
+            socketio.sleep(self._interval)
+
+
+submit_queue = SubmitQueue()
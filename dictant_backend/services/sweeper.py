@@ -0,0 +1,64 @@
+"""Фоновая пометка «зависших» сессий.
+
+Раньше /admin/active сам искал зависшие сессии и коммитил изменения
+прямо в GET-запросе. Теперь это делает одна фоновая задача: раз в
+``STALE_SWEEP_INTERVAL`` секунд одним UPDATE переводит в 'stale' все
+активные сессии без активности дольше ``STALE_SESSION_THRESHOLD`` секунд
+и рассылает изменения админам через active_broadcaster.
+"""
+
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from ..extensions import db, socketio
+from ..models import ActiveSession
+from .activity import activity_buffer
+from .broadcast import active_broadcaster, serialize_active
+
+
+def sweep_stale_sessions(threshold: float) -> int:
+    """Помечает сессии stale одним UPDATE. Возвращает число изменённых строк."""
+    # сначала сбрасываем буфер heartbeat'ов, иначе в БД может лежать
+    # устаревший last_activity у живого студента
+    activity_buffer.flush()
+
+    t = ActiveSession.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=threshold)
+    cond = sa.and_(t.c.status == "active", t.c.last_activity < cutoff)
+
+    if db.engine.dialect.update_returning:
+        rows = db.session.execute(
+            sa.update(t).where(cond).values(status="stale").returning(*t.c)
+        ).all()
+    else:
+        ids = [r.id for r in db.session.execute(sa.select(t.c.id).where(cond))]
+        if ids:
+            db.session.execute(sa.update(t).where(t.c.id.in_(ids)).values(status="stale"))
+        rows = db.session.execute(sa.select(t).where(t.c.id.in_(ids))).all() if ids else []
+    db.session.commit()
+
+    for row in rows:
+        active_broadcaster.changed(row.session_name or None, serialize_active(row))
+    return len(rows)
+
+
+class StaleSweeper:
+    def init_app(self, app) -> None:
+        interval = float(app.config.get("STALE_SWEEP_INTERVAL", 10))
+        threshold = float(app.config.get("STALE_SESSION_THRESHOLD", 60))
+        if interval > 0:
+            socketio.start_background_task(self._run, app, interval, threshold)
+
+    def _run(self, app, interval: float, threshold: float) -> None:
+        while True:
+            socketio.sleep(interval)
+            with app.app_context():
+                try:
+                    sweep_stale_sessions(threshold)
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("stale session sweep failed")
+
+
+stale_sweeper = StaleSweeper()
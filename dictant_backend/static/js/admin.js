@@ -257,10 +257,17 @@ function initAdminScreen() {
         if (answerKeyStatus) {
           const loaded = data.loaded ?? "?";
           const skipped = data.skipped ?? "?";
-          answerKeyStatus.textContent = `Мастер-таблица загружена (loaded: ${loaded}, skipped: ${skipped})`;
+          const issues = Object.values(data.report?.issueCounts || {}).reduce((a, b) => a + b, 0);
+          const d = data.diff || {};
+          const diff = data.version == null ? "" : `, версия ${data.version}: +${d.added ?? 0} ~${d.changed ?? 0} -${d.removed ?? 0}`;
+          answerKeyStatus.textContent = `Мастер-таблица загружена (loaded: ${loaded}, skipped: ${skipped}, issues: ${issues}${diff})`;
+        }
+        if (data.report?.issues?.length) console.warn("master table issues", data.report);
+        if (data.ticketRemoved?.length) {
+          setSaveError(`В новой мастер-таблице нет препаратов билета: ${data.ticketRemoved.join(", ")}`);
         }
 
-        // подтянуть settings (там хранится answer_key)
+        // подтянуть settings
         state.currentSettings = await loadSettings();
         fillAdminSettings();
       } catch (e) {
@@ -284,57 +291,47 @@ function initAdminScreen() {
     });
   }
   if (exportXlsxBtn) {
-    exportXlsxBtn.addEventListener("click", () => {
-      window.location.href = `${API_BASE}/admin/export_excel`;
+    // XLSX собирается на сервере фоном: пока файла нет, ответ — 202
+    exportXlsxBtn.addEventListener("click", async () => {
+      const url = `${API_BASE}/admin/export_excel`;
+      exportXlsxBtn.disabled = true;
+      try {
+        for (;;) {
+          const resp = await fetch(url, { method: "HEAD" });
+          if (resp.status !== 202) break;
+          const wait = parseInt(resp.headers.get("Retry-After") || "2", 10);
+          await new Promise((r) => setTimeout(r, wait * 1000));
+        }
+        window.location.href = url;
+      } catch (e) {
+        console.error(e);
+      } finally {
+        exportXlsxBtn.disabled = false;
+      }
     });
   }
 
   // ---------------------------
   // History
   // ---------------------------
-  async function renderHistory() {
-    const container = document.getElementById("historyContent");
-    if (!container) return;
-
-    try {
-      const resp = await fetch(`${API_BASE}/admin/sessions`);
-      if (!resp.ok) throw new Error("Ошибка загрузки истории");
-      const history = await resp.json();
-
-      if (!history || history.length === 0) {
-        container.innerHTML = '<p class="hint">История пустая.</p>';
-        return;
-      }
+  const HISTORY_PAGE_SIZE = 100;
 
-      let html =
-        '<table class="history-table"><thead><tr><th>Название</th><th>ФИО</th><th>Группа</th><th>Начало</th><th>Окончание</th><th>Предупр.</th><th>Баллы</th><th>Отправка</th></tr></thead><tbody>';
+  function historyRowHtml(entry) {
+    const start = entry.startTime ? new Date(entry.startTime).toLocaleString("ru-RU") : "-";
+    const end = entry.endTime ? new Date(entry.endTime).toLocaleString("ru-RU") : "-";
+    const type = entry.autoSubmitted ? "Авто" : "Ручная";
 
-      history.forEach((entry) => {
-        const start = entry.startTime ? new Date(entry.startTime).toLocaleString("ru-RU") : "-";
-        const end = entry.endTime ? new Date(entry.endTime).toLocaleString("ru-RU") : "-";
-        const type = entry.autoSubmitted ? "Авто" : "Ручная";
-
-        let inactivityCount = 0;
-        let visibilityCount = 0;
-        let totalWarnings = 0;
-
-        if (Array.isArray(entry.warnings)) {
-          entry.warnings.forEach((w) => {
-            if (w.type === "inactivity") {
-              inactivityCount++;
-              totalWarnings++;
-            } else if (w.type === "visibility") {
-              visibilityCount++;
-              totalWarnings++;
-            }
-          });
-        }
+    // полный список предупреждений сервер отдаёт отдельно: /admin/sessions/<id>/warnings
+    const byType = entry.warningsByType || {};
+    const inactivityCount = byType.inactivity || 0;
+    const visibilityCount = byType.visibility || 0;
+    const totalWarnings = inactivityCount + visibilityCount;
 
-        const warningsStr = `${totalWarnings} (безд. ${inactivityCount}, вкладки ${visibilityCount})`;
-        const scoreCell =
-          entry.score !== null && entry.score !== undefined ? Number(entry.score).toFixed(2) : "-";
+    const warningsStr = `${totalWarnings} (безд. ${inactivityCount}, вкладки ${visibilityCount})`;
+    const scoreCell =
+      entry.score !== null && entry.score !== undefined ? Number(entry.score).toFixed(2) : "-";
 
-        html += `<tr>
+    return `<tr>
           <td>${escapeHtml(entry.sessionName || "")}</td>
           <td>${escapeHtml(entry.studentName || "")}</td>
           <td>${escapeHtml(entry.group || "")}</td>
@@ -344,10 +341,57 @@ function initAdminScreen() {
           <td>${scoreCell}</td>
           <td>${type}</td>
         </tr>`;
-      });
+  }
+
+  async function fetchHistoryPage(cursor) {
+    const params = new URLSearchParams({ limit: String(HISTORY_PAGE_SIZE) });
+    if (cursor) params.set("cursor", cursor);
+    const resp = await fetch(`${API_BASE}/admin/sessions?${params.toString()}`);
+    if (!resp.ok) throw new Error("Ошибка загрузки истории");
+    return resp.json();
+  }
+
+  async function renderHistory() {
+    const container = document.getElementById("historyContent");
+    if (!container) return;
+
+    try {
+      const page = await fetchHistoryPage(null);
+      const items = page.items || [];
+
+      if (items.length === 0) {
+        container.innerHTML = '<p class="hint">История пустая.</p>';
+        return;
+      }
 
+      let html =
+        '<table class="history-table"><thead><tr><th>Название</th><th>ФИО</th><th>Группа</th><th>Начало</th><th>Окончание</th><th>Предупр.</th><th>Баллы</th><th>Отправка</th></tr></thead><tbody>';
+      items.forEach((entry) => {
+        html += historyRowHtml(entry);
+      });
       html += "</tbody></table>";
+      html += '<button type="button" class="secondary-btn hidden" id="historyMoreBtn">Показать ещё</button>';
       container.innerHTML = html;
+
+      const tbody = container.querySelector("tbody");
+      const moreBtn = document.getElementById("historyMoreBtn");
+      let nextCursor = page.nextCursor;
+      if (nextCursor) moreBtn.classList.remove("hidden");
+
+      moreBtn.addEventListener("click", async () => {
+        moreBtn.disabled = true;
+        try {
+          const next = await fetchHistoryPage(nextCursor);
+          (next.items || []).forEach((entry) => {
+            tbody.insertAdjacentHTML("beforeend", historyRowHtml(entry));
+          });
+          nextCursor = next.nextCursor;
+          if (!nextCursor) moreBtn.classList.add("hidden");
+        } catch (err) {
+          console.error(err);
+        }
+        moreBtn.disabled = false;
+      });
     } catch (err) {
       console.error(err);
       const c = document.getElementById("historyContent");
@@ -162,6 +162,8 @@ function initLoginScreen() {
         data.sessionName || DEFAULT_SETTINGS.sessionName;
       currentSettings.indicationKey =
         data.indicationKey || DEFAULT_SETTINGS.indicationKey;
+      // автосохранённые ответы (если студент переподключается)
+      currentSettings.draft = data.draft || null;
 
       if (data.indicationSets) {
         app.INDICATION_SETS = { ...INDICATION_SETS, ...data.indicationSets };
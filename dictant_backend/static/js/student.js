@@ -7,6 +7,7 @@ function initStudentScreen() {
 
   let examStarted = false;
   let examStartTime = null;
+  let submissionId = null;
   let timerIntervalId = null;
 
   let inactivitySeconds = 0;
@@ -16,6 +17,11 @@ function initStudentScreen() {
   let inactivityIntervalId = null;
   const antiCheatListeners = [];
 
+  // автосохранение: на сервер уходят только изменённые поля
+  const DRAFT_SAVE_INTERVAL_MS = 10000;
+  let draftIntervalId = null;
+  let draftSent = {};
+
   if (!state.currentSettings || !state.currentStudent) {
     app.loadLoginScreen();
     return;
@@ -143,12 +149,17 @@ function initStudentScreen() {
     visibilityWarnings = 0;
 
     examStartTime = Date.now();
+    // один id на попытку: повторная отправка не создаст дубль на сервере
+    submissionId = (window.crypto && typeof window.crypto.randomUUID === "function")
+      ? window.crypto.randomUUID()
+      : `${examStartTime}-${Math.random().toString(36).slice(2)}`;
 
     const infoEl = document.getElementById("studentInfo");
     infoEl.textContent = `${state.currentStudent.name} (${state.currentStudent.group})`;
 
     renderDrugBlocks();
     renderDrugTabs();
+    startDraftAutosave();
     startTimer();
     setupAntiCheat();
     setupExamSubmission();
@@ -414,6 +425,10 @@ function initStudentScreen() {
       clearInterval(inactivityIntervalId);
       inactivityIntervalId = null;
     }
+    if (draftIntervalId) {
+      clearInterval(draftIntervalId);
+      draftIntervalId = null;
+    }
 
     antiCheatListeners.forEach(({ target, event, handler }) => target.removeEventListener(event, handler));
     antiCheatListeners.length = 0;
@@ -425,6 +440,7 @@ function initStudentScreen() {
     for (let j = 0; j < visibilityWarnings; j++) warningsList.push({ type: "visibility" });
 
     const payload = {
+      submissionId: submissionId,
       sessionName: state.currentSettings.sessionName,
       studentName: state.currentStudent.name,
       group: state.currentStudent.group,
@@ -435,15 +451,21 @@ function initStudentScreen() {
       autoSubmitted: auto,
     };
 
-    try {
-      const resp = await fetch(`${API_BASE}/sessions/submit`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
-      });
-      if (!resp.ok) console.error("Ошибка отправки данных", resp.status);
-    } catch (err) {
-      console.error("Ошибка отправки данных", err);
+    // при обрыве сети повторяем с тем же submissionId — сервер вернёт
+    // исходный результат, а не запишет отправку второй раз
+    for (let attempt = 1; attempt <= 3; attempt++) {
+      try {
+        const resp = await fetch(`${API_BASE}/sessions/submit`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify(payload),
+        });
+        if (!resp.ok) console.error("Ошибка отправки данных", resp.status);
+        break;
+      } catch (err) {
+        console.error("Ошибка отправки данных", err);
+        if (attempt < 3) await new Promise((r) => setTimeout(r, 1000 * attempt));
+      }
     }
 
     if (typeof window.DictantAppRenderHistory === "function") {
@@ -594,6 +616,126 @@ function initStudentScreen() {
     return answers;
   }
 
+  // ===== Автосохранение черновика =====
+  function startDraftAutosave() {
+    const draft = state.currentSettings.draft;
+    if (draft && draft.answers) applyDraft(draft.answers);
+    state.currentSettings.draft = null;
+
+    // то, что уже на сервере (или пустая форма), повторно не отправляем
+    draftSent = {};
+    const current = collectAnswers();
+    Object.keys(current).forEach((drugId) => {
+      draftSent[drugId] = {};
+      Object.keys(current[drugId]).forEach((field) => {
+        draftSent[drugId][field] = JSON.stringify(current[drugId][field]);
+      });
+    });
+
+    draftIntervalId = setInterval(saveDraft, DRAFT_SAVE_INTERVAL_MS);
+  }
+
+  function escapePointer(s) {
+    return String(s).replace(/~/g, "~0").replace(/\//g, "~1");
+  }
+
+  async function saveDraft() {
+    if (!examStarted) return;
+    const current = collectAnswers();
+    const ops = [];
+    const sent = [];
+    Object.keys(current).forEach((drugId) => {
+      Object.keys(current[drugId]).forEach((field) => {
+        const json = JSON.stringify(current[drugId][field]);
+        if ((draftSent[drugId] || {})[field] === json) return;
+        ops.push({ op: "replace", path: `/${escapePointer(drugId)}/${escapePointer(field)}`, value: current[drugId][field] });
+        sent.push([drugId, field, json]);
+      });
+    });
+    if (!ops.length) return;
+
+    try {
+      const resp = await fetch(`${API_BASE}/sessions/draft`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          studentName: state.currentStudent.name,
+          sessionName: state.currentSettings.sessionName,
+          ops: ops,
+        }),
+      });
+      if (!resp.ok) return;
+      // при ошибке сети изменения уйдут в следующий раз
+      sent.forEach(([drugId, field, json]) => {
+        if (!draftSent[drugId]) draftSent[drugId] = {};
+        draftSent[drugId][field] = json;
+      });
+    } catch (err) {
+      console.warn("Не удалось сохранить черновик", err);
+    }
+  }
+
+  function setChecked(root, values) {
+    if (!root) return;
+    const set = new Set(Array.isArray(values) ? values : []);
+    root.querySelectorAll('input[type="checkbox"]').forEach((cb) => {
+      cb.checked = set.has(cb.value);
+    });
+  }
+
+  function applyDraft(answers) {
+    document.querySelectorAll(".drug-block").forEach((block) => {
+      const a = answers[block.dataset.drugId];
+      if (!a || typeof a !== "object") return;
+
+      if (a.dictatedType) {
+        block.querySelectorAll('[data-role="dictated-type"] input[type=radio]').forEach((r) => {
+          r.checked = r.value === a.dictatedType;
+        });
+      }
+      const mnnEl = block.querySelector('[data-role="mnn"]');
+      if (mnnEl && typeof a.mnn === "string") mnnEl.value = a.mnn;
+      const tradeEl = block.querySelector('[data-role="trade-names"]');
+      if (tradeEl && Array.isArray(a.tradeNames)) tradeEl.value = a.tradeNames.join(", ");
+
+      setChecked(block.querySelector('[data-role="forms"]'), a.forms);
+      updateFormDosagePanels(block);
+      const fd = a.formDosages || {};
+      block.querySelectorAll('[data-role="form-dosage-panels"] [data-form-key]').forEach((panel) => {
+        setChecked(panel, fd[panel.getAttribute("data-form-key")]);
+      });
+
+      setChecked(block.querySelector('[data-role="indications"]'), a.indications);
+      setChecked(block.querySelector('[data-role="elimination"]'), a.elimination);
+
+      const doses = a.doses || {};
+      block.querySelectorAll('[data-role="dose-block"]').forEach((doseBlock) => {
+        const d = doses[doseBlock.dataset.doseType];
+        if (!d) return;
+        const mainValEl = doseBlock.querySelector('[data-role="dose-main-value"]');
+        if (mainValEl && d.main != null) mainValEl.value = d.main;
+        const extras = d.extras || {};
+        doseBlock.querySelectorAll(".dose-extra-item").forEach((item) => {
+          const cb = item.querySelector('input[type="checkbox"][data-role="dose-extra-checkbox"]');
+          const num = item.querySelector('input[type="number"]');
+          if (!cb || !(cb.value in extras)) return;
+          cb.checked = true;
+          if (num) {
+            num.classList.remove("hidden");
+            if (extras[cb.value] != null) num.value = extras[cb.value];
+          }
+        });
+      });
+
+      const halfLifeEl = block.querySelector('[data-role="half-life"]');
+      if (halfLifeEl && a.halfLife) {
+        const inputs = halfLifeEl.querySelectorAll('input[type="number"]');
+        if (inputs[0] && a.halfLife.from != null) inputs[0].value = a.halfLife.from;
+        if (inputs[1] && a.halfLife.to != null) inputs[1].value = a.halfLife.to;
+      }
+    });
+  }
+
   startExamForStudent();
 }
 
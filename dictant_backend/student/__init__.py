@@ -3,5 +3,5 @@ from flask import Blueprint
 student_bp = Blueprint("student", __name__, url_prefix="/sessions")
 
 # Автоматически импортируем модули (регистрируют view-функции)
-from . import routes_start, routes_submit, ws_events  # noqa: F401,E402
+from . import routes_start, routes_submit, routes_draft, ws_events  # noqa: F401,E402
 
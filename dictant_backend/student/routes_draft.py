@@ -0,0 +1,38 @@
+from flask import request, jsonify
+
+from . import student_bp
+from ..services.drafts import DraftError, draft_store
+
+
+@student_bp.route("/draft", methods=["POST"])
+def save_draft():
+    """
+    Автосохранение: принимает только изменения (JSON Patch по препарату и полю).
+    Тело: {studentName, sessionName, ops: [{op, path, value}, ...]}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid or missing JSON"}), 400
+
+    try:
+        version = draft_store.apply(
+            (data.get("studentName") or "").strip(),
+            data.get("sessionName") or "",
+            data.get("ops"),
+        )
+    except DraftError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "ok", "version": version})
+
+
+@student_bp.route("/draft", methods=["GET"])
+def get_draft():
+    """Сохранённый черновик студента: {answers, version}."""
+    saved = draft_store.get(
+        (request.args.get("studentName") or "").strip(),
+        request.args.get("sessionName") or "",
+    )
+    if saved is None:
+        return jsonify({"error": "Draft not found"}), 404
+    answers, version = saved
+    return jsonify({"answers": answers, "version": version})
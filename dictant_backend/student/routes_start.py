@@ -1,4 +1,4 @@
-from flask import request, jsonify
+from flask import Response, request, jsonify
 
 from . import student_bp
 from ..extensions import socketio
@@ -14,5 +14,8 @@ def start_session():
         return jsonify({"error": "Invalid or missing JSON"}), 400
 
     response, status = service_start_session(data, socketio)
+    if isinstance(response, bytes):
+        # тело уже собрано из кэшированного снимка настроек
+        return Response(response, status=status, mimetype="application/json")
     return jsonify(response), status
 
@@ -2,39 +2,14 @@ from flask import request, jsonify
 
 from . import student_bp
 from ..extensions import socketio
-from ..services.session import (
-    create_submission_record,
-    close_active_session,
-    notify_submission,
-)
+from ..services.session import notify_submission, remap_answers_to_key_order
+from ..services.answer_key import get_compiled_key
+from ..services.group_commit import record_submission
+from ..services.idempotency import client_submission_id, submit_dedupe
+from ..services.submit_queue import submit_queue
 from ..utils.scoring import compute_score
 
 
-def _remap_answers_to_key_order(answers: dict, drug_order: list) -> dict:
-    """
-    drug_order: список показанный_индекс -> исходный_индекс (как в ключе)
-    Если answers ключуются "0..n-1" по показанному порядку, возвращаем dict,
-    где ключи — исходные индексы.
-    """
-    if not isinstance(answers, dict) or not isinstance(drug_order, list):
-        return answers
-
-    n = len(drug_order)
-    if n == 0:
-        return answers
-
-    shown_keys = {str(i) for i in range(n)}
-    if set(map(str, answers.keys())) != shown_keys:
-        # ответы уже, вероятно, в ключевом порядке или в другом формате
-        return answers
-
-    remapped = {}
-    for shown_i in range(n):
-        original_i = drug_order[shown_i]
-        remapped[str(original_i)] = answers.get(str(shown_i), {})
-    return remapped
-
-
 @student_bp.route("/submit", methods=["POST"])
 def submit():
     """HTTP-обёртка для приёма результатов диктанта."""
@@ -42,39 +17,75 @@ def submit():
     if data is None:
         return jsonify({"error": "Invalid or missing JSON"}), 400
 
-    answers = data.get("answers", {}) or {}
-    session_name = data.get("sessionName")
-    student_name = data.get("studentName")
+    # Повтор той же отправки (сеть оборвалась до ответа) получает исходный
+    # ответ — без повторного подсчёта и второй записи Submission
+    client_id = client_submission_id(data)
+    if client_id is None:
+        response, status = _process_submission(data)
+        return jsonify(response), status
 
-    # 1) Подтягиваем ключ
-    from ..models import Settings
-    settings = Settings.query.first()
-    answer_key = {}
+    data["submissionId"] = client_id
+    previous = submit_dedupe.begin(client_id)
+    if previous is not None:
+        return jsonify(previous), _status_for(previous)
 
-    if settings and settings.answer_key:
-        import json
-        try:
-            answer_key = json.loads(settings.answer_key)
-        except Exception:
-            answer_key = {}
+    response = None
+    try:
+        response, status = _process_submission(data)
+    finally:
+        # отказ (400) не запоминаем: исправленный повтор должен пройти
+        submit_dedupe.finish(client_id, response if response is not None and "error" not in response else None)
+    return jsonify(response), status
+
+
+def _status_for(response: dict) -> int:
+    return 202 if response.get("status") == "queued" else 200
 
-    # 2) Если пришёл drugOrder — перемапим ответы в порядок ключа
+
+def _process_submission(data: dict) -> tuple[dict, int]:
+    answers = data.get("answers", {}) or {}
+
+    # 1) Если пришёл drugOrder — перемапим ответы в порядок ключа
     drug_order = data.get("drugOrder")
     if drug_order:
-        answers = _remap_answers_to_key_order(answers, drug_order)
+        answers = remap_answers_to_key_order(answers, drug_order)
         data["answers"] = answers  # важно: сохраняем уже “в порядке ключа”
 
+    # Режим очереди: только пишем в журнал, остальное сделает фоновый разбор
+    if submit_queue.enabled:
+        try:
+            receipt = submit_queue.enqueue(data)
+        except ValueError as e:
+            return {"error": f"Invalid submission: {e}"}, 400
+        return {"status": "queued", "receipt": receipt}, 202
+
+    # 2) Подтягиваем ключ (скомпилированный, из кэша)
+    answer_key = get_compiled_key(answers.keys() if isinstance(answers, dict) else None)
+
     # 3) Подсчёт баллов
     final_score, breakdown = compute_score(answers, answer_key)
 
-    # 4) Создаём Submission + сохраняем в базу
-    submission = create_submission_record(data, final_score, breakdown)
-
-    # 5) Закрываем активную сессию (если была)
-    close_active_session(student_name, session_name)
+    # 4) Создаём Submission и закрываем активную сессию (если была) —
+    #    одним групповым коммитом с параллельными отправками
+    submission = record_submission(data, final_score, breakdown, answer_key.version)
 
-    # 6) WS-уведомления
+    # 5) WS-уведомления
     notify_submission(submission, socketio)
 
-    return jsonify({"status": "ok", "score": final_score})
+    return {"status": "ok", "score": final_score}, 200
+
+
+@student_bp.route("/submit/<receipt>", methods=["GET"])
+def submit_status(receipt: str):
+    """Статус отправки, принятой в режиме очереди."""
+    entry = submit_queue.status(receipt)
+    if entry is None:
+        return jsonify({"error": "Unknown receipt"}), 404
 
+    out = {"receipt": entry.receipt, "status": entry.status}
+    if entry.status == "done":
+        out["submissionId"] = entry.submission_id
+        out["score"] = entry.score
+    elif entry.status == "failed":
+        out["error"] = entry.error
+    return jsonify(out)
@@ -1,6 +1,10 @@
-from flask_socketio import join_room, leave_room
+from flask import request
+from flask_socketio import emit, join_room, leave_room
 
 from ..extensions import socketio
+from ..services.broadcast import active_broadcaster
+from ..services.drafts import DraftError, draft_store
+from ..services.score_stream import score_stream
 from ..services.session import update_activity
 
 
@@ -26,5 +30,32 @@ def handle_student_activity(data):
     update_activity(name, session_name, socketio)
 
 
+@socketio.on("active_resync")
+def handle_active_resync(data):
+    """Клиент пропустил active_delta (дыра в seq) — отдаём полный снимок только ему."""
+    session_name = (data or {}).get("sessionName") or None
+    emit("active_snapshot", active_broadcaster.snapshot(session_name), to=request.sid)
 
 
+@socketio.on("score_resync")
+def handle_score_resync(data):
+    """Клиент пропустил score_delta — отдаём ему снимок распределения баллов."""
+    session_name = (data or {}).get("sessionName")
+    if session_name:
+        emit("score_snapshot", score_stream.snapshot(session_name), to=request.sid)
+
+
+@socketio.on("draft_delta")
+def handle_draft_delta(data):
+    """Автосохранение по сокету: те же дельты, что и POST /sessions/draft."""
+    data = data or {}
+    try:
+        version = draft_store.apply(
+            (data.get("studentName") or "").strip(),
+            data.get("sessionName") or "",
+            data.get("ops"),
+        )
+    except DraftError as e:
+        emit("draft_error", {"error": str(e)}, to=request.sid)
+        return
+    emit("draft_ack", {"version": version}, to=request.sid)
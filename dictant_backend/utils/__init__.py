@@ -1,3 +1,2 @@
-from .scoring import compute_score
-from .timeparse import parse_iso_time
-
+from .scoring import compute_score, score_many, compile_answer_key, CompiledAnswerKey
+from .timeparse import parse_iso_time, parse_date_bound
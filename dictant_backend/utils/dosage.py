@@ -0,0 +1,153 @@
+"""Разбор дозировок, доз и периода полувыведения в числа с единицами.
+
+Дозировка — кортеж величин (значение, единица): «25 mg – 2 ml» ->
+((25.0, "mg"), (2.0, "ml")). Масса приводится к миллиграммам (г, мкг ->
+мг), русские и латинские обозначения единиц равны; величина без единицы
+(«10») остаётся с единицей "" и при сравнении подходит к любой. Строка,
+в которой кроме чисел, единиц и разделителей есть что-то ещё, не
+разбирается (None) — такие дозировки сравниваются только как текст.
+
+Разбор делается один раз: для ключа — при компиляции (на версию
+мастер-таблицы), для ответов студентов — по разу на строку в пакете
+подсчёта. Функции не бросают исключений на кривом вводе.
+"""
+
+import math
+import re
+from typing import Optional, Tuple
+
+Amount = Tuple[float, str]
+Dosage = Tuple[Amount, ...]
+
+# единица -> (каноническая единица, множитель)
+UNITS = {
+    "mg": ("mg", 1.0),
+    "мг": ("mg", 1.0),
+    "g": ("mg", 1000.0),
+    "г": ("mg", 1000.0),
+    "gr": ("mg", 1000.0),
+    "mcg": ("mg", 0.001),
+    "мкг": ("mg", 0.001),
+    "µg": ("mg", 0.001),
+    "μg": ("mg", 0.001),
+    "ug": ("mg", 0.001),
+    "ml": ("ml", 1.0),
+    "мл": ("ml", 1.0),
+}
+
+# сравнение чисел: относительная погрешность, меньше которой не бывает
+# (0.1 мг * 1000 != 100 мкг в точной арифметике float)
+_EPS = 1e-9
+
+_UNIT = r"[a-zа-яµμ]+\.?(?:/[a-zа-яµμ]+\.?)?"
+# «x»/«х» после числа — множитель («2 x 5 мл»), а не единица
+_AMOUNT = re.compile(rf"(\d+(?:[.,]\d+)?)(?:\s*(?![xх](?:[\s\d]|$))({_UNIT}))?")
+# всё, что может стоять между величинами: «25 mg – 2 ml», «10/5 мг», «2 x 5 мл»
+_SEPARATORS = re.compile(r"[\s\-–—/;:,xх×*()]*")
+# период полувыведения в часах: «12-24», «12–24 ч», «от 12 до 24 часов», «8 ч»
+_RANGE = re.compile(
+    r"^\s*(?:от\s*)?(\d+(?:[.,]\d+)?)(?:\s*(?:[-–—]|до|to|\.\.)\s*(\d+(?:[.,]\d+)?))?"
+    r"\s*(?:ч|час[а-я]*|h|hours?)?\.?\s*$"
+)
+
+
+def parse_number(value) -> Optional[float]:
+    """Число из int/float/строки («12», «0,5»); None, если это не число."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str):
+        try:
+            number = float(value.strip().replace(",", "."))
+        except ValueError:
+            return None
+    else:
+        return None
+    # «nan», «inf» float() понимает, но это не ответ
+    return number if math.isfinite(number) else None
+
+
+def _unit(raw: Optional[str]) -> Tuple[str, float]:
+    if not raw:
+        return "", 1.0
+    raw = raw.replace(".", "")
+    head, sep, tail = raw.partition("/")
+    unit, factor = UNITS.get(head, (head, 1.0))
+    if sep:
+        tail = UNITS.get(tail, (tail, 1.0))[0]
+        return f"{unit}/{tail}", factor
+    return unit, factor
+
+
+def parse_dosage(value) -> Optional[Dosage]:
+    """
+    Дозировка -> ((значение, единица), ...) с массой в мг.
+    None, если чисел нет или в строке есть посторонний текст.
+    """
+    number = parse_number(value)
+    if number is not None:
+        return ((number, ""),)
+    if not isinstance(value, str):
+        return None
+
+    s = value.strip().lower()
+    amounts = []
+    pos = 0
+    for match in _AMOUNT.finditer(s):
+        if _SEPARATORS.fullmatch(s, pos, match.start()) is None:
+            return None
+        unit, factor = _unit(match.group(2))
+        amounts.append((float(match.group(1).replace(",", ".")) * factor, unit))
+        pos = match.end()
+    if not amounts or _SEPARATORS.fullmatch(s, pos) is None:
+        return None
+    return tuple(amounts)
+
+
+def parse_dose(value) -> Optional[float]:
+    """Доза в мг: число («10», 2.5) или одна величина массы («0,5 г»)."""
+    number = parse_number(value)
+    if number is not None:
+        return number
+    dosage = parse_dosage(value)
+    if dosage is None or len(dosage) != 1 or dosage[0][1] not in ("", "mg"):
+        return None
+    return dosage[0][0]
+
+
+def parse_range(value) -> Optional[Tuple[float, float]]:
+    """
+    Диапазон (from, to): {"from": .., "to": ..}, «12-24», «12–24 ч» или одно
+    число («8» -> (8, 8)). None, если границ не хватает или они не числа.
+    """
+    if isinstance(value, dict):
+        lo, hi = parse_number(value.get("from")), parse_number(value.get("to"))
+        return (lo, hi) if lo is not None and hi is not None else None
+    number = parse_number(value)
+    if number is not None:
+        return number, number
+    if not isinstance(value, str):
+        return None
+    match = _RANGE.match(value.lower())
+    if match is None:
+        return None
+    lo = parse_number(match.group(1))
+    return lo, parse_number(match.group(2) or match.group(1))
+
+
+def numbers_close(a: float, b: float, tolerance: float = 0.0) -> bool:
+    """a и b равны с относительной погрешностью ``tolerance`` (0.05 — 5%)."""
+    return a == b or abs(a - b) <= max(tolerance, _EPS) * max(abs(a), abs(b))
+
+
+def dosages_match(a: Dosage, b: Dosage, tolerance: float = 0.0) -> bool:
+    """Дозировки совпадают поэлементно; величина без единицы подходит к любой."""
+    if len(a) != len(b):
+        return False
+    for (va, ua), (vb, ub) in zip(a, b):
+        if ua and ub and ua != ub:
+            return False
+        if not numbers_close(va, vb, tolerance):
+            return False
+    return True
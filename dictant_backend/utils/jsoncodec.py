@@ -0,0 +1,80 @@
+"""Компактное хранение JSON-колонок Submission (answers, warnings, score_details).
+
+Раньше колонки хранили ``json.dumps(..., ensure_ascii=False)`` как текст;
+в score_details имена категорий повторяются для каждого препарата.
+Теперь значение кодируется так::
+
+    b"\\x00" + компактный JSON (UTF-8)          — короткие значения
+    b"\\x01" + zlib(компактный JSON (UTF-8))    — всё остальное
+
+Первый байт — версия формата; JSON-текст с него начинаться не может,
+поэтому старые строки (str или UTF-8 bytes без версии) читаются как раньше.
+Тип колонки ``CompressedJSON`` делает это прозрачно: модель принимает
+и отдаёт dict/list.
+"""
+
+import json
+import zlib
+from typing import Any
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+FORMAT_PLAIN = 0x00
+FORMAT_ZLIB = 0x01
+# меньше этого сжатие не окупается заголовком zlib
+COMPRESS_MIN_BYTES = 64
+
+
+def encode_json(value: Any) -> bytes | None:
+    if value is None:
+        return None
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return bytes((FORMAT_ZLIB,)) + packed
+    return bytes((FORMAT_PLAIN,)) + raw
+
+
+def is_encoded(raw) -> bool:
+    """Значение уже в текущем формате (а не старый JSON-текст)."""
+    return isinstance(raw, (bytes, bytearray, memoryview)) and len(raw) > 0 and raw[0] in (FORMAT_PLAIN, FORMAT_ZLIB)
+
+
+def decode_json(raw) -> Any:
+    """Обратное к encode_json; понимает и старый JSON-текст."""
+    if raw is None:
+        return None
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    if isinstance(raw, (bytes, bytearray)):
+        if not raw:
+            return None
+        if raw[0] == FORMAT_ZLIB:
+            raw = zlib.decompress(raw[1:])
+        elif raw[0] == FORMAT_PLAIN:
+            raw = raw[1:]
+        raw = bytes(raw).decode("utf-8")
+    if not raw.strip():
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        # битый старый текст отдаём как есть — как было до кодека
+        return raw
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON-значение, хранимое через encode_json/decode_json."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, (bytes, str)):
+            # уже сериализованное значение (например, из старого кода)
+            value = decode_json(value)
+        return encode_json(value)
+
+    def process_result_value(self, value, dialect):
+        return decode_json(value)
@@ -0,0 +1,300 @@
+"""Потоковое чтение мастер-таблицы препаратов (xlsx, xls, csv).
+
+Строки читаются по одной (openpyxl в режиме read_only, csv-модуль) и сразу
+превращаются в записи ключа ответов — вся таблица в памяти не держится,
+растёт только сам ключ. По ходу собирается отчёт о проблемах строк:
+нет drug_id, повтор drug_id, пустое русское МНН, дозировка без чисел,
+доза или период полувыведения, которые подсчёт не разберёт как числа.
+В отчёте не больше ``MAX_REPORT_ISSUES`` записей, остальное — счётчиками.
+"""
+
+import csv
+import io
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from .dosage import parse_dose, parse_range
+
+MAX_REPORT_ISSUES = 200
+
+FORM_COLUMNS = {
+    "form_tabs": "tablets",
+    "form_caps": "capsules",
+    "form_dragee": "dragee",
+    "form_powder": "powder",
+    "form_ampoules": "ampoules",
+    "form_drops": "drops",
+}
+DOSE_GROUPS = ("main", "outpatient", "inpatient", "children", "elderly")
+
+_DIGIT = re.compile(r"\d")
+
+
+class MasterTableError(ValueError):
+    """Файл не удалось прочитать как таблицу."""
+
+
+@dataclass
+class MasterTableReport:
+    rows: int = 0
+    skipped: int = 0
+    issues: list = field(default_factory=list)
+    counts: dict = field(default_factory=dict)
+
+    def add(self, row: int, code: str, message: str, drug_id: str | None = None, column: str | None = None) -> None:
+        self.counts[code] = self.counts.get(code, 0) + 1
+        if len(self.issues) < MAX_REPORT_ISSUES:
+            self.issues.append({
+                "row": row,
+                "drugId": drug_id,
+                "column": column,
+                "code": code,
+                "message": message,
+            })
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "skipped": self.skipped,
+            "issues": self.issues,
+            "issueCounts": self.counts,
+            "truncated": sum(self.counts.values()) > len(self.issues),
+        }
+
+
+# ---------------------------
+# Чтение строк
+# ---------------------------
+
+def _cell(v):
+    if v is None:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        # 10.0 из ячейки с числом — это «10», а не «10.0»
+        return int(v)
+    if isinstance(v, str):
+        v = v.strip()
+        return v or None
+    return v
+
+
+def _header(names) -> list[Optional[str]]:
+    out = []
+    for c in names:
+        c = str(c).strip() if c is not None else ""
+        out.append(c or None)
+    return out
+
+
+def _record(columns: list, values) -> dict:
+    return {name: _cell(v) for name, v in zip(columns, values) if name}
+
+
+def _detect_kind(stream, filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if ext == ".xls":
+        return "xls"
+    if ext in (".csv", ".txt"):
+        return "csv"
+    head = stream.read(8)
+    stream.seek(0)
+    if head.startswith(b"PK"):
+        return "xlsx"
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"
+    return "csv"
+
+
+def _xlsx_rows(stream) -> Iterator[tuple[int, dict]]:
+    import openpyxl
+
+    wb = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _header(header)
+        for i, values in enumerate(rows, start=2):
+            yield i, _record(columns, values)
+    finally:
+        wb.close()
+
+
+def _xls_rows(stream) -> Iterator[tuple[int, dict]]:
+    # старый .xls: xlrd читает лист целиком, построчно только отдаём
+    import xlrd
+
+    book = xlrd.open_workbook(file_contents=stream.read(), on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        if sheet.nrows == 0:
+            return
+        columns = _header(sheet.row_values(0))
+        for i in range(1, sheet.nrows):
+            yield i + 1, _record(columns, sheet.row_values(i))
+    finally:
+        book.release_resources()
+
+
+def _csv_rows(stream) -> Iterator[tuple[int, dict]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text, dialect)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = _header(header)
+        for values in reader:
+            yield reader.line_num, _record(columns, values)
+    finally:
+        text.detach()
+
+
+def iter_master_rows(stream, filename: str = "") -> Iterator[tuple[int, dict]]:
+    """(номер строки в файле, {колонка: значение}) по одной строке."""
+    kind = _detect_kind(stream, filename)
+    reader = {"xlsx": _xlsx_rows, "xls": _xls_rows, "csv": _csv_rows}[kind]
+    try:
+        yield from reader(stream)
+    except MasterTableError:
+        raise
+    except Exception as e:
+        raise MasterTableError(f"{kind}: {e}") from e
+
+
+# ---------------------------
+# Строка -> запись ключа
+# ---------------------------
+
+def _split_semicolon(v) -> list[str]:
+    if v is None:
+        return []
+    s = str(v).strip()
+    if not s:
+        return []
+    s = s.replace(",", ";")
+    parts = [p.strip() for p in s.split(";")]
+    return [p for p in parts if p]
+
+
+def norm_ru(s) -> str:
+    s = str(s if s is not None else "").strip().lower()
+    s = s.replace("ё", "е")
+    s = " ".join(s.split())
+    return s
+
+
+def _num(x) -> Optional[str]:
+    # дозы оставляем строками — скоринг сам разберёт числа
+    if x is None:
+        return None
+    s = str(x).strip()
+    return s if s else None
+
+
+def convert_master_row(row: dict) -> dict:
+    """
+    Конвертация строки мастер-таблицы в структуру ключа.
+    Ключ по drug_id, внутри сохраняем всё нужное для проверки.
+    """
+    drug_id = str(row.get("drug_id") if row.get("drug_id") is not None else "").strip()
+    if not drug_id:
+        return {}
+
+    forms = []
+    form_dosages: dict[str, list[str]] = {}
+    for col, form_key in FORM_COLUMNS.items():
+        # дозировки в таблице лежат "10; 25;" или "25 mg – 2 ml;"
+        doses = _split_semicolon(row.get(col))
+        if doses:
+            forms.append(form_key)
+            form_dosages[form_key] = doses
+
+    doses_obj = {
+        group: {
+            "min": _num(row.get(f"dose_{group}_min")),
+            "avg": _num(row.get(f"dose_{group}_avg")),
+            "max": _num(row.get(f"dose_{group}_max")),
+        }
+        for group in DOSE_GROUPS
+    }
+    doses_obj["notes"] = _num(row.get("dose_notes"))
+
+    return {
+        "drug_id": drug_id,
+        # латиница
+        "mnn": str(row.get("inn_main") or "").strip(),
+        "mnn_aliases": _split_semicolon(row.get("inn_aliases")),
+        "trade_names": _split_semicolon(row.get("trade_names")),
+
+        # русские поля для сопоставления списка админа
+        "inn_ru": norm_ru(row.get("inn_ru")),
+        "trade_names_ru": [norm_ru(x) for x in _split_semicolon(row.get("trade_names_ru"))],
+
+        "forms": forms,
+        "form_dosages": form_dosages,
+        "indications": _split_semicolon(row.get("indications")),
+
+        "half_life": str(row.get("half_life") or "").strip(),
+        "elimination": _split_semicolon(row.get("elimination_routes")),
+
+        "doses": doses_obj,
+    }
+
+
+def _validate(line: int, item: dict, report: MasterTableReport) -> None:
+    drug_id = item["drug_id"]
+    if not item["inn_ru"]:
+        report.add(line, "empty_inn_ru", "пустое русское МНН: препарат не найти по названию", drug_id, "inn_ru")
+    for col, form_key in FORM_COLUMNS.items():
+        for dosage in item["form_dosages"].get(form_key, []):
+            if not _DIGIT.search(dosage):
+                report.add(line, "malformed_dosage", f"дозировка без числа: {dosage!r}", drug_id, col)
+    for group in DOSE_GROUPS:
+        for kind, value in item["doses"][group].items():
+            if value is not None and parse_dose(value) is None:
+                report.add(line, "malformed_dosage", f"доза не число: {value!r}", drug_id, f"dose_{group}_{kind}")
+    if item["half_life"] and parse_range(item["half_life"]) is None:
+        report.add(line, "malformed_half_life", f"период полувыведения не разобран: {item['half_life']!r}",
+                   drug_id, "half_life")
+
+
+def parse_master_table(stream, filename: str = "") -> tuple[dict[str, dict], MasterTableReport]:
+    """
+    Читает таблицу и строит answer_key по drug_id (повтор drug_id
+    перезаписывает прежнюю строку). Возвращает (answer_key, отчёт).
+    """
+    answer_key: dict[str, dict] = {}
+    first_row: dict[str, int] = {}
+    report = MasterTableReport()
+
+    for line, row in iter_master_rows(stream, filename):
+        if all(v is None for v in row.values()):
+            continue  # пустые строки (часто в хвосте листа) не считаем
+        report.rows += 1
+        item = convert_master_row(row)
+        if not item:
+            report.skipped += 1
+            report.add(line, "missing_drug_id", "нет drug_id: строка пропущена", column="drug_id")
+            continue
+        drug_id = item["drug_id"]
+        if drug_id in first_row:
+            report.add(line, "duplicate_drug_id",
+                       f"drug_id уже был в строке {first_row[drug_id]}: берётся эта строка", drug_id, "drug_id")
+        else:
+            first_row[drug_id] = line
+        _validate(line, item, report)
+        answer_key[drug_id] = item
+
+    return answer_key, report
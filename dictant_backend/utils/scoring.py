@@ -1,4 +1,7 @@
-from typing import Dict, Tuple, Any
+from dataclasses import dataclass, field
+from typing import Dict, Tuple, Any, Optional, List
+
+from .dosage import Dosage, dosages_match, numbers_close, parse_dose, parse_dosage, parse_number, parse_range
 
 
 def _norm(s: str) -> str:
@@ -30,202 +33,795 @@ def _as_norm_set(values) -> set[str]:
     return out
 
 
-def compute_score(answers: Dict[str, Any], answer_key: Dict[str, Any]) -> Tuple[float | None, Dict]:
+def _lower_set(values) -> frozenset[str]:
+    """strip+lower для списка строк (нестроковые значения пропускаем)."""
+    return frozenset(v.strip().lower() for v in (values or []) if isinstance(v, str))
+
+
+def _as_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ---------------------------
+# Опечатки
+# ---------------------------
+#
+# Допуск задаётся по категориям: {"mnn": 1, "tradeNames": 1, ...} —
+# сколько правок (вставка, удаление, замена буквы) прощается. Перед
+# сравнением строки «складываются»: ё -> е, дефисы и тире -> пробел, так
+# что «флуоксетин ланнахер» совпадает с «флуоксетин-ланнахер» без правок.
+# Короткие слова допуска не получают: строки короче TYPO_MIN_LENGTH
+# сравниваются только точно, на строку длины n — не больше n // 4 правок.
+# Не получают его и токены ключа, которые в пределах допуска от токена
+# другого препарата: опечатка в них могла бы засчитать чужой ответ.
+
+TYPO_CATEGORIES = ("mnn", "tradeNames", "forms", "indications", "elimination")
+MAX_TYPO_TOLERANCE = 2
+TYPO_MIN_LENGTH = 5
+
+
+def parse_typo_tolerance(spec) -> Dict[str, int]:
+    """'mnn=1,tradeNames=1' (или dict) -> {категория: допуск}; нули и чужие категории отбрасываются."""
+    if isinstance(spec, dict):
+        items = spec.items()
+    else:
+        items = []
+        for part in str(spec or "").split(","):
+            name, _, value = part.partition("=")
+            items.append((name.strip(), value.strip()))
+    out = {}
+    for name, value in items:
+        try:
+            k = min(int(value), MAX_TYPO_TOLERANCE)
+        except (TypeError, ValueError):
+            continue
+        if name in TYPO_CATEGORIES and k > 0:
+            out[name] = k
+    return out
+
+
+def _fold(s: str) -> str:
+    s = s.replace("ё", "е")
+    for dash in ("-", "–", "—"):
+        s = s.replace(dash, " ")
+    return " ".join(s.split())
+
+
+def _allowed(k: int, s: str) -> int:
+    return min(k, len(s) // 4) if len(s) >= TYPO_MIN_LENGTH else 0
+
+
+def _deletes(s: str, k: int) -> Dict[str, int]:
     """
-    Подсчёт итогового балла за тест.
+    Все строки, получаемые из s удалением не более k символов:
+    вариант -> позиция удалённого символа (-1 — без удалений, -2 — удалено
+    больше одного).
+    """
+    out = {s: -1}
+    if k >= 1:
+        for i in range(len(s)):
+            out.setdefault(s[:i] + s[i + 1:], i)
+    frontier = set(out)
+    for _ in range(k - 1):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        for w in frontier:
+            out.setdefault(w, -2)
+    return out
 
-    :param answers: ответы студента (dict)
-    :param answer_key: правильные ответы (dict)
-    :return: (итоговый балл 0–10, breakdown)
+
+def _bounded_levenshtein(a: str, b: str, k: int) -> Optional[int]:
+    """Расстояние Левенштейна, если оно не больше k, иначе None (считается только полоса |i - j| <= k)."""
+    if a == b:
+        return 0
+    n, m = len(a), len(b)
+    if abs(n - m) > k:
+        return None
+    big = k + 1
+    prev = [j if j <= k else big for j in range(m + 1)]
+    for i in range(1, n + 1):
+        lo, hi = max(1, i - k), min(m, i + k)
+        cur = [big] * (m + 1)
+        cur[0] = i if i <= k else big
+        ca = a[i - 1]
+        best = cur[0]
+        for j in range(lo, hi + 1):
+            d = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < d:
+                d = prev[j] + 1
+            if cur[j - 1] + 1 < d:
+                d = cur[j - 1] + 1
+            cur[j] = d
+            if d < best:
+                best = d
+        if best > k:
+            return None
+        prev = cur
+    return prev[m] if prev[m] <= k else None
+
+
+class TypoMatcher:
+    """Токены ключа одной категории для поиска с опечатками.
+
+    Индекс «симметричных удалений»: каждый токен ключа заносится под всеми
+    вариантами с удалёнными ≤ k символами. Для ответа студента строятся те
+    же варианты, общие дают кандидатов, а расстояние проверяется только
+    у них — время не зависит от размера ключа.
     """
-    score_total = 0.0
-    breakdown: Dict[str, Dict] = {}
 
+    def __init__(self, tokens: Dict[int, str], k: int):
+        self.k = k
+        self.tokens = tokens
+        self._folded: Dict[int, str] = {}
+        # вариант -> [(token_id, позиция удаления), ...]
+        self._index: Dict[str, List[Tuple[int, int]]] = {}
+        for tid, token in tokens.items():
+            f = _fold(token)
+            if not f:
+                continue
+            self._folded[tid] = f
+            for variant, pos in _deletes(f, _allowed(k, f)).items():
+                self._index.setdefault(variant, []).append((tid, pos))
+
+    def candidates(self, raw: str) -> Tuple[Tuple[int, int], ...]:
+        """((расстояние, token_id), ...) по возрастанию расстояния."""
+        f = _fold(raw.strip().lower())
+        if not f:
+            return ()
+        k = _allowed(self.k, f)
+        best: Dict[int, int] = {}
+        for variant, qpos in _deletes(f, k).items():
+            for tid, tpos in self._index.get(variant, ()):
+                if best.get(tid, 2) <= 1:
+                    continue
+                token = self._folded[tid]
+                limit = min(k, _allowed(self.k, token))
+                if qpos == tpos == -1:
+                    d = 0
+                elif qpos >= -1 and tpos >= -1 and (qpos == -1 or tpos == -1 or qpos == tpos):
+                    # одна вставка/удаление или замена в той же позиции
+                    d = 1
+                else:
+                    d = _bounded_levenshtein(f, token, limit)
+                if d is None or d > limit:
+                    continue
+                if d < best.get(tid, k + 1):
+                    best[tid] = d
+        return tuple(sorted((d, tid) for tid, d in best.items()))
+
+
+# ---------------------------
+# Скомпилированный ключ
+# ---------------------------
+
+# Ревизия правил подсчёта: входит в версию ключа (services.answer_key), так
+# что после смены правил старые баллы того же ключа считаются устаревшими.
+# 2 — дозы и период полувыведения в формате мастер-таблицы, единицы доз.
+# 3 — опечатки: короткие и неоднозначные токены только точно.
+SCORING_RULES = 3
+#
+# Все токены ключа (strip+lower для списков, _norm для дозировок) при
+# компиляции получают целые id в общем словаре ``vocab``. Каждая категория
+# препарата — это dict id -> бит; ответ студента переводится в id через тот
+# же словарь, складывается в битовую маску, а балл категории — число
+# совпавших бит / число правильных токенов. Это ровно len(пересечения) /
+# len(правильных) из исходного алгоритма на множествах строк.
+#
+# Числа (дозировки, дозы, период полувыведения) разбираются тогда же
+# (``utils.dosage``): дозировка формы засчитывается, если совпала строкой
+# или как величины с единицами (0,5 г = 500 мг) с точностью
+# ``numeric_tolerance``.
+
+@dataclass(frozen=True)
+class CompiledDrug:
+    """Правильные ответы по одному препарату, уже нормализованные.
+
+    Флаги ``has_*`` повторяют правила compute_score: категория участвует
+    в подсчёте, даже если после нормализации в ней ничего не осталось.
+    """
+    has_mnn: bool = False
+    # id допустимых МНН (основное + алиасы)
+    mnn: frozenset = frozenset()
+    # категории-списки: {token_id: бит}
+    trade_names: dict = field(default_factory=dict)
+    forms: dict = field(default_factory=dict)
+    has_form_dosages: bool = False
+    # ((form_key, {token_id: биты}, ((дозировка, бит), ...)), ...)
+    form_dosages: tuple = ()
+    indications: dict = field(default_factory=dict)
+    has_doses: bool = False
+    # ((dtype, мг | None), ...) — None, если в ключе не доза
+    doses: tuple = ()
+    has_half_life: bool = False
+    # (from, to) или None, если в ключе не хватает границ или они не числа
+    half_life: Optional[tuple] = None
+    elimination: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class CompiledAnswerKey:
+    """Ключ, разобранный один раз на версию мастер-таблицы."""
+    version: str = ""
+    drugs: Dict[str, CompiledDrug] = field(default_factory=dict)
+    # токен -> id (общий словарь всех категорий)
+    vocab: Dict[str, int] = field(default_factory=dict)
+    # категория -> TypoMatcher (только категории с ненулевым допуском)
+    matchers: Dict[str, "TypoMatcher"] = field(default_factory=dict)
+    # относительная погрешность сравнения чисел (0.05 — 5%)
+    numeric_tolerance: float = 0.0
+
+    def get(self, drug_id: str) -> CompiledDrug:
+        return self.drugs.get(drug_id, _EMPTY_DRUG)
+
+
+_EMPTY_DRUG = CompiledDrug()
+
+
+def _intern(vocab: Dict[str, int], token: str) -> int:
+    tid = vocab.get(token)
+    if tid is None:
+        tid = vocab[token] = len(vocab)
+    return tid
+
+
+def _bits(vocab: Dict[str, int], tokens) -> dict:
+    return {_intern(vocab, t): 1 << i for i, t in enumerate(sorted(tokens))}
+
+
+def _dosage_bits(vocab: Dict[str, int], tokens, tolerance: float) -> Tuple[dict, tuple]:
+    """
+    Дозировки одной формы: ({token_id: биты}, ((дозировка, бит), ...)).
+    Токену сразу приписаны биты всех дозировок ключа, равных ему как
+    величины («10» и «10 мг»), — точное совпадение строки их не разбирает.
+    """
+    bits = _bits(vocab, tokens)
+    parsed = tuple(
+        (dosage, 1 << i)
+        for i, t in enumerate(sorted(tokens))
+        if (dosage := parse_dosage(t)) is not None
+    )
+    for t in tokens:
+        dosage = parse_dosage(t)
+        if dosage is None:
+            continue
+        tid = vocab[t]
+        for other, bit in parsed:
+            if dosages_match(dosage, other, tolerance):
+                bits[tid] |= bit
+    return bits, parsed
+
+
+def _key_doses(correct_doses: dict) -> List[Tuple[str, Optional[float]]]:
+    """
+    Суточные дозы основной группы: ключ в формате ответа ({"min": {"main":
+    ..}}) или мастер-таблицы ({"main": {"min": ..}}).
+    """
+    main = correct_doses.get("main")
+    out = []
+    for dtype in ("min", "avg", "max"):
+        c = correct_doses.get(dtype)
+        if isinstance(c, dict):
+            value = c.get("main")
+        elif isinstance(main, dict):
+            value = main.get(dtype)
+        else:
+            continue
+        if value is not None:
+            out.append((dtype, parse_dose(value)))
+    return out
+
+
+def compile_drug(correct: Dict[str, Any], vocab: Dict[str, int], numeric_tolerance: float = 0.0) -> CompiledDrug:
+    """Нормализует правильные ответы одного препарата, пополняя ``vocab``."""
+    if not isinstance(correct, dict) or not correct:
+        return _EMPTY_DRUG
+
+    mnn_correct = correct.get("mnn")
+    mnn_aliases = correct.get("mnn_aliases") or []
+    mnn = {mnn_correct.strip().lower()} if isinstance(mnn_correct, str) else set()
+    mnn.update(a.strip().lower() for a in mnn_aliases if isinstance(a, str) and a.strip())
+
+    correct_fd = correct.get("form_dosages") or {}
+    has_form_dosages = isinstance(correct_fd, dict) and any(
+        isinstance(v, list) and len(v) > 0 for v in correct_fd.values()
+    )
+    form_dosages = []
+    if has_form_dosages:
+        for form_key, correct_list in correct_fd.items():
+            if not isinstance(form_key, str):
+                continue
+            if not isinstance(correct_list, list) or not correct_list:
+                continue
+            correct_set = _as_norm_set(correct_list)
+            if correct_set:
+                form_dosages.append((form_key, *_dosage_bits(vocab, correct_set, numeric_tolerance)))
+
+    correct_doses = correct.get("doses") or {}
+    has_doses = isinstance(correct_doses, dict) and bool(correct_doses)
+    doses = _key_doses(correct_doses) if has_doses else []
+    if not doses and has_doses and isinstance(correct_doses.get("main"), dict):
+        # в строке мастер-таблицы доз нет: категорию не считаем
+        has_doses = False
+
+    # {"from": .., "to": ..} или строка мастер-таблицы «12-24»
+    correct_half = correct.get("halfLife") or {}
+    if isinstance(correct_half, dict) and ("from" in correct_half or "to" in correct_half):
+        has_half_life = True
+        half_life = parse_range(correct_half)
+    else:
+        # нечитаемое значение («~70») категорию не добавляет, как и пустые
+        # дозы: отчёт загрузки его уже показал
+        half_life = parse_range(correct.get("half_life"))
+        has_half_life = half_life is not None
+
+    return CompiledDrug(
+        has_mnn=mnn_correct is not None or bool(mnn_aliases),
+        mnn=frozenset(_intern(vocab, t) for t in mnn),
+        trade_names=_bits(vocab, _lower_set(correct.get("tradeNames"))),
+        forms=_bits(vocab, _lower_set(correct.get("forms"))),
+        has_form_dosages=has_form_dosages,
+        form_dosages=tuple(form_dosages),
+        indications=_bits(vocab, _lower_set(correct.get("indications"))),
+        has_doses=has_doses,
+        doses=tuple(doses),
+        has_half_life=has_half_life,
+        half_life=half_life,
+        elimination=_bits(vocab, _lower_set(correct.get("elimination"))),
+    )
+
+
+def _category_ids(drug: CompiledDrug, category: str):
+    if category == "mnn":
+        return drug.mnn
+    return {
+        "tradeNames": drug.trade_names,
+        "forms": drug.forms,
+        "indications": drug.indications,
+        "elimination": drug.elimination,
+    }[category]
+
+
+def _ambiguous(matcher: TypoMatcher, owners: Dict[int, set]) -> set:
+    """Токены в пределах допуска от токена другого препарата."""
+    out = set()
+    for tid, token in matcher.tokens.items():
+        for _, other in matcher.candidates(token):
+            if other != tid and len(owners[tid] | owners[other]) > 1:
+                out.update((tid, other))
+    return out
+
+
+def compile_answer_key(answer_key: Dict[str, Any], version: str = "",
+                       typo_tolerance: Optional[Dict[str, int]] = None,
+                       numeric_tolerance: float = 0.0) -> CompiledAnswerKey:
+    """
+    Компилирует весь ключ (dict drug_id -> правильные ответы).
+    typo_tolerance — допуск опечаток по категориям (см. parse_typo_tolerance),
+    numeric_tolerance — относительная погрешность для дозировок и доз.
+    """
+    numeric_tolerance = max(0.0, float(numeric_tolerance or 0.0))
+    vocab: Dict[str, int] = {}
+    drugs = {}
+    if isinstance(answer_key, dict):
+        for drug_id, correct in answer_key.items():
+            drugs[str(drug_id)] = compile_drug(correct, vocab, numeric_tolerance)
+
+    matchers = {}
+    if typo_tolerance:
+        tokens = {tid: t for t, tid in vocab.items()}
+        for category, k in parse_typo_tolerance(typo_tolerance).items():
+            # token_id -> препараты, у которых он правильный
+            owners: Dict[int, set] = {}
+            for drug_id, drug in drugs.items():
+                for tid in _category_ids(drug, category):
+                    owners.setdefault(tid, set()).add(drug_id)
+            matcher = TypoMatcher({tid: tokens[tid] for tid in owners}, k)
+            ambiguous = _ambiguous(matcher, owners)
+            if ambiguous:
+                matcher = TypoMatcher({tid: tokens[tid] for tid in owners if tid not in ambiguous}, k)
+            matchers[category] = matcher
+    return CompiledAnswerKey(version=version, drugs=drugs, vocab=vocab, matchers=matchers,
+                             numeric_tolerance=numeric_tolerance)
+
+
+# ---------------------------
+# Подсчёт
+# ---------------------------
+
+class _TokenMapper:
+    """Сырые строки студентов -> id словаря ключа, с кэшем на весь пакет.
+
+    В одном пакете (сессия, пересчёт) студенты пишут одни и те же строки,
+    поэтому strip/lower/_norm и разбор чисел делаются по разу на уникальную
+    строку. Строки, которых нет в ключе, получают -1.
+    """
+
+    def __init__(self, vocab: Dict[str, int], matchers: Optional[Dict[str, TypoMatcher]] = None,
+                 numeric_tolerance: float = 0.0):
+        self._vocab = vocab
+        self._lower: Dict[str, int] = {}
+        self._norm: Dict[str, int] = {}
+        self.empty_id = vocab.get("", -1)
+        self.matchers = matchers or {}
+        # (категория, строка) -> кандидаты TypoMatcher
+        self._typo: Dict[Tuple[str, str], tuple] = {}
+        self.tolerance = numeric_tolerance
+        self._dosage: Dict[str, Optional[Dosage]] = {}
+        self._dose: Dict[Any, Optional[float]] = {}
+        self._number: Dict[Any, Optional[float]] = {}
+
+    def lower_id(self, raw: str) -> int:
+        tid = self._lower.get(raw)
+        if tid is None:
+            tid = self._lower[raw] = self._vocab.get(raw.strip().lower(), -1)
+        return tid
+
+    def norm_id(self, raw) -> int:
+        if not isinstance(raw, str):
+            # числа кэшировать нельзя: 1, 1.0 и True равны как ключи dict,
+            # но _norm даёт для них разные строки
+            nv = _norm(raw)
+            return self._vocab.get(nv, -1) if nv else -1
+        tid = self._norm.get(raw)
+        if tid is None:
+            nv = _norm(raw)
+            tid = self._norm[raw] = self._vocab.get(nv, -1) if nv else -1
+        return tid
+
+    def lower_mask(self, bits: dict, values) -> int:
+        mask = 0
+        for v in (values or []):
+            if isinstance(v, str):
+                mask |= bits.get(self.lower_id(v), 0)
+        return mask
+
+    def typo_candidates(self, category: str, raw: str) -> tuple:
+        key = (category, raw)
+        found = self._typo.get(key)
+        if found is None:
+            found = self._typo[key] = self.matchers[category].candidates(raw)
+        return found
+
+    def typo_match(self, category: str, raw: str, allowed, taken: int = 0) -> Optional[Tuple[int, int]]:
+        """
+        Ближайший токен ключа из ``allowed`` (ids или {id: бит}) для строки
+        без точного совпадения: (token_id, расстояние) или None. Токены,
+        чьи биты уже в ``taken``, второй раз не засчитываются.
+        """
+        for d, tid in self.typo_candidates(category, raw):
+            if tid in allowed and not (taken and allowed[tid] & taken):
+                return tid, d
+        return None
+
+    def match_mask(self, category: str, bits: dict, values, typos: list) -> int:
+        """lower_mask с допуском опечаток; нечёткие совпадения дописываются в typos."""
+        if category not in self.matchers:
+            return self.lower_mask(bits, values)
+        mask = 0
+        misses = []
+        for v in (values or []):
+            if not isinstance(v, str):
+                continue
+            tid = self.lower_id(v)
+            bit = bits.get(tid, 0)
+            if bit:
+                mask |= bit
+            elif tid == -1 and v.strip():
+                # строка из ключа (ответ к другому препарату) — не опечатка
+                misses.append(v)
+        for v in misses:
+            hit = self.typo_match(category, v, bits, mask)
+            if hit is not None:
+                tid, d = hit
+                mask |= bits[tid]
+                typos.append(self.typo_record(category, v, tid, d))
+        return mask
+
+    def typo_record(self, category: str, raw: str, tid: int, distance: int) -> dict:
+        return {
+            "category": category,
+            "answer": raw,
+            "matched": self.matchers[category].tokens[tid],
+            "distance": distance,
+        }
+
+    def norm_mask(self, bits: dict, values) -> int:
+        # та же выборка значений, что в _as_norm_set
+        if not values:
+            return 0
+        if isinstance(values, list):
+            mask = 0
+            for v in values:
+                if v is not None:
+                    mask |= bits.get(self.norm_id(v), 0)
+            return mask
+        if isinstance(values, str):
+            return bits.get(self.norm_id(values), 0)
+        return 0
+
+    def dosage(self, raw) -> Optional[Dosage]:
+        if not isinstance(raw, str):
+            # как в norm_id: 1, 1.0 и True в кэше не различить
+            return parse_dosage(raw)
+        if raw not in self._dosage:
+            self._dosage[raw] = parse_dosage(raw)
+        return self._dosage[raw]
+
+    # Числа кэшируются по самому значению: 1 и 1.0 дают одно число, а True
+    # (равный 1 как ключ dict) — не число, поэтому bool отсекаем до кэша.
+
+    def dose(self, raw) -> Optional[float]:
+        if raw.__class__ is bool:
+            return None
+        try:
+            return self._dose[raw]
+        except KeyError:
+            value = self._dose[raw] = parse_dose(raw)
+            return value
+        except TypeError:  # нехешируемое
+            return None
+
+    def number(self, raw) -> Optional[float]:
+        if raw.__class__ is bool:
+            return None
+        try:
+            return self._number[raw]
+        except KeyError:
+            value = self._number[raw] = parse_number(raw)
+            return value
+        except TypeError:
+            return None
+
+    def dosage_mask(self, bits: dict, dosages: tuple, values) -> int:
+        """
+        norm_mask для дозировок: строки, которых нет в ключе, сравниваются
+        с дозировками ключа как величины с единицами.
+        """
+        if not dosages:
+            return self.norm_mask(bits, values)
+        if not isinstance(values, (list, str)) or not values:
+            return 0
+        mask = 0
+        for v in (values if isinstance(values, list) else [values]):
+            if v is None:
+                continue
+            bit = bits.get(self.norm_id(v), 0)
+            if bit:
+                mask |= bit
+                continue
+            parsed = self.dosage(v)
+            if parsed is None:
+                continue
+            for dosage, b in dosages:
+                if not mask & b and dosages_match(parsed, dosage, self.tolerance):
+                    mask |= b
+        return mask
+
+
+def _score_drug(student_ans: Dict[str, Any], correct: CompiledDrug, m: _TokenMapper) -> Dict:
+    details: Dict[str, Any] = {}
+    # ответы, засчитанные с опечаткой: {category, answer, matched, distance}
+    typos: List[dict] = []
+    category_points = 0.0
+    category_count = 0
+
+    # --- MNN (с учётом алиасов) ---
+    if correct.has_mnn:
+        category_count += 1
+        student_mnn = student_ans.get("mnn", "")
+        details["mnn"] = 0.0
+        if isinstance(student_mnn, str):
+            tid = m.lower_id(student_mnn)
+            if tid != m.empty_id and tid in correct.mnn:
+                details["mnn"] = 1.0
+            elif "mnn" in m.matchers and tid == -1 and student_mnn.strip():
+                hit = m.typo_match("mnn", student_mnn, correct.mnn)
+                if hit is not None:
+                    details["mnn"] = 1.0
+                    typos.append(m.typo_record("mnn", student_mnn, *hit))
+        category_points += details["mnn"]
+
+    # --- tradeNames ---
+    if correct.trade_names:
+        category_count += 1
+        mask = m.match_mask("tradeNames", correct.trade_names, student_ans.get("tradeNames"), typos)
+        pts = mask.bit_count() / len(correct.trade_names)
+        category_points += pts
+        details["tradeNames"] = pts
+
+    # --- forms ---
+    if correct.forms:
+        category_count += 1
+        mask = m.match_mask("forms", correct.forms, student_ans.get("forms"), typos)
+        pts = mask.bit_count() / len(correct.forms)
+        category_points += pts
+        details["forms"] = pts
+
+    # --- form dosages ---
+    if correct.has_form_dosages:
+        category_count += 1
+
+        student_fd = student_ans.get("formDosages") or {}
+        if not isinstance(student_fd, dict):
+            student_fd = {}
+
+        per_form: Dict[str, float] = {}
+        sum_pts = 0.0
+        for form_key, bits, dosages in correct.form_dosages:
+            mask = m.dosage_mask(bits, dosages, student_fd.get(form_key, []))
+            pts = mask.bit_count() / len(bits)
+            per_form[form_key] = pts
+            sum_pts += pts
+
+        forms_scored = len(correct.form_dosages)
+        final_pts = (sum_pts / forms_scored) if forms_scored > 0 else 0.0
+        category_points += final_pts
+        details["formDosages"] = {"total": final_pts, "perForm": per_form}
+
+    # --- indications ---
+    if correct.indications:
+        category_count += 1
+        mask = m.match_mask("indications", correct.indications, student_ans.get("indications"), typos)
+        pts = mask.bit_count() / len(correct.indications)
+        category_points += pts
+        details["indications"] = pts
+
+    # --- doses (суточные) ---
+    if correct.has_doses:
+        # считаем min/avg/max как отдельные подпункты внутри одной категории
+        category_count += 1
+
+        student_doses = student_ans.get("doses") or {}
+        if not isinstance(student_doses, dict):
+            student_doses = {}
+
+        dose_pts_sum = 0.0
+        per = {}
+        for dtype, c_main in correct.doses:
+            s = student_doses.get(dtype) if isinstance(student_doses.get(dtype), dict) else {}
+            s_main = s.get("main") if isinstance(s, dict) else None
+
+            pts = 0.0
+            if s_main is not None and c_main is not None:
+                s_dose = m.dose(s_main)
+                if s_dose is not None and (s_dose == c_main or numbers_close(s_dose, c_main, m.tolerance)):
+                    pts = 1.0
+            per[dtype] = pts
+            dose_pts_sum += pts
+
+        dose_cnt = len(correct.doses)
+        final_pts = (dose_pts_sum / dose_cnt) if dose_cnt else 0.0
+        category_points += final_pts
+        details["doses"] = {"total": final_pts, "per": per}
+
+    # --- half-life ---
+    if correct.has_half_life:
+        category_count += 1
+        s_half = student_ans.get("halfLife") or {}
+        if not isinstance(s_half, dict):
+            s_half = {}
+
+        s_from = m.number(s_half.get("from"))
+        s_to = m.number(s_half.get("to"))
+
+        pts = 0.0
+        if correct.half_life is not None and s_from is not None and s_to is not None:
+            c_from, c_to = correct.half_life
+            pts = 1.0 if (numbers_close(s_from, c_from, m.tolerance)
+                          and numbers_close(s_to, c_to, m.tolerance)) else 0.0
+        details["halfLife"] = pts
+        category_points += pts
+
+    # --- elimination ---
+    if correct.elimination:
+        category_count += 1
+        mask = m.match_mask("elimination", correct.elimination, student_ans.get("elimination"), typos)
+        pts = mask.bit_count() / len(correct.elimination)
+        category_points += pts
+        details["elimination"] = pts
+
+    drug_score = (category_points / category_count) if category_count else 0.0
+    result = {"score": drug_score, "details": details}
+    if typos:
+        result["typos"] = typos
+    return result
+
+
+def _score_one(answers: Dict[str, Any], compiled: CompiledAnswerKey, m: _TokenMapper) -> Tuple[float | None, Dict]:
     if not answers:
         return None, {}
 
+    score_total = 0.0
+    breakdown: Dict[str, Dict] = {}
     for drug_index, student_ans in answers.items():
         key = str(drug_index)
-        correct = answer_key.get(key, {})
-
-        details: Dict[str, Any] = {}
-        category_points = 0.0
-        category_count = 0
-
-        # --- MNN (с учётом алиасов) ---
-        mnn_correct = correct.get("mnn")
-        mnn_aliases = correct.get("mnn_aliases") or []
-        if mnn_correct is not None or mnn_aliases:
-            category_count += 1
-            student_mnn = student_ans.get("mnn", "")
-            if isinstance(student_mnn, str):
-                s = student_mnn.strip().lower()
-                valid = {mnn_correct.strip().lower()} if isinstance(mnn_correct, str) else set()
-                valid.update(
-                    a.strip().lower()
-                    for a in mnn_aliases
-                    if isinstance(a, str) and a.strip()
-                )
-                if s and s in valid:
-                    category_points += 1.0
-                    details["mnn"] = 1.0
-                else:
-                    details["mnn"] = 0.0
-            else:
-                details["mnn"] = 0.0
-
-        # --- tradeNames ---
-        correct_trade = {t.strip().lower() for t in (correct.get("tradeNames") or []) if isinstance(t, str)}
-        if correct_trade:
-            category_count += 1
-            student_trade = {
-                t.strip().lower()
-                for t in (student_ans.get("tradeNames") or [])
-                if isinstance(t, str)
-            }
-            inter = correct_trade.intersection(student_trade)
-            pts = len(inter) / len(correct_trade) if correct_trade else 0.0
-            category_points += pts
-            details["tradeNames"] = pts
-
-        # --- forms ---
-        correct_forms = {f.strip().lower() for f in (correct.get("forms") or []) if isinstance(f, str)}
-        if correct_forms:
-            category_count += 1
-            student_forms = {
-                f.strip().lower()
-                for f in (student_ans.get("forms") or [])
-                if isinstance(f, str)
-            }
-            inter = correct_forms.intersection(student_forms)
-            pts = len(inter) / len(correct_forms)
-            category_points += pts
-            details["forms"] = pts
-
-        # --- form dosages (НОВОЕ) ---
-        # correct["form_dosages"] = {"tablets":[...], "ampoules":[...], ...}
-        correct_fd = correct.get("form_dosages") or {}
-        if isinstance(correct_fd, dict) and any(isinstance(v, list) and len(v) > 0 for v in correct_fd.values()):
-            category_count += 1
-
-            student_fd = student_ans.get("formDosages") or {}
-            if not isinstance(student_fd, dict):
-                student_fd = {}
-
-            per_form: Dict[str, float] = {}
-            forms_scored = 0
-            sum_pts = 0.0
-
-            for form_key, correct_list in correct_fd.items():
-                if not isinstance(form_key, str):
-                    continue
-                if not isinstance(correct_list, list) or not correct_list:
-                    continue
+        breakdown[key] = _score_drug(student_ans, compiled.get(key), m)
+        score_total += breakdown[key]["score"]
 
-                correct_set = _as_norm_set(correct_list)
-                if not correct_set:
-                    continue
+    avg = score_total / len(answers)
+    final_score_10 = round(avg * 10.0, 2)
+    return final_score_10, breakdown
 
-                student_list = student_fd.get(form_key, [])
-                student_set = _as_norm_set(student_list)
-
-                inter = correct_set.intersection(student_set)
-                pts = (len(inter) / len(correct_set)) if correct_set else 0.0
-                per_form[form_key] = pts
-                sum_pts += pts
-                forms_scored += 1
-
-            final_pts = (sum_pts / forms_scored) if forms_scored > 0 else 0.0
-            category_points += final_pts
-            details["formDosages"] = {"total": final_pts, "perForm": per_form}
-
-        # --- indications ---
-        correct_inds = {i.strip().lower() for i in (correct.get("indications") or []) if isinstance(i, str)}
-        if correct_inds:
-            category_count += 1
-            student_inds = {
-                i.strip().lower()
-                for i in (student_ans.get("indications") or [])
-                if isinstance(i, str)
-            }
-            inter = correct_inds.intersection(student_inds)
-            pts = len(inter) / len(correct_inds)
-            category_points += pts
-            details["indications"] = pts
-
-        # --- doses (суточные) ---
-        correct_doses = correct.get("doses") or {}
-        if isinstance(correct_doses, dict) and correct_doses:
-            # считаем min/avg/max как отдельные подпункты внутри одной категории
-            category_count += 1
-
-            student_doses = student_ans.get("doses") or {}
-            if not isinstance(student_doses, dict):
-                student_doses = {}
-
-            dose_pts_sum = 0.0
-            dose_cnt = 0
-            per = {}
 
-            for dtype in ("min", "avg", "max"):
-                c = correct_doses.get(dtype)
-                if not isinstance(c, dict):
-                    continue
-                c_main = c.get("main")
-                if c_main is None:
-                    continue
+def score_many(answers_list: List[Dict[str, Any]], compiled_key: CompiledAnswerKey) -> List[Tuple[float | None, Dict]]:
+    """
+    Подсчёт пачки ответов (например, всей сессии) одним вызовом.
+    Результаты те же, что у compute_score для каждого элемента.
+    """
+    m = _TokenMapper(compiled_key.vocab, compiled_key.matchers, compiled_key.numeric_tolerance)
+    return [_score_one(answers, compiled_key, m) for answers in answers_list]
 
-                dose_cnt += 1
-                s = student_doses.get(dtype) if isinstance(student_doses.get(dtype), dict) else {}
-                s_main = s.get("main") if isinstance(s, dict) else None
 
-                # точное совпадение (пока)
-                pts = 1.0 if (s_main is not None and float(s_main) == float(c_main)) else 0.0
-                per[dtype] = pts
-                dose_pts_sum += pts
+def compute_score(answers: Dict[str, Any], answer_key: "Dict[str, Any] | CompiledAnswerKey") -> Tuple[float | None, Dict]:
+    """
+    Подсчёт итогового балла за тест.
 
-            final_pts = (dose_pts_sum / dose_cnt) if dose_cnt else 0.0
-            category_points += final_pts
-            details["doses"] = {"total": final_pts, "per": per}
+    :param answers: ответы студента (dict)
+    :param answer_key: правильные ответы — сырой dict или CompiledAnswerKey
+    :return: (итоговый балл 0–10, breakdown)
+    """
+    if not answers:
+        return None, {}
 
-        # --- half-life ---
-        correct_half = correct.get("halfLife") or {}
-        if isinstance(correct_half, dict) and ("from" in correct_half or "to" in correct_half):
-            category_count += 1
-            s_half = student_ans.get("halfLife") or {}
-            if not isinstance(s_half, dict):
-                s_half = {}
+    if not isinstance(answer_key, CompiledAnswerKey):
+        # сырой ключ: компилируем только нужные препараты
+        needed = {str(k) for k in answers}
+        answer_key = compile_answer_key({k: v for k, v in answer_key.items() if str(k) in needed})
 
-            c_from = correct_half.get("from")
-            c_to = correct_half.get("to")
-            s_from = s_half.get("from")
-            s_to = s_half.get("to")
+    return _score_one(answers, answer_key,
+                      _TokenMapper(answer_key.vocab, answer_key.matchers, answer_key.numeric_tolerance))
 
-            pts = 0.0
-            if c_from is not None and c_to is not None and s_from is not None and s_to is not None:
-                pts = 1.0 if (float(s_from) == float(c_from) and float(s_to) == float(c_to)) else 0.0
-            details["halfLife"] = pts
-            category_points += pts
-
-        # --- elimination ---
-        correct_elim = {e.strip().lower() for e in (correct.get("elimination") or []) if isinstance(e, str)}
-        if correct_elim:
-            category_count += 1
-            student_elim = {
-                e.strip().lower()
-                for e in (student_ans.get("elimination") or [])
-                if isinstance(e, str)
-            }
-            inter = correct_elim.intersection(student_elim)
-            pts = len(inter) / len(correct_elim)
-            category_points += pts
-            details["elimination"] = pts
-
-        drug_score = (category_points / category_count) if category_count else 0.0
-        breakdown[key] = {"score": drug_score, "details": details}
-        score_total += drug_score
-
-    avg = score_total / len(answers) if answers else 0.0
-    final_score_10 = round(avg * 10.0, 2)
-    return final_score_10, breakdown
 
+# ---------------------------
+# Нормализованные ответы (аналитика)
+# ---------------------------
+
+# категории в порядке подсчёта (ключи details в breakdown)
+CATEGORIES = ("mnn", "tradeNames", "forms", "formDosages", "indications", "doses", "halfLife", "elimination")
+
+
+def _fmt_num(value) -> str:
+    f = _as_float(value)
+    if f is None:
+        return _norm(value)
+    return str(int(f)) if f.is_integer() else str(f)
+
+
+def normalized_value(student_ans: Dict[str, Any], category: str) -> Optional[str]:
+    """
+    Ответ студента по категории одной строкой — так, как его сравнивает
+    подсчёт (strip+lower / _norm, списки без повторов и по алфавиту).
+    None, если ответа нет.
+    """
+    if not isinstance(student_ans, dict):
+        return None
+    value = student_ans.get(category)
+
+    if category == "mnn":
+        out = value.strip().lower() if isinstance(value, str) else ""
+    elif category == "formDosages":
+        parts = []
+        if isinstance(value, dict):
+            for form_key in sorted(k for k in value if isinstance(k, str)):
+                vals = sorted(_as_norm_set(value[form_key]))
+                if vals:
+                    parts.append(f"{form_key}: {', '.join(vals)}")
+        out = "; ".join(parts)
+    elif category == "doses":
+        parts = []
+        if isinstance(value, dict):
+            for dtype in ("min", "avg", "max"):
+                d = value.get(dtype)
+                main = d.get("main") if isinstance(d, dict) else None
+                if main is not None and str(main).strip():
+                    parts.append(f"{dtype}={_fmt_num(main)}")
+        out = "; ".join(parts)
+    elif category == "halfLife":
+        out = ""
+        if isinstance(value, dict) and value.get("from") is not None and value.get("to") is not None:
+            out = f"{_fmt_num(value['from'])}-{_fmt_num(value['to'])}"
+    else:
+        out = "; ".join(sorted(_lower_set(value if isinstance(value, list) else []) - {""}))
+    return out or None
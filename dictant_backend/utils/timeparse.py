@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 
@@ -13,4 +13,15 @@ def parse_iso_time(value: str | None) -> Optional[datetime]:
     return datetime.fromisoformat(value)
 
 
+def parse_date_bound(value: str, upper: bool = False) -> datetime:
+    """Граница диапазона для фильтров по дате (наивный UTC, как в БД).
 
+    Для даты без времени ('2025-01-31') верхняя граница — конец этого дня,
+    поэтому её нужно сравнивать строго: ``start_time < bound``.
+    """
+    dt = parse_iso_time(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    if upper and len(value) == 10:
+        dt += timedelta(days=1)
+    return dt
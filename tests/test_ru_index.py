@@ -0,0 +1,72 @@
+"""Индекс русских названий мастер-таблицы: точный поиск и подсказки.
+
+Запуск из корня репозитория::
+
+    python -m pytest -q tests
+"""
+
+import random
+
+import pytest
+
+from dictant_backend.services.ru_index import RuNameIndex
+
+# длинные «шумовые» названия с частыми окончаниями — чтобы отбор кандидатов
+# по редким триграммам работал как на настоящей таблице
+_SYLLABLES = [c + v for c in "бвдклмнпрст" for v in "аеиоу"]
+_ENDINGS = ["ин", "ол", "амин", "оксин", "тилин", "прил"]
+
+
+def _index(*names: str) -> RuNameIndex:
+    rnd = random.Random(7)
+    noise = {
+        "".join(rnd.choice(_SYLLABLES) for _ in range(3)) + rnd.choice(_ENDINGS)
+        for _ in range(3000)
+    }
+    rows = [[n, f"n{i}", "trade"] for i, n in enumerate(sorted(noise))]
+    rows += [[n, f"d{i}", "mnn"] for i, n in enumerate(names)]
+    return RuNameIndex(rows)
+
+
+INDEX = _index("йод", "уф", "но-шпа", "амитриптилин", "аспирин")
+
+
+def _suggested(query: str, limit: int = 3) -> list[str]:
+    return [s["name"] for s in INDEX.suggest(query, limit)]
+
+
+def test_lookup_is_exact_after_normalization():
+    assert INDEX.lookup("  Йод ") == [("d0", "mnn")]
+    assert INDEX.lookup("УФ") == [("d1", "mnn")]
+    assert INDEX.lookup("ио") == []
+
+
+@pytest.mark.parametrize("name", ["уф", "йод"])
+def test_short_name_suggests_itself(name):
+    assert _suggested(name)[0] == name
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("иод", "йод"),   # замена
+    ("йд", "йод"),    # пропуск
+    ("йодд", "йод"),  # лишняя буква
+    ("уфф", "уф"),
+    ("ф", "уф"),
+    ("ув", "уф"),
+])
+def test_one_letter_typo_in_short_name(query, expected):
+    assert expected in _suggested(query)
+
+
+@pytest.mark.parametrize("prefix", ["амитр", "амитрипт", "но-ш", "аспи"])
+def test_exact_prefix_comes_first(prefix):
+    assert _suggested(prefix)[0].startswith(prefix)
+
+
+def test_typo_in_long_name():
+    assert _suggested("амитриптилен")[0] == "амитриптилин"
+
+
+def test_unrelated_query_suggests_nothing():
+    assert _suggested("щщщщщщщщ") == []
+    assert _suggested("") == []
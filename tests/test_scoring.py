@@ -0,0 +1,327 @@
+"""Подсчёт баллов: совпадение с исходной реализацией, опечатки, дозировки.
+
+Эталон — замороженная копия исходного compute_score (baseline_scoring.py).
+На вводе, где правила не менялись, новый подсчёт обязан совпадать с ним
+полностью, включая исключения. Намеренные изменения правил перечислены в
+RULE_CHANGES: для каждого записано, что даёт эталон и что даёт новый код.
+
+Запуск из корня репозитория::
+
+    python -m pytest -q tests
+"""
+
+import random
+
+import pytest
+
+from baseline_scoring import compute_score as baseline_compute_score
+from dictant_backend.utils.dosage import (
+    dosages_match, parse_dose, parse_dosage, parse_number, parse_range,
+)
+from dictant_backend.utils.scoring import (
+    TypoMatcher, compile_answer_key, compute_score, score_many,
+)
+
+
+# ---------------------------
+# Совпадение с эталоном
+# ---------------------------
+
+# значения, на которых правила не менялись: без единиц, запятых и чисел,
+# записанных по-разному («10» и «10.0»), — такие случаи в RULE_CHANGES
+WORDS = [
+    "Haloperidol", " haloperidol ", "aminazin", "Тизерцин", "Сероквель", "", "  ",
+    "10", "25 mg – 2 ml;", "25 mg - 2 ml", "25  MG - 2 ml ;;", "x",
+]
+
+
+def _outcome(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return ("exception", type(e).__name__)
+
+
+def _rand_list(rnd: random.Random):
+    if rnd.random() < 0.9:
+        return [rnd.choice(WORDS + [None, 5, True]) for _ in range(rnd.randint(0, 4))]
+    return rnd.choice(WORDS)  # строка вместо списка тоже встречается
+
+
+def _key_item(rnd: random.Random) -> dict:
+    d = {}
+    if rnd.random() < 0.8:
+        d["mnn"] = rnd.choice(WORDS + [None])
+    if rnd.random() < 0.5:
+        d["mnn_aliases"] = _rand_list(rnd)
+    for k in ("tradeNames", "forms", "indications", "elimination"):
+        if rnd.random() < 0.7:
+            d[k] = _rand_list(rnd)
+    if rnd.random() < 0.7:
+        d["form_dosages"] = {rnd.choice(["tablets", "ampoules"]): _rand_list(rnd) for _ in range(2)}
+    if rnd.random() < 0.7:
+        d["doses"] = {t: {"main": rnd.choice([None, "10", 10, 2.5])} for t in rnd.sample(["min", "avg", "max", "x"], 2)}
+    if rnd.random() < 0.7:
+        d["halfLife"] = {k: rnd.choice([None, "3", 3, 4]) for k in rnd.sample(["from", "to"], rnd.randint(1, 2))}
+    return d
+
+
+def _answer_item(rnd: random.Random):
+    if rnd.random() < 0.02:
+        return rnd.choice([None, "x", []])  # эталон здесь падает — новый код тоже должен
+    d = {}
+    if rnd.random() < 0.8:
+        d["mnn"] = rnd.choice(WORDS + [None, 3])
+    for k in ("tradeNames", "forms", "indications", "elimination"):
+        if rnd.random() < 0.7:
+            d[k] = _rand_list(rnd)
+    if rnd.random() < 0.7:
+        d["formDosages"] = {rnd.choice(["tablets", "ampoules"]): _rand_list(rnd)}
+    if rnd.random() < 0.7:
+        d["doses"] = {t: {"main": rnd.choice([None, "10", 10, 2.5])} for t in ("min", "avg", "max")}
+    if rnd.random() < 0.7:
+        d["halfLife"] = {k: rnd.choice([None, "3", 3, 4]) for k in ("from", "to")}
+    return d
+
+
+def test_matches_baseline_on_random_keys():
+    rnd = random.Random(7)
+    for _ in range(2000):
+        key = {str(i): _key_item(rnd) for i in range(5)}
+        batch = [
+            {str(i): _answer_item(rnd) for i in rnd.sample(range(7), rnd.randint(0, 6))}
+            for _ in range(3)
+        ]
+        compiled = compile_answer_key(key)
+        expected = [_outcome(baseline_compute_score, a, key) for a in batch]
+        assert [_outcome(compute_score, a, compiled) for a in batch] == expected
+        assert [_outcome(compute_score, a, key) for a in batch] == expected
+        failed = [e for e in expected if e[0] == "exception"]
+        # score_many падает целиком, если падает хоть один элемент
+        assert _outcome(score_many, batch, compiled) == (failed[0] if failed else expected)
+
+
+# ---------------------------
+# Намеренные изменения правил
+# ---------------------------
+
+# (что изменилось, запись ключа, ответ, балл эталона, балл сейчас);
+# «исключение» — эталон падал на таком вводе
+RULE_CHANGES = [
+    # user-025: дозировки сравниваются как числа с единицами
+    ("mass units", {"form_dosages": {"tablets": ["0,5 г"]}},
+     {"formDosages": {"tablets": ["500 мг"]}}, 0.0, 10.0),
+    ("unit aliases", {"form_dosages": {"tablets": ["10 mg"]}},
+     {"formDosages": {"tablets": ["10 мг"]}}, 0.0, 10.0),
+    ("same number written differently", {"form_dosages": {"tablets": ["10"]}},
+     {"formDosages": {"tablets": ["10.0"]}}, 0.0, 10.0),
+    ("number vs string dosage", {"form_dosages": {"tablets": [5]}},
+     {"formDosages": {"tablets": ["5.0"]}}, 0.0, 10.0),
+    # user-025: дозы и период полувыведения не роняют подсчёт
+    ("dose with decimal comma", {"doses": {"min": {"main": "0,5"}}},
+     {"doses": {"min": {"main": 0.5}}}, "exception", 10.0),
+    ("dose with mass unit", {"doses": {"min": {"main": "0,5 г"}}},
+     {"doses": {"min": {"main": 500}}}, "exception", 10.0),
+    ("unreadable student dose", {"doses": {"min": {"main": "10"}}},
+     {"doses": {"min": {"main": "abc"}}}, "exception", 0.0),
+    ("half-life with decimal comma", {"halfLife": {"from": 12.5, "to": 24}},
+     {"halfLife": {"from": "12,5", "to": 24}}, "exception", 10.0),
+    # user-022/025: раскладка мастер-таблицы (half_life строкой, doses по группам)
+    ("master half-life is scored", {"mnn": "x", "half_life": "12–24 ч"},
+     {"mnn": "x", "halfLife": {"from": 12, "to": 36}}, 10.0, 5.0),
+    ("master doses are scored", {"mnn": "x", "doses": {"main": {"min": "1", "max": "20"}}},
+     {"mnn": "x", "doses": {"min": {"main": 1}, "max": {"main": 30}}}, 5.0, 7.5),
+]
+
+
+def _score_or_exception(fn, answers, key):
+    result = _outcome(fn, answers, key)
+    return "exception" if result[0] == "exception" else result[0]
+
+
+@pytest.mark.parametrize("name, key_item, answer, baseline, now", RULE_CHANGES, ids=[c[0] for c in RULE_CHANGES])
+def test_rule_changes_are_explicit(name, key_item, answer, baseline, now):
+    key, answers = {"d1": key_item}, {"d1": answer}
+    assert _score_or_exception(baseline_compute_score, answers, key) == baseline
+    assert _score_or_exception(compute_score, answers, compile_answer_key(key)) == now
+
+
+def test_typo_tolerance_is_a_rule_change_only_when_enabled():
+    # user-024: допуск опечаток — только если он задан
+    key, answers = {"d1": {"mnn": "галоперидол"}}, {"d1": {"mnn": "галоперидолл"}}
+    assert baseline_compute_score(answers, key)[0] == 0.0
+    assert compute_score(answers, compile_answer_key(key))[0] == 0.0
+    assert compute_score(answers, compile_answer_key(key, typo_tolerance={"mnn": 1}))[0] == 10.0
+
+
+def test_exact_answer_scores_ten():
+    key = {"d1": {
+        "mnn": "Haloperidol",
+        "mnn_aliases": ["Haldol"],
+        "tradeNames": ["Сенорм"],
+        "forms": ["tablets"],
+        "form_dosages": {"tablets": ["1,5 мг", "5 мг"]},
+        "doses": {"min": {"main": 1}, "max": {"main": "20"}},
+        "halfLife": {"from": 12, "to": 36},
+    }}
+    answers = {"d1": {
+        "mnn": " haldol ",
+        "tradeNames": ["сенорм"],
+        "forms": ["tablets"],
+        "formDosages": {"tablets": ["1.5 mg", "5000 мкг"]},
+        "doses": {"min": {"main": 1}, "max": {"main": 20}},
+        "halfLife": {"from": 12, "to": 36},
+    }}
+    score, breakdown = compute_score(answers, compile_answer_key(key))
+    assert score == 10.0
+    assert "typos" not in breakdown["d1"]
+
+
+def test_bad_numbers_do_not_raise():
+    key = {"d1": {"doses": {"min": {"main": "10"}}, "halfLife": {"from": 1, "to": 2}}}
+    answers = {"d1": {"doses": {"min": {"main": "abc"}}, "halfLife": {"from": "?", "to": None}}}
+    score, breakdown = compute_score(answers, compile_answer_key(key))
+    assert score == 0.0
+    assert breakdown["d1"]["details"]["halfLife"] == 0.0
+
+
+def test_master_table_layout_is_scored():
+    key = {"d1": {
+        "mnn": "x",
+        "doses": {"main": {"min": "0,001 г", "avg": None, "max": "20"}, "children": {"min": "1"}},
+        "half_life": "12–24 ч",
+    }}
+    compiled = compile_answer_key(key)
+    assert compiled.get("d1").doses == (("min", 1.0), ("max", 20.0))
+    answers = {"d1": {"mnn": "x", "doses": {"min": {"main": 1}, "max": {"main": 20}},
+                      "halfLife": {"from": 12, "to": 24}}}
+    assert compute_score(answers, compiled)[0] == 10.0
+
+
+def test_unreadable_master_values_add_no_category():
+    key = {"d1": {"mnn": "x", "half_life": "~70", "doses": {"main": {"min": None}}}}
+    _, breakdown = compute_score({"d1": {"mnn": "x"}}, compile_answer_key(key))
+    assert breakdown["d1"]["details"] == {"mnn": 1.0}
+
+
+# ---------------------------
+# Опечатки
+# ---------------------------
+
+@pytest.mark.parametrize("k, raw, expected", [
+    (1, "галоперидол", ((0, 0),)),
+    (1, "ГАЛОПЕРИДОЛЛ", ((1, 0),)),
+    (1, "голоперидол", ((1, 0),)),
+    (1, "галопередолл", ()),
+    (2, "галопередолл", ((2, 0),)),
+    (1, "сероквел", ((1, 1),)),
+    (1, "флуоксетин ланнахер", ((0, 2),)),
+    # короткие слова сравниваются только точно
+    (1, "мк", ()),
+    (1, "", ()),
+])
+def test_typo_candidates(k, raw, expected):
+    matcher = TypoMatcher({0: "галоперидол", 1: "сероквель", 2: "флуоксетин-ланнахер", 3: "мг"}, k)
+    assert matcher.candidates(raw) == expected
+
+
+def test_typos_are_recorded_in_breakdown():
+    key = {"d1": {"mnn": "галоперидол", "tradeNames": ["сенорм", "галдол"]}}
+    compiled = compile_answer_key(key, typo_tolerance={"mnn": 1, "tradeNames": 1})
+    score, breakdown = compute_score({"d1": {"mnn": "галоперидолл", "tradeNames": ["сеннорм"]}}, compiled)
+    assert breakdown["d1"]["details"] == {"mnn": 1.0, "tradeNames": 0.5}
+    assert [(t["category"], t["matched"], t["distance"]) for t in breakdown["d1"]["typos"]] == [
+        ("mnn", "галоперидол", 1), ("tradeNames", "сенорм", 1),
+    ]
+    # без допуска — прежний точный подсчёт
+    assert compute_score({"d1": {"mnn": "галоперидолл"}}, compile_answer_key(key))[0] == 0.0
+
+
+def test_typo_tolerance_is_off_by_default(monkeypatch):
+    import importlib
+    from dictant_backend import config
+    monkeypatch.delenv("SCORING_TYPO_TOLERANCE", raising=False)
+    assert importlib.reload(config).Config.SCORING_TYPO_TOLERANCE == ""
+
+
+@pytest.mark.parametrize("correct, answer", [
+    ("сера", "сира"),
+    ("йод", "иод"),
+    ("галоперидол", "гал"),
+])
+def test_short_words_are_matched_exactly(correct, answer):
+    key = {"d1": {"mnn": correct}}
+    compiled = compile_answer_key(key, typo_tolerance={"mnn": 2})
+    assert compute_score({"d1": {"mnn": answer}}, compiled)[0] == 0.0
+
+
+def _details(answers, compiled, drug_id="d1"):
+    return compute_score(answers, compiled)[1][drug_id]["details"]
+
+
+def test_words_close_to_another_drug_are_matched_exactly():
+    key = {
+        "d1": {"tradeNames": ["велаксин", "сенорм"]},
+        "d2": {"tradeNames": ["валаксин"]},
+    }
+    compiled = compile_answer_key(key, typo_tolerance={"tradeNames": 1})
+    # «валаксин» — ответ ко второму препарату, а не опечатка в первом
+    assert _details({"d1": {"tradeNames": ["валаксин"]}}, compiled) == {"tradeNames": 0.0}
+    assert _details({"d1": {"tradeNames": ["велаксинн"]}}, compiled) == {"tradeNames": 0.0}
+    # остальные слова ключа опечатки по-прежнему прощают
+    assert _details({"d1": {"tradeNames": ["сеннорм"]}}, compiled) == {"tradeNames": 0.5}
+
+
+def test_answer_from_the_key_is_not_a_typo():
+    # «сертралон» — правильный ответ в другой категории, в одной правке от МНН
+    key = {"d1": {"mnn": "сертралин"}, "d2": {"tradeNames": ["сертралон"]}}
+    compiled = compile_answer_key(key, typo_tolerance={"mnn": 1})
+    assert _details({"d1": {"mnn": "сертралон"}}, compiled) == {"mnn": 0.0}
+    assert _details({"d1": {"mnn": "сертролин"}}, compiled) == {"mnn": 1.0}
+
+
+# ---------------------------
+# Дозировки
+# ---------------------------
+
+@pytest.mark.parametrize("raw, expected", [
+    ("10", ((10.0, ""),)),
+    (10, ((10.0, ""),)),
+    ("0,5 г", ((500.0, "mg"),)),
+    ("500 мкг", ((0.5, "mg"),)),
+    ("25 mg – 2 ml", ((25.0, "mg"), (2.0, "ml"))),
+    ("2 x 5 мл", ((2.0, ""), (5.0, "ml"))),
+    ("1 mg/ml", ((1.0, "mg/ml"),)),
+    ("2 mg retard", None),
+    ("abc", None),
+    ("", None),
+    (None, None),
+    (True, None),
+])
+def test_parse_dosage(raw, expected):
+    assert parse_dosage(raw) == expected
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("12-24", (12.0, 24.0)),
+    ("12–24 ч", (12.0, 24.0)),
+    ("от 12 до 24 часов", (12.0, 24.0)),
+    ("8 ч", (8.0, 8.0)),
+    ("12,5-20", (12.5, 20.0)),
+    ({"from": 12, "to": "24"}, (12.0, 24.0)),
+    ({"from": 12}, None),
+    ("~70", None),
+    ("1-2 сут", None),
+])
+def test_parse_range(raw, expected):
+    assert parse_range(raw) == expected
+
+
+def test_numbers_and_units():
+    assert parse_number("nan") is None
+    assert parse_dose("0,02 г") == 20.0
+    assert parse_dose("5 мл") is None
+    assert dosages_match(parse_dosage("100 мкг"), parse_dosage("0.1 mg"))
+    assert dosages_match(parse_dosage("10"), parse_dosage("10 мг"))
+    assert not dosages_match(parse_dosage("10 мл"), parse_dosage("10 мг"))
+    assert dosages_match(parse_dosage("10.4 мг"), parse_dosage("10 мг"), tolerance=0.05)